@@ -74,5 +74,6 @@ class Sentence(TextComponent):
     a_content: NATIVE_CONTENT = field(init=False)
 
     def __post_init__(self):
+        super().__post_init__()
         self.contents = remove_noise_space(self.contents)
         self.a_content = remove_noise_space(self.contents)
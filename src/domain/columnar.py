@@ -0,0 +1,236 @@
+"""columnar.py: Store many TextComponent trees in flat arrays, and read them through light views.
+
+A `TextComponent` node is a dataclass with a defaultdict, a list and a ContentInfo, and a novel has
+hundreds of thousands of them. `ComponentStore` keeps one row per node in typed arrays and every
+text in one utf-8 buffer, so a whole shelf of books fits in one process.
+
+Columns (one row per node, in pre-order of each tree):
+    kinds: kind code of `serialization.KIND_CLASSES`
+    parents: row of the parent, or NO_PARENT for a root
+    depths: depth from the root of the tree
+    ends: row after the last node of the subtree, so the subtree of row i is rows [i, ends[i])
+    offsets, lengths: utf-8 text in the buffer. Sentence has its sentence, others have `part_title`.
+    sentence_counts, word_counts, char_counts, token_counts: subtree totals
+
+EXAMPLE:
+    store = ComponentStore()
+    book = store.add_serialized(cache_path.read_bytes())
+    for chapter in book:
+        print(chapter.part_title, chapter.counters["word_count"])
+"""
+
+from array import array
+from collections.abc import Callable
+from collections.abc import Iterator
+from typing import Self
+
+from domain.book import Sentence
+from domain.componet import Counters
+from domain.componet import TextComponent
+from domain.serialization import KIND_CLASSES
+from domain.serialization import NO_PARENT
+from domain.serialization import dump_component
+from domain.serialization import read_columns
+
+SENTENCE_CODE = KIND_CLASSES.index(Sentence)
+KIND_NAMES = tuple(component_class.__name__.lower() for component_class in KIND_CLASSES)
+
+
+class ComponentStore:
+    """Flat columns of any number of TextComponent trees, and one text buffer shared by them."""
+
+    def __init__(self) -> None:
+        self.kinds = array("B")
+        self.parents = array("i")
+        self.depths = array("H")
+        self.ends = array("I")
+        # MEMO: uint32 offsets limit the text buffer of one store to 4 GiB.
+        self.offsets = array("I")
+        self.lengths = array("I")
+        self.sentence_counts = array("I")
+        self.word_counts = array("I")
+        self.char_counts = array("I")
+        self.token_counts = array("I")
+        self.text_buffer = bytearray()
+        self.roots = array("I")
+
+    def __len__(self) -> int:
+        return len(self.kinds)
+
+    def add_serialized(self, data: bytes) -> "ComponentView":
+        """Add a tree dumped by `serialization.dump_component`, without building any node object."""
+        kinds, parents, offsets, lengths, text = read_columns(data)
+        base = len(self.kinds)
+        text_base = len(self.text_buffer)
+        count = len(kinds)
+
+        self.kinds.extend(kinds)
+        self.parents.extend(
+            parent + base if parent != NO_PARENT else NO_PARENT for parent in parents
+        )
+        self.offsets.extend(offset + text_base for offset in offsets)
+        self.lengths.extend(lengths)
+        self.text_buffer += text
+
+        depths = array("H", bytes(2 * count))
+        for row in range(1, count):
+            depths[row] = depths[parents[row]] + 1
+        self.depths.extend(depths)
+
+        # MEMO: children come after their parent, so one reverse pass sums every subtree.
+        ends = array("I", range(base + 1, base + count + 1))
+        sentence_counts = array("I", bytes(4 * count))
+        word_counts = array("I", bytes(4 * count))
+        char_counts = array("I", bytes(4 * count))
+        for row in range(count - 1, -1, -1):
+            if kinds[row] == SENTENCE_CODE:
+                sentence = str(text[offsets[row] : offsets[row] + lengths[row]], "utf-8")
+                sentence_counts[row] = 1
+                word_counts[row] = len(sentence.split())
+                char_counts[row] = len(sentence)
+            if (parent := parents[row]) != NO_PARENT:
+                ends[parent] = max(ends[parent], ends[row])
+                sentence_counts[parent] += sentence_counts[row]
+                word_counts[parent] += word_counts[row]
+                char_counts[parent] += char_counts[row]
+        self.ends.extend(ends)
+        self.sentence_counts.extend(sentence_counts)
+        self.word_counts.extend(word_counts)
+        self.char_counts.extend(char_counts)
+        self.token_counts.extend(bytes(4 * count))
+
+        self.roots.append(base)
+        return ComponentView(self, base)
+
+    def add_component(self, root: TextComponent) -> "ComponentView":
+        return self.add_serialized(dump_component(root))
+
+    def text(self, row: int) -> str:
+        offset = self.offsets[row]
+        return self.text_buffer[offset : offset + self.lengths[row]].decode("utf-8")
+
+    def children(self, row: int) -> Iterator[int]:
+        child = row + 1
+        while child < self.ends[row]:
+            yield child
+            child = self.ends[child]
+
+    def calc_token_counts(self, count_tokens: Callable[[str], int]) -> None:
+        """Count tokens of every sentence once, and sum them up to the roots.
+
+        Args:
+            count_tokens: EXAMPLE: `LLM.calc_tokens` of the model which translates the books.
+        """
+        token_counts = array("I", bytes(4 * len(self.kinds)))
+        for row in range(len(self.kinds) - 1, -1, -1):
+            if self.kinds[row] == SENTENCE_CODE:
+                token_counts[row] = count_tokens(self.text(row))
+            if (parent := self.parents[row]) != NO_PARENT:
+                token_counts[parent] += token_counts[row]
+        self.token_counts = token_counts
+
+    def books(self) -> list["ComponentView"]:
+        return [ComponentView(self, root) for root in self.roots]
+
+
+class ComponentView:
+    """A read-only TextComponent which is a row of a ComponentStore.
+
+    It has the reading side of TextComponent: `kind`, `part_title`, `contents`, `counters`,
+    iteration and len. Sentences are strings here, so they are `sentence_texts`, not `sentences`.
+    """
+
+    # PERFORMANCE: a view is two references, and it is made only when it is asked for.
+    __slots__ = ("store", "row")
+
+    def __init__(self, store: ComponentStore, row: int) -> None:
+        self.store = store
+        self.row = row
+
+    def __repr__(self) -> str:
+        return f"ComponentView(kind={self.kind!r}, row={self.row})"
+
+    def __eq__(self, other: object) -> bool:
+        return (
+            isinstance(other, ComponentView)
+            and other.store is self.store
+            and other.row == self.row
+        )
+
+    def __hash__(self) -> int:
+        return hash((id(self.store), self.row))
+
+    @property
+    def kind(self) -> str:
+        return KIND_NAMES[self.store.kinds[self.row]]
+
+    @property
+    def component_class(self) -> type[TextComponent]:
+        return KIND_CLASSES[self.store.kinds[self.row]]
+
+    @property
+    def is_sentence(self) -> bool:
+        return self.store.kinds[self.row] == SENTENCE_CODE
+
+    @property
+    def depth(self) -> int:
+        return self.store.depths[self.row]
+
+    @property
+    def parent(self) -> Self | None:
+        parent = self.store.parents[self.row]
+        return None if parent == NO_PARENT else type(self)(self.store, parent)
+
+    @property
+    def part_title(self) -> str:
+        return "" if self.is_sentence else self.store.text(self.row)
+
+    @property
+    def contents(self) -> list[Self] | str:
+        # MEMO: same shape as TextComponent. A sentence has its text, others have children.
+        if self.is_sentence:
+            return self.store.text(self.row)
+        return list(self)
+
+    @property
+    def counters(self) -> Counters:
+        store = self.store
+        return Counters(
+            token_count=store.token_counts[self.row],
+            char_count=store.char_counts[self.row],
+            word_count=store.word_counts[self.row],
+            sentence_count=store.sentence_counts[self.row],
+        )
+
+    def __iter__(self) -> Iterator[Self]:
+        view_class = type(self)
+        return (view_class(self.store, child) for child in self.store.children(self.row))
+
+    def __len__(self) -> int:
+        return 0 if self.is_sentence else sum(1 for _ in self.store.children(self.row))
+
+    def iter_sentence_texts(self) -> Iterator[str]:
+        # MEMO: a subtree is a range of rows, so no tree walk is needed.
+        store = self.store
+        for row in range(self.row, store.ends[self.row]):
+            if store.kinds[row] == SENTENCE_CODE:
+                yield store.text(row)
+
+    @property
+    def sentence_texts(self) -> list[str]:
+        return list(self.iter_sentence_texts())
+
+    def to_component(self) -> TextComponent:
+        """Build TextComponent objects of this subtree, for code which needs to mutate it."""
+        store = self.store
+        nodes: dict[int, TextComponent] = {}
+        for row in range(self.row, store.ends[self.row]):
+            component_class = KIND_CLASSES[store.kinds[row]]
+            if component_class is Sentence:
+                node = Sentence(contents=store.text(row))  # type: ignore
+            else:
+                node = component_class(contents=[], part_title=store.text(row))
+            if row != self.row:
+                nodes[store.parents[row]].contents.append(node)
+            nodes[row] = node
+        return nodes[self.row]
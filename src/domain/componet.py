@@ -1,7 +1,11 @@
+import json
 from collections import defaultdict
 from collections.abc import Iterable
+from collections.abc import Iterator
 from dataclasses import dataclass
 from dataclasses import field
+from typing import IO
+from typing import Literal
 from typing import Self
 from typing import TypedDict
 
@@ -38,7 +42,7 @@ class AuthorName:
 
 @dataclass
 class AuthorInfo:
-    author: AuthorName | list[AuthorName] = AuthorName(raw_name="")
+    author: AuthorName | list[AuthorName] = field(default_factory=lambda: AuthorName(raw_name=""))
     author_id: str | None = None
     author_wiki: str | None = None
 
@@ -75,38 +79,185 @@ class Counters(TypedDict):
     sentence_count: int
 
 
+RenderStyle = Literal["tagged", "plain", "jsonl"]
+# MEMO: kinds whose part_title is a heading. A paragraph title is a type like "verse".
+TITLED_KINDS = frozenset({"series", "book", "part", "chapter", "section", "subsection"})
+# MEMO: kinds which are followed by a blank line in plain text.
+BLOCK_KINDS = frozenset({"paragraph", "subparagraph"})
+
+# MEMO: how far the counters of a node are up to date.
+STATS_DIRTY = 0
+STATS_COUNTED = 1
+STATS_TOKEN_COUNTED = 2
+
+
+def new_counters() -> Counters:
+    return Counters(token_count=0, char_count=0, word_count=0, sentence_count=0)
+
+
+class ComponentList(list):
+    """Contents of a TextComponent. Any change invalidates the counters of the owner and ancestors."""
+
+    __slots__ = ("owner",)
+
+    def __init__(self, owner: "TextComponent", iterable: Iterable = ()) -> None:
+        super().__init__(iterable)
+        self.owner = owner
+        self._adopt(self)
+
+    def _adopt(self, components: Iterable) -> None:
+        for component in components:
+            if isinstance(component, TextComponent):
+                component.parent = self.owner
+
+    def _changed(self) -> None:
+        # MEMO: pickle appends items before it sets the owner.
+        if (owner := getattr(self, "owner", None)) is not None:
+            owner.invalidate()
+
+    def append(self, component) -> None:
+        super().append(component)
+        if hasattr(self, "owner"):
+            self._adopt((component,))
+        self._changed()
+
+    def extend(self, components: Iterable) -> None:
+        components = list(components)
+        super().extend(components)
+        if hasattr(self, "owner"):
+            self._adopt(components)
+        self._changed()
+
+    def insert(self, index, component) -> None:
+        super().insert(index, component)
+        self._adopt((component,))
+        self._changed()
+
+    def __setitem__(self, index, value) -> None:
+        if isinstance(index, slice):
+            value = list(value)
+        super().__setitem__(index, value)
+        self._adopt(value if isinstance(index, slice) else (value,))
+        self._changed()
+
+    def __iadd__(self, components: Iterable) -> Self:
+        self.extend(components)
+        return self
+
+    def __delitem__(self, index) -> None:
+        super().__delitem__(index)
+        self._changed()
+
+    def pop(self, index=-1):
+        component = super().pop(index)
+        self._changed()
+        return component
+
+    def remove(self, component) -> None:
+        super().remove(component)
+        self._changed()
+
+    def clear(self) -> None:
+        super().clear()
+        self._changed()
+
+    def sort(self, *args, **kwargs) -> None:
+        super().sort(*args, **kwargs)
+        self._changed()
+
+    def reverse(self) -> None:
+        super().reverse()
+        self._changed()
+
+
 @dataclass
 class TextComponent:
     contents: list[Self] = field(default_factory=list)
     depth_level: int | None = None
     ids: dict = field(default_factory=lambda: defaultdict(int))
-    counters = Counters(token_count=0, char_count=0, word_count=0, sentence_count=0)
     kind: str = ""
     part_title: str = field(default="")
     content_info: ContentInfo | None = None
+    # MEMO: totals of the subtree. They are valid after `calc_stats`, until the subtree changes.
+    counters: Counters = field(default_factory=new_counters, repr=False, compare=False)
+    parent: Self | None = field(default=None, init=False, repr=False, compare=False)
+    stats_state: int = field(default=STATS_DIRTY, init=False, repr=False, compare=False)
+    # MEMO: True when this node is read by a cache of itself or an ancestor.
+    is_observed: bool = field(default=False, init=False, repr=False, compare=False)
+    sentence_index: list | None = field(default=None, init=False, repr=False, compare=False)
+    # MEMO: sentences by serial_id, set by `make_count`. It is not dropped by changes of the tree.
+    serial_index: list | None = field(default=None, init=False, repr=False, compare=False)
 
     def __post_init__(self):
         self.kind = self.__class__.__name__.lower()
 
+    def __setattr__(self, name, value) -> None:
+        # PERFORMANCE: object.__setattr__ instead of super(), as this runs for every field.
+        if name != "contents":
+            object.__setattr__(self, name, value)
+            return
+        if isinstance(value, list) and not isinstance(value, ComponentList):
+            value = ComponentList(self, value)
+        object.__setattr__(self, name, value)
+        self.invalidate()
+
+    def invalidate(self) -> None:
+        """Drop the counters and the sentence index of this node and its ancestors.
+
+        PERFORMANCE: a cache marks every node it reads as observed. An unobserved node is read by
+        no cache, so neither are its ancestors, and the walk stops there.
+        """
+        node = self
+        while node is not None and getattr(node, "is_observed", False):
+            node.is_observed = False
+            node.stats_state = STATS_DIRTY
+            node.sentence_index = None
+            node = node.parent
+
     def calc_stats(self, model: LLM | None = None, is_token_calc=False) -> None:
-        self.counters["sentence_count"] = len(self.sentences)
-        self.counters["word_count"] = self._loop(self._word_count, "word_count")
-        self.counters["char_count"] = self._loop(self._char_count, "char_count")
-        if is_token_calc:
-            self.counters["token_count"] = self._loop(self._token_count, "token_count", model)
-
-    def _loop(self, func, key, *args) -> int:
-        if self.counters.get(key):
-            return self.counters.get(key)
-
-        if isinstance(self.a_content, TextComponent):
-            value = 0
-            for content in self.contents:
-                value += content._loop(func, key)
-        else:
-            value = func(self.a_content, *args)
-        self.counters[key] = value
-        return value
+        """Count sentences, words, chars and tokens of every node in one post-order pass.
+
+        Subtrees which are still up to date are not visited again.
+        """
+        if is_token_calc and model is None:
+            raise ValueError("model is not set")
+        required = STATS_TOKEN_COUNTED if is_token_calc else STATS_COUNTED
+        stack: list[tuple[TextComponent, bool]] = [(self, False)]
+        while stack:
+            node, is_children_counted = stack.pop()
+            if not is_children_counted and node.stats_state >= required:
+                continue
+            if isinstance(node.contents, str):
+                node._count_sentence(node.contents, model if is_token_calc else None)
+            elif is_children_counted:
+                node._sum_children()
+            else:
+                stack.append((node, True))
+                stack.extend((child, False) for child in reversed(node.contents))
+                continue
+            node.stats_state = required
+            node.is_observed = True
+
+    def stats(self, model: LLM | None = None, is_token_calc=False) -> Counters:
+        # RETURNS: the counters, which are counted only when the subtree changed since last time.
+        self.calc_stats(model, is_token_calc)
+        return self.counters
+
+    def _count_sentence(self, sentence: str, model: LLM | None) -> None:
+        token_count = self._token_count(sentence, model) if model is not None else 0
+        self.counters = Counters(
+            token_count=token_count,
+            char_count=self._char_count(sentence),
+            word_count=self._word_count(sentence),
+            sentence_count=1,
+        )
+
+    def _sum_children(self) -> None:
+        counters = new_counters()
+        for child in self.contents:
+            for key, value in child.counters.items():
+                counters[key] += value  # type: ignore
+        self.counters = counters
 
     @staticmethod
     def _word_count(sentence: str) -> int:
@@ -138,62 +289,181 @@ class TextComponent:
         raise ValueError(msg)
 
     def _show_contents(self):
-        result = ""
-        if isinstance(self.a_content, TextComponent):
-            for child_contents in self.contents:
-                if self.part_title:
-                    result += f"<{self.kind}>{self.part_title}_{self.ids[self.kind]}\n"
-                    result += (
-                        f"-----{self.kind}(f{self.ids[self.kind]}) : {self.part_title}-----\n\n"
-                    )
-                    result += child_contents._show_contents()
-                    result += "\n"
-                else:
-                    result += f"-----{self.kind}(f{self.ids[self.kind]})-----\n\n"
-                    result += child_contents._show_contents()
-                    result += "\n"
-        result += f"<{self.ids['serial_id']}>{self.a_content}"
-        return result
+        return "".join(self.iter_tagged_text())
+
+    def iter_tagged_text(self) -> Iterator[str]:
+        """Yield the subtree in the tagged format, a line at a time.
+
+        EXAMPLE:
+            <chapter>Chapter I_0
+            <paragraph>_0
+            <0>It was a dark and stormy night.
+        """
+        # MEMO: None closes a container with a blank line, without a second stack.
+        stack: list[TextComponent | None] = [self]
+        while stack:
+            node = stack.pop()
+            if node is None:
+                yield "\n"
+            elif isinstance(node.contents, str):
+                yield f"<{node.ids.get('serial_id', '')}>{node.contents}\n"
+            else:
+                yield f"<{node.kind}>{node.part_title}_{node.ids.get(node.kind, 0)}\n"
+                stack.append(None)
+                stack.extend(reversed(node.contents))
+
+    def iter_plain_text(self) -> Iterator[str]:
+        """Yield the subtree as readable text: titles, paragraphs and verse lines.
+
+        Blocks are separated by one blank line, also when a block holds other blocks.
+        """
+        # MEMO: None marks the end of a block.
+        stack: list[TextComponent | None] = [self]
+        # MEMO: True while the output ends with a blank line, so nested blocks end with only one.
+        separated = True
+        while stack:
+            node = stack.pop()
+            if node is None:
+                if not separated:
+                    yield "\n"
+                    separated = True
+                continue
+            if isinstance(node.contents, str):
+                # EXAMPLE: a Sentence rendered on its own.
+                yield f"{node.contents}\n"
+                separated = False
+                continue
+            if node.kind in TITLED_KINDS and node.part_title:
+                yield f"{node.part_title}\n\n"
+                separated = True
+            if node.kind in BLOCK_KINDS:
+                stack.append(None)
+            if node.contents and isinstance(node.contents[0].contents, str):
+                # MEMO: sentences of one block are one line. A block is small, so it is joined.
+                yield " ".join(sentence.contents for sentence in node.contents) + "\n"  # type: ignore
+                separated = False
+            else:
+                stack.extend(reversed(node.contents))
+
+    def iter_json_lines(self) -> Iterator[str]:
+        """Yield a JSON line for each sentence, with the path of containers above it.
+
+        EXAMPLE: {"serial_id": 0, "text": "...", "path": [{"kind": "chapter", "id": 0, "title": "I"}]}
+        """
+        # PERFORMANCE: siblings share one path tuple, so the path is encoded once per parent.
+        last_path: tuple[TextComponent, ...] | None = None
+        encoded_path = ""
+        for path, leaf in self.iter_leaves_with_path():
+            if not isinstance(leaf.contents, str):
+                continue
+            if path is not last_path:
+                last_path = path
+                encoded_path = json.dumps(
+                    [
+                        {
+                            "kind": node.kind,
+                            "id": node.ids.get(node.kind, 0),
+                            "title": node.part_title,
+                        }
+                        for node in path
+                    ],
+                    ensure_ascii=False,
+                )
+            serial_id = json.dumps(leaf.ids.get("serial_id"))
+            text = json.dumps(leaf.contents, ensure_ascii=False)
+            yield f'{{"serial_id": {serial_id}, "text": {text}, "path": {encoded_path}}}\n'
+
+    def iter_rendered(self, style: RenderStyle = "tagged") -> Iterator[str]:
+        match style:
+            case "tagged":
+                return self.iter_tagged_text()
+            case "plain":
+                return self.iter_plain_text()
+            case "jsonl":
+                return self.iter_json_lines()
+            case _:
+                msg = f"Unknown render style: {style}"
+                raise ValueError(msg)
+
+    def write_to(self, fp: IO[str], style: RenderStyle = "tagged") -> None:
+        # PERFORMANCE: chunks go to the file as they come. The whole text is never built.
+        chunks = self.iter_rendered(style)
+        fp.writelines(chunks)
+
+    def iter_nodes(self, kind: str | None = None) -> Iterator[Self]:
+        """Yield this node and its descendants in pre-order.
+
+        Args:
+            kind: EXAMPLE: "chapter". Only nodes of the kind are yielded. None means all.
+        """
+        # MEMO: explicit stack. No list per level, and deep trees never hit the recursion limit.
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if kind is None or node.kind == kind:
+                yield node
+            if not isinstance(node.contents, str):
+                stack.extend(reversed(node.contents))
+
+    def iter_sentences(self) -> Iterator["Sentence"]:  # type: ignore
+        # MEMO: a sentence is a node whose contents is its text.
+        return (node for node in self.iter_nodes() if isinstance(node.contents, str))
+
+    def iter_leaves_with_path(self) -> Iterator[tuple[tuple[Self, ...], Self]]:
+        """Yield each leaf with the path from this node to the parent of the leaf.
+
+        EXAMPLE: ((book, chapter, paragraph), sentence)
+        """
+        stack: list[tuple[tuple[Self, ...], Self]] = [((), self)]
+        while stack:
+            path, node = stack.pop()
+            if isinstance(node.contents, str) or not node.contents:
+                yield path, node
+                continue
+            child_path = (*path, node)
+            stack.extend((child_path, child) for child in reversed(node.contents))
 
     @property
     def sentences(self) -> list["Sentence"]:  # type: ignore
-        return self._get_sentences()
-
-    def _get_sentences(self) -> list["Sentence"]:  # type: ignore
-        sentences = []
-        if isinstance(self.a_content, TextComponent):
-            for item in self.contents:
-                sentences.extend(item._get_sentences())
-        else:
-            sentences.append(self.a_content)
-        return sentences
+        """Sentences of the subtree. The list is cached until the subtree changes. Do not mutate it."""
+        if self.sentence_index is None:
+            sentences = []
+            for node in self.iter_nodes():
+                node.is_observed = True
+                if isinstance(node.contents, str):
+                    sentences.append(node)
+            self.sentence_index = sentences
+        return self.sentence_index
 
     def make_count(self, kinds: str | list[str] | None = None) -> None:
-        for kind in self.ids:
-            if kinds != "serial_id":
-                self.ids[kind] = self._count_with_kind(kind)
-            if kinds == "serial_id":
-                self._make_serial_id_id()
-
-    def _make_serial_id_id(self):
-        count = 0
-        for sentence in self.sentences:
-            sentence.ids["serial_id"] = count
-            count += 1
-
-    def _count_with_kind(self, kind: str, count: int = 0):
-        contents = self.contents
-        if isinstance(self.a_content, TextComponent):
-            for child_contents in contents:
-                if child_contents.kind == kind:
-                    count += 1
-                    count = child_contents._count_with_kind(kind, count)
-                else:
-                    count = child_contents._count_with_kind(kind, count)
-            msg = "data structure is wrong"
+        """Number the subtree in one pre-order pass.
+
+        Each node gets `ids[kind]`, its order among nodes of the same kind, and each sentence gets
+        `ids["serial_id"]`, its order among all sentences. Both start from 0.
+
+        Args:
+            kinds: EXAMPLE: ["chapter", "serial_id"]. Only these are numbered. None means all.
+        """
+        wanted = {kinds} if isinstance(kinds, str) else None if kinds is None else set(kinds)
+        is_serial_wanted = wanted is None or "serial_id" in wanted
+        ordinals: defaultdict[str, int] = defaultdict(int)
+        serial_index: list[Sentence] = []  # type: ignore
+        for node in self.iter_nodes():
+            if wanted is None or node.kind in wanted:
+                node.ids[node.kind] = ordinals[node.kind]
+                ordinals[node.kind] += 1
+            if is_serial_wanted and isinstance(node.contents, str):
+                node.ids["serial_id"] = len(serial_index)
+                serial_index.append(node)
+        if is_serial_wanted:
+            self.serial_index = serial_index
+
+    def find_by_serial_id(self, serial_id: int) -> "Sentence":  # type: ignore
+        # PERFORMANCE: serial ids are dense, so the index is a list and the lookup is O(1).
+        if self.serial_index is None:
+            msg = "serial_id is not numbered. Call make_count first."
             raise ValueError(msg)
-        else:
-            return count
+        return self.serial_index[serial_id]
 
     def __len__(self) -> int:
         return len(self.contents)
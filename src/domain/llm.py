@@ -4,8 +4,6 @@ from enum import Enum
 from time import sleep
 from typing import Literal
 
-import google.generativeai as genai
-
 type TOKEN_COSTS_TABLE = dict[LanguageEnum, int]
 
 type Language = Literal["Japanese", "English"]
@@ -62,6 +60,9 @@ class GEMINI_PRO(LLM):
             output_token_limit=2048,
             token_cost_table=GEMINI_TOKEN_COST_TABLE,
         )
+        # MEMO: imported here, so `domain.componet` and `domain.book` work without the Gemini SDK.
+        import google.generativeai as genai  # noqa: PLC0415
+
         self.model = genai.GenerativeModel("gemini-pro")
 
     def call_llm(self, text: str) -> str:
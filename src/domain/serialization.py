@@ -0,0 +1,230 @@
+"""serialization.py: A versioned binary format and a file cache for TextComponent trees.
+
+Layout (little endian):
+    header: magic b"AKZT", format version (uint16), node count (uint32), text buffer size (uint32)
+    columns: kind code (uint8 x n), parent index (int32 x n), text offset (uint32 x n),
+        text length (uint32 x n)
+    text buffer: utf-8 text of every node. Sentence has its sentence, others have `part_title`.
+
+Nodes are stored in pre-order, so a parent always comes before its children.
+"""
+
+import hashlib
+import os
+import struct
+import sys
+import threading
+from array import array
+from collections.abc import Callable
+from collections.abc import Iterable
+from pathlib import Path
+
+from domain.book import Book
+from domain.book import Chapter
+from domain.book import Line
+from domain.book import Paragraph
+from domain.book import Part
+from domain.book import Section
+from domain.book import Sentence
+from domain.book import Series
+from domain.book import SubParagraph
+from domain.book import SubSection
+from domain.componet import TextComponent
+
+MAGIC = b"AKZT"
+# MEMO: bump this when the layout or KIND_CLASSES changes. Old cache files become misses.
+FORMAT_VERSION = 1
+HEADER = struct.Struct("<4sHII")
+# MEMO: the index is the kind code. Append only.
+KIND_CLASSES: tuple[type[TextComponent], ...] = (
+    TextComponent,
+    Series,
+    Book,
+    Part,
+    Chapter,
+    Section,
+    SubSection,
+    Paragraph,
+    SubParagraph,
+    Line,
+    Sentence,
+)
+KIND_CODES = {component_class: code for code, component_class in enumerate(KIND_CLASSES)}
+NO_PARENT = -1
+
+
+class FormatError(ValueError):
+    pass
+
+
+def _to_little_endian(column: array) -> bytes:
+    if sys.byteorder == "big":
+        column = array(column.typecode, column)
+        column.byteswap()
+    return column.tobytes()
+
+
+def _from_little_endian(typecode: str, data: bytes) -> array:
+    column = array(typecode)
+    column.frombytes(data)
+    if sys.byteorder == "big":
+        column.byteswap()
+    return column
+
+
+def dump_component(root: TextComponent) -> bytes:
+    kinds = array("B")
+    parents = array("i")
+    offsets = array("I")
+    lengths = array("I")
+    texts: list[bytes] = []
+    text_size = 0
+
+    # MEMO: explicit stack instead of recursion. Deep books never hit the recursion limit.
+    stack: list[tuple[TextComponent, int]] = [(root, NO_PARENT)]
+    while stack:
+        node, parent = stack.pop()
+        if (kind := KIND_CODES.get(type(node))) is None:
+            msg = f"Unknown component class: {type(node).__name__}"
+            raise FormatError(msg)
+        index = len(kinds)
+        kinds.append(kind)
+        parents.append(parent)
+        text = (node.contents if isinstance(node, Sentence) else node.part_title).encode("utf-8")
+        offsets.append(text_size)
+        lengths.append(len(text))
+        texts.append(text)
+        text_size += len(text)
+        if not isinstance(node, Sentence):
+            stack.extend((child, index) for child in reversed(node.contents))
+
+    columns = b"".join(_to_little_endian(column) for column in (kinds, parents, offsets, lengths))
+    return HEADER.pack(MAGIC, FORMAT_VERSION, len(kinds), text_size) + columns + b"".join(texts)
+
+
+def read_columns(data: bytes) -> tuple[array, array, array, array, memoryview]:
+    """Check the header and return kind, parent, offset and length columns and the text buffer."""
+    if len(data) < HEADER.size:
+        msg = "Data is too short for a serialized TextComponent."
+        raise FormatError(msg)
+    magic, version, count, text_size = HEADER.unpack_from(data)
+    if magic != MAGIC:
+        msg = f"Unknown magic: {magic!r}"
+        raise FormatError(msg)
+    if version != FORMAT_VERSION:
+        msg = f"Unsupported format version: {version}. expected: {FORMAT_VERSION}"
+        raise FormatError(msg)
+
+    typecodes = ("B", "i", "I", "I")
+    columns_size = sum(array(typecode).itemsize for typecode in typecodes) * count
+    if len(data) - HEADER.size < columns_size:
+        msg = f"Data is truncated. {count} nodes need {columns_size} bytes of columns."
+        raise FormatError(msg)
+    view = memoryview(data)
+    position = HEADER.size
+    columns = []
+    for typecode in typecodes:
+        size = array(typecode).itemsize * count
+        columns.append(_from_little_endian(typecode, view[position : position + size]))
+        position += size
+    if len(data) - position != text_size:
+        msg = f"Text buffer size mismatch. expected: {text_size}, actual: {len(data) - position}"
+        raise FormatError(msg)
+    kinds, parents, offsets, lengths = columns
+    check_columns(kinds, parents, offsets, lengths, text_size)
+    return kinds, parents, offsets, lengths, view[position:]
+
+
+def check_columns(
+    kinds: array, parents: array, offsets: array, lengths: array, text_size: int
+) -> None:
+    # MEMO: a damaged file must raise FormatError, so that `ComponentCache` sees it as a miss.
+    if kinds and max(kinds) >= len(KIND_CLASSES):
+        msg = f"Unknown kind code: {max(kinds)}"
+        raise FormatError(msg)
+    for row, (parent, offset, length) in enumerate(zip(parents, offsets, lengths, strict=True)):
+        # MEMO: pre-order. Only the root has no parent, and a parent comes before its children.
+        if not (parent == NO_PARENT if row == 0 else 0 <= parent < row):
+            msg = f"Invalid parent index: {parent} at row {row}"
+            raise FormatError(msg)
+        if offset + length > text_size:
+            msg = f"Text range is out of the buffer at row {row}."
+            raise FormatError(msg)
+
+
+def load_component(data: bytes) -> TextComponent:
+    kinds, parents, offsets, lengths, text_buffer = read_columns(data)
+    if not kinds:
+        msg = "No node is stored."
+        raise FormatError(msg)
+
+    nodes: list[TextComponent] = []
+    for kind, parent, offset, length in zip(kinds, parents, offsets, lengths, strict=True):
+        try:
+            text = str(text_buffer[offset : offset + length], "utf-8")
+        except UnicodeDecodeError as e:
+            msg = f"Text is not utf-8: {e}"
+            raise FormatError(msg) from e
+        component_class = KIND_CLASSES[kind]
+        if component_class is Sentence:
+            node = Sentence(contents=text)  # type: ignore
+        else:
+            node = component_class(contents=[], part_title=text)
+        if parent != NO_PARENT:
+            nodes[parent].contents.append(node)
+        nodes.append(node)
+    return nodes[0]
+
+
+def hash_sources(
+    paths: Iterable[Path], salt: str = "", read_bytes: Callable[[Path], bytes] = Path.read_bytes
+) -> str:
+    """Hash source files by content. The order of paths matters.
+
+    Args:
+        paths: Files which the tree is built from.
+        salt: EXAMPLE: a converter version, so that a converter change makes a new key.
+        read_bytes: EXAMPLE: `utils.data_io.read_xhtml_bytes` to read packed books.
+    """
+    digest = hashlib.sha256(f"{FORMAT_VERSION}:{salt}".encode())
+    for path in paths:
+        digest.update(path.name.encode("utf-8") + b"\0")
+        digest.update(hashlib.sha256(read_bytes(path)).digest())
+    return digest.hexdigest()
+
+
+class ComponentCache:
+    """Serialized TextComponent trees stored on disk by source hash.
+
+    A hit returns a ready tree without parsing sources or splitting sentences again.
+    """
+
+    def __init__(self, cache_dir: Path) -> None:
+        self.cache_dir = cache_dir
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / key[:2] / f"{key[2:]}.akzt"
+
+    def get(self, key: str) -> TextComponent | None:
+        path = self._path(key)
+        if not path.exists():
+            return None
+        try:
+            return load_component(path.read_bytes())
+        except FormatError:
+            # MEMO: a file of an old format version is the same as a miss.
+            return None
+
+    def put(self, key: str, component: TextComponent) -> None:
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(dump_component(component))
+        os.replace(tmp_path, path)
+
+    def get_or_build[T: TextComponent](self, key: str, build: Callable[[], T]) -> T:
+        if (component := self.get(key)) is not None:
+            return component  # type: ignore
+        component = build()
+        self.put(key, component)
+        return component
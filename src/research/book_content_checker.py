@@ -14,6 +14,7 @@ from lxml.etree import HTMLParser
 from lxml.etree import _Element as Element
 from structlog.stdlib import BoundLogger
 
+from text_process.catalog_index import build_catalog_index
 from utils.logger_config import configure_logger
 
 BOOK_DIR = Path(os.environ.get("BOOK_DIR", "/books"))
@@ -24,19 +25,10 @@ def main():
     configure_logger()
     structlog.get_logger(__name__)
 
-    for repo_dir in list(BOOK_DIR.glob("*")):
-        if repo_dir.is_dir():
-            is_correct_repo = False
-            for file_name in repo_dir.glob("*"):
-                if is_correct_repo:
-                    break
-                if file_name.is_file() and file_name.name.startswith("chapter-1"):
-                    # print(f"Repo {repo_dir} does not have a chapter-* file")
-                    is_correct_repo = True
-                    break
-            if not is_correct_repo:
-                print(f"Repo {repo_dir} doen't have a chapter-* file")
-                pprint(list(repo_dir.glob("*")))
+    with build_catalog_index(BOOK_DIR) as index:
+        for book_name in index.find_books(has_chapter_1=False):
+            print(f"Repo {BOOK_DIR / book_name} doen't have a chapter-* file")
+            pprint(index.files(book_name))
 
 
 if __name__ == "__main__":
@@ -1,12 +1,17 @@
+import argparse
+import fcntl
 import json
 import os
 import shutil
 from collections import Counter
+from collections import defaultdict
+from collections.abc import Iterable
 from dataclasses import asdict
 from dataclasses import dataclass
 from dataclasses import field
 from pathlib import Path
 from pprint import pprint
+from typing import Literal
 from typing import Self
 
 import structlog
@@ -15,7 +20,15 @@ from lxml.etree import HTMLParser
 from lxml.etree import _Element as Element
 from structlog.stdlib import BoundLogger
 
+from text_process.catalog_index import CatalogIndex
+from text_process.catalog_index import build_catalog_index
+from text_process.catalog_index import open_catalog_index
+from utils.data_io import MANIFEST_NAME as BOOK_MANIFEST_NAME
+from utils.data_io import blob_store_dir
+from utils.data_io import read_blob
 from utils.data_io import read_dict
+from utils.data_io import read_manifest
+from utils.data_io import save_bytes
 from utils.data_io import save_chunk
 from utils.data_io import save_xhtml
 from utils.logger_config import configure_logger
@@ -23,46 +36,76 @@ from utils.logger_config import configure_logger
 BOOK_DIR = Path(os.environ.get("BOOK_DIR", "/books"))
 file_name_counter = Counter()
 
-
-def grep_chapter_kind_books():
-    # some book don't have chapter-1.html
-    good_repos = []
-    for repo_dir in list(BOOK_DIR.glob("*")):
-        if repo_dir.is_dir():
-            for file_path in repo_dir.glob("*"):
-                if file_path.is_file() and file_path.name.startswith("chapter-1"):
-                    good_repos.append(repo_dir)
-                    break
-    return good_repos
-
-
-def get_max_nest_level(chapters):
-    max_result = 0
-    for chapter in chapters:
-        if sub_chapters := chapter.get("subchapters"):
-            max_result = max(get_max_nest_level(sub_chapters), max_result)
-        else:
-            max_result = max(chapter["nest_level"], max_result)
-    return max_result
-
-
-def grep_specific_value_nested_books(repos: list[Path], target_nest_value: int):
-    results = []
-    for repo_dir in repos:
-        print("*" * 10)
-        print(f"check {repo_dir}")
-        chapters = read_dict(repo_dir / "toc.json")
-        # print(f"f{repo_dir} has {len(chapters)} chapters.")
-        if not chapters:
-            continue
-        nest_level = get_max_nest_level(chapters)
-        if nest_level == target_nest_value:
-            print(f"{repo_dir} append: {nest_level}")
-            results.append(repo_dir)
-    return results
+# MEMO: ioctl number of FICLONE in linux/fs.h.
+FICLONE = 0x40049409
+MANIFEST_NAME = "manifest.json"
+type LinkMode = Literal["hardlink", "reflink", "copy"]
+# MEMO: "manifest" writes no file of books, only a list of book directories per nest level.
+type DivideMode = LinkMode | Literal["manifest"]
 
 
-def move_files_in_directory(src_dir: Path, dst_dir: Path) -> None:
+def grep_chapter_kind_books(index: CatalogIndex | None = None) -> list[Path]:
+    # some book don't have chapter-1.html
+    with open_catalog_index(index, BOOK_DIR) as index:
+        return [BOOK_DIR / book_name for book_name in index.find_books(has_chapter_1=True)]
+
+
+def grep_specific_value_nested_books(
+    repos: list[Path], target_nest_value: int, index: CatalogIndex | None = None
+) -> list[Path]:
+    # PERFORMANCE: nest levels come from the catalog index instead of reading every toc.json.
+    with open_catalog_index(index, BOOK_DIR) as index:
+        nest_levels = index.nest_levels()
+    return [repo_dir for repo_dir in repos if nest_levels.get(repo_dir.name) == target_nest_value]
+
+
+def bucket_by_nest_level(
+    repos: Iterable[Path], index: CatalogIndex | None = None
+) -> dict[int, list[Path]]:
+    # PERFORMANCE: one pass over repos. The nest level of each book is looked up once.
+    with open_catalog_index(index, BOOK_DIR) as index:
+        nest_levels = index.nest_levels()
+    buckets: dict[int, list[Path]] = defaultdict(list)
+    for repo_dir in sorted(repos):
+        if (nest_level := nest_levels.get(repo_dir.name)) is not None:
+            buckets[nest_level].append(repo_dir)
+    return dict(sorted(buckets.items()))
+
+
+def reflink(src_file: Path, dst_file: Path) -> None:
+    # MEMO: copy-on-write clone. It works on btrfs and xfs, and raises OSError on other fs.
+    with open(src_file, "rb") as src_fp, open(dst_file, "wb") as dst_fp:
+        fcntl.ioctl(dst_fp.fileno(), FICLONE, src_fp.fileno())
+
+
+def link_file(src_file: Path, dst_file: Path, mode: LinkMode) -> None:
+    if dst_file.exists():
+        if dst_file.samefile(src_file):
+            return
+        dst_file.unlink()
+    try:
+        match mode:
+            case "hardlink":
+                os.link(src_file, dst_file)
+                return
+            case "reflink":
+                reflink(src_file, dst_file)
+                return
+    except OSError:
+        # EXAMPLE: the destination is on another device, or the fs does not support reflink.
+        dst_file.unlink(missing_ok=True)
+    shutil.copy2(src_file, dst_file)
+
+
+def move_files_in_directory(src_dir: Path, dst_dir: Path, mode: LinkMode = "hardlink") -> None:
+    """Put the files of a book into `dst_dir/<book name>`.
+
+    Files of a packed book are read from the blob store and written out, so the result is a plain
+    book directory. It does not need `BOOK_DIR/.objects` next to it.
+
+    WARNING: a hard link is the same file as the original in BOOK_DIR. Editing it in place changes
+    the original too. Replace it (write a new file and rename), or use "reflink" or "copy".
+    """
     if not src_dir.is_dir():
         msg = f"Source path '{src_dir}' is not a directory."
         raise NotADirectoryError(msg)
@@ -70,39 +113,70 @@ def move_files_in_directory(src_dir: Path, dst_dir: Path) -> None:
     dst_dir_path.mkdir(parents=True, exist_ok=True)
 
     for src_file in src_dir.iterdir():
-        if src_file.is_file():
-            dst_file_path = dst_dir_path / src_file.name
-            shutil.copy(src_file, dst_file_path)
-
-
-def divide_with_nest_deep(repos, dst_dir: Path) -> None:
-    for nest in range(10):
-        target_repos = grep_specific_value_nested_books(repos, nest)
-
-        if not target_repos:
-            continue
+        # MEMO: the book manifest points to the blob store, which is not next to dst_dir.
+        if src_file.is_file() and src_file.name != BOOK_MANIFEST_NAME:
+            link_file(src_file, dst_dir_path / src_file.name, mode)
+
+    store_dir = blob_store_dir(src_dir)
+    for name, sha in read_manifest(src_dir).items():
+        if not (src_dir / name).exists():
+            save_bytes([read_blob(sha, store_dir)], dst_dir_path / name, None, sha)
+
+
+def divide_with_nest_deep(
+    repos, dst_dir: Path, index: CatalogIndex | None = None, mode: DivideMode = "hardlink"
+) -> dict[int, list[Path]]:
+    """Put books into `dst_dir/nest_N` by the max nest level of their toc.
+
+    Args:
+        repos: Book directories.
+        dst_dir: EXAMPLE: tutorial_data/chaptered
+        index: A catalog index. When it is None, one is built from BOOK_DIR and closed after use.
+        mode: "hardlink", "reflink" or "copy" makes files. Hard links and reflinks fall back to
+            copy when they fail. Hard links share data with BOOK_DIR, see `move_files_in_directory`.
+            "manifest" only writes `nest_N/manifest.json` which lists books.
+
+    Returns:
+        Book directories by nest level.
+    """
+    buckets = bucket_by_nest_level(repos, index)
+    for nest, target_repos in buckets.items():
         target_dir = dst_dir / f"nest_{nest}"
         target_dir.mkdir(parents=True, exist_ok=True)
 
+        if mode == "manifest":
+            save_chunk(
+                [str(src_dir) for src_dir in target_repos], target_dir / MANIFEST_NAME, None
+            )
+            continue
         for src_dir in target_repos:
-            print(f"move {src_dir} to {target_dir}")
-            move_files_in_directory(src_dir, target_dir)
+            print(f"{mode} {src_dir} to {target_dir}")
+            move_files_in_directory(src_dir, target_dir, mode)
+    return buckets
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Divide books by the nest level of their toc.")
+    parser.add_argument(
+        "--mode",
+        choices=["hardlink", "reflink", "copy", "manifest"],
+        default="hardlink",
+        help="hardlink shares files with BOOK_DIR. Do not edit them in place.",
+    )
+    args = parser.parse_args()
+
     configure_logger()
-    structlog.get_logger(__name__)
-    chapter_books = grep_chapter_kind_books()
-    chapter_book_dir = Path("/home/user/dev/kasi-x/akizora/tutorial_data/chaptered")
-
-    divide_with_nest_deep(chapter_books, chapter_book_dir)
-    all_books = {
-        files for files in BOOK_DIR.glob("*") if files.is_dir() and not files.name.startswith(".")
-    }
-    not_chapter_books = all_books.difference(chapter_books)
-    not_chapter_book_dir = Path("/home/user/dev/kasi-x/akizora/tutorial_data/unchapetr")
-
-    divide_with_nest_deep(not_chapter_books, not_chapter_book_dir)
+    logger = structlog.get_logger(__name__)
+    with build_catalog_index(BOOK_DIR, logger) as index:
+        chapter_books = grep_chapter_kind_books(index)
+        chapter_book_dir = Path("/home/user/dev/kasi-x/akizora/tutorial_data/chaptered")
+
+        divide_with_nest_deep(chapter_books, chapter_book_dir, index, args.mode)
+        all_books = {BOOK_DIR / book_name for book_name in index.find_books()}
+        not_chapter_books = all_books.difference(chapter_books)
+        not_chapter_book_dir = Path("/home/user/dev/kasi-x/akizora/tutorial_data/unchapetr")
+
+        divide_with_nest_deep(not_chapter_books, not_chapter_book_dir, index, args.mode)
 
 
 if __name__ == "__main__":
@@ -13,6 +13,9 @@ from lxml import etree
 from lxml.etree import XMLParser
 from lxml.etree import _Element as Element
 
+from utils.xhtml import find_body_sections
+from utils.xhtml import find_title
+
 
 @dataclass
 class TextComponent:
@@ -41,39 +44,36 @@ class XhtmlSection:
 
 
 def get_page_title(data_root) -> str:
-    namespaces = {"xhtml": "http://www.w3.org/1999/xhtml"}
-    return data_root.xpath("//xhtml:head/xhtml:title", namespaces=namespaces)[0].text
+    return find_title(data_root)  # type: ignore
 
 
 def process_blockquote(blockquote):
     """Blockquote 要素からテキストを抽出して整形します."""
-    namespaces = {"xhtml": "http://www.w3.org/1999/xhtml"}
-
     blocks = []
-    for div in blockquote.findall("xhtml:div", namespaces=namespaces):
-        header_text = div.find("xhtml:header/xhtml:p", namespaces=namespaces).text
+    for div in blockquote.findall("div"):
+        header_text = div.find("header/p").text
         if header_text:
             blocks.append(f"**{header_text}**")
 
         # 各span要素からテキストを抽出する
-        paragraph = " ".join(
-            span.text for span in div.findall("xhtml:p/xhtml:span", namespaces=namespaces)
-        )
+        paragraph = " ".join(span.text for span in div.findall("p/span"))
         blocks.append(paragraph)
 
     return "\n".join(blocks)
 
 
-def process_hgroup(hgroup):
-    namespaces = {"xhtml": "http://www.w3.org/1999/xhtml"}
+def find_child_text(element: Element, tag: str, epub_type: str) -> str | None:
+    # MEMO: the html parser of utils.xhtml keeps `epub:type` as a plain attribute name.
+    for child in element:
+        if child.tag == tag and child.get("epub:type") == epub_type:
+            return child.text
+    return None
 
+
+def process_hgroup(hgroup):
     return HgroupInfo(
-        ordinal=hgroup.find("xhtml:h2[@epub:type='ordinal']", namespaces=namespaces).text
-        if hgroup.find("xhtml:h2[@epub:type='ordinal']", namespaces=namespaces)
-        else None,
-        title=hgroup.find("xhtml:p[@epub:type='title']", namespaces=namespaces).text
-        if hgroup.find("xhtml:p[@epub:type='title']", namespaces=namespaces)
-        else None,
+        ordinal=find_child_text(hgroup, "h2", "ordinal"),
+        title=find_child_text(hgroup, "p", "title"),
     )
 
 
@@ -88,33 +88,27 @@ def parse_xhtml(xhtml_element: Element) -> TextComponent:
     """XHTMLデータを解析し、TextComponentインスタンスを生成します。.
 
     Args:
-        xhtml_element: XHTMLデータ
+        xhtml_element: XHTMLデータ. EXAMPLE: `utils.xhtml.read_root(path)`
 
     Returns:
         TextComponentインスタンス
     """
-    namespaces = {"xhtml": "http://www.w3.org/1999/xhtml"}
-
     title = get_page_title(xhtml_element)
 
     sections = []
-    for section in xhtml_element.xpath("//xhtml:body/xhtml:section", namespaces=namespaces):
+    for section in find_body_sections(xhtml_element):
         section_id = section.get("id")
         epub_type = section.get("epub:type")
         hgroup_info = HgroupInfo(
-            ordinal=section.find("xhtml:h2", namespaces=namespaces).text
-            if section.find("xhtml:h2", namespaces=namespaces) is not None
-            else None,
-            title=section.find("xhtml:p", namespaces=namespaces).text
-            if section.find("xhtml:p", namespaces=namespaces) is not None
-            else None,
+            ordinal=h2.text if (h2 := section.find("h2")) is not None else None,
+            title=p.text if (p := section.find("p")) is not None else None,
         )
 
         paragraphs = []
         temporary_subsection = []
 
         for element in section:
-            if element.tag == "{http://www.w3.org/1999/xhtml}p":
+            if element.tag == "p":
                 if temporary_subsection:
                     subsection = process_subsection(temporary_subsection)
                     paragraphs.append(subsection)
@@ -145,11 +139,8 @@ def main():
         file_info_dict = get_file_info(url, headers)
         with open(f"{title}.json", "w") as fp:
             json.dump(file_info_dict, fp)
-    # xml_string = file_info_dict.get("chapter-1.xhtml")
-    # parser = XMLParser(
-    #     encoding="UTF-8", resolve_entities=False, strip_cdata=False, recover=True, ns_clean=True
-    # )
-    # root = ET.fromstring(xml_string, parser)
+    # MEMO: parse through utils.xhtml, which shares the parser and caches the root.
+    # root = read_root(f"{title}/chapter-1.xhtml")
     # parse_xhtml(root)
     #
     # pretty_xml = etree.tostring(root, pretty_print=True, encoding=str)
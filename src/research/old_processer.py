@@ -1,5 +1,6 @@
 import pprint
 import re
+from pathlib import Path
 
 from bs4 import BeautifulSoup as bs
 
@@ -9,6 +10,7 @@ from domain.tag import ProtoChapter
 from domain.tag import ProtoLine
 from domain.tag import ProtoSection
 from domain.tag import ProtoTextComponent
+from text_process.plain_text import read_normalized_text
 
 unsorted_tag_priorities = {
     "PART": 5,
@@ -361,8 +363,8 @@ def proto_to_domain(proto: ProtoTextComponent) -> TextComponent:
 
 
 def main():
-    text = open("sample.txt").read()
-    text = remove_single_newlines(text)
+    # PERFORMANCE: the file is mapped and normalized in one pass. See `remove_single_newlines`.
+    text = read_normalized_text(Path("sample.txt"))
 
     taged_text = make_component_tag(text)
 
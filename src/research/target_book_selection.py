@@ -14,6 +14,9 @@ from lxml.etree import HTMLParser
 from lxml.etree import _Element as Element
 from structlog.stdlib import BoundLogger
 
+from text_process.catalog_index import CatalogIndex
+from text_process.catalog_index import build_catalog_index
+from text_process.catalog_index import open_catalog_index
 from utils.data_io import read_dict
 from utils.data_io import save_chunk
 from utils.data_io import save_xhtml
@@ -23,48 +26,24 @@ BOOK_DIR = Path(os.environ.get("BOOK_DIR", "/books"))
 file_name_counter = Counter()
 
 
-def grep_chapter_books():
-    good_repos = []
-    for repo_dir in list(BOOK_DIR.glob("*")):
-        if repo_dir.is_dir():
-            for file_path in repo_dir.glob("*"):
-                if file_path.is_file() and file_path.name.startswith("chapter-1"):
-                    good_repos.append(repo_dir)
-                    break
-    return good_repos
+def grep_chapter_books(index: CatalogIndex | None = None) -> list[Path]:
+    with open_catalog_index(index, BOOK_DIR) as index:
+        return [BOOK_DIR / book_name for book_name in index.find_books(has_chapter_1=True)]
 
 
-def get_max_nest_level(chapters):
-    max_result = 0
-    for chapter in chapters:
-        if sub_chapters := chapter.get("subchapters"):
-            max_result = max(get_max_nest_level(sub_chapters), max_result)
-        else:
-            max_result = max(chapter["nest_level"], max_result)
-    return max_result
-
-
-def grep_shallow_nested_books(repos: list[Path]):
-    results = []
-    for repo_dir in repos:
-        chapters = read_dict(repo_dir / "toc.json")
-        print(f"f{repo_dir} has {len(chapters)} chapters.")
-        if not chapters:
-            continue
-        nest_level = get_max_nest_level(chapters)
-        if 1 <= nest_level < 2:
-            print(f"{repo_dir} append: {nest_level}")
-            results.append(repo_dir)
-        else:
-            print(f"{repo_dir} has deep nest level: {nest_level}")
-    return results
+def grep_shallow_nested_books(repos: list[Path], index: CatalogIndex | None = None) -> list[Path]:
+    # PERFORMANCE: nest levels come from the catalog index instead of reading every toc.json.
+    with open_catalog_index(index, BOOK_DIR) as index:
+        shallow_books = set(index.find_books(min_nest_level=1, max_nest_level=1))
+    return [repo_dir for repo_dir in repos if repo_dir.name in shallow_books]
 
 
 def main():
     configure_logger()
     logger = structlog.get_logger(__name__)
-    good_repos = grep_chapter_books()
-    good_repos = grep_shallow_nested_books(good_repos)
+    with build_catalog_index(BOOK_DIR, logger) as index:
+        good_repos = grep_chapter_books(index)
+        good_repos = grep_shallow_nested_books(good_repos, index)
     pprint(good_repos)
     data = [str(data) for data in good_repos]
     save_chunk(data, BOOK_DIR / "easy_readable_books.json", logger)
@@ -0,0 +1,187 @@
+"""crawl.py: A driver to crawl many Standard Ebooks repositories in parallel.
+
+EXAMPLE: python -m scrayping.crawl --workers 8 --mode archive --limit 100
+"""
+
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from dataclasses import dataclass
+from dataclasses import field
+from pathlib import Path
+
+import structlog
+from structlog.stdlib import BoundLogger
+
+from scrayping.crawl_journal import CrawlJournal
+from scrayping.github_api import DEFAULT_MAX_WORKERS
+from scrayping.github_api import GithubApiManager
+from scrayping.github_api import RepositoryInfo
+from scrayping.standard_ebooks import FetchMode
+from scrayping.standard_ebooks import build_crawl_journal
+from scrayping.standard_ebooks import build_github_api_manager
+from scrayping.standard_ebooks import fetch_all_repositories
+from scrayping.standard_ebooks import fetch_book_data
+from scrayping.standard_ebooks import pack_book
+from scrayping.standard_ebooks import target_book_dir
+from utils.data_io import read_dict
+from utils.logger_config import configure_logger
+
+DEFAULT_BOOK_WORKERS = 4
+
+
+@dataclass
+class BookResult:
+    book_name: str
+    files: int
+    bytes: int
+    seconds: float
+    error: str | None = None
+
+
+@dataclass
+class CrawlStats:
+    """Thread-safe totals of a crawl. Rates are measured from the start of the crawl."""
+
+    total_books: int
+    started_at: float = field(default_factory=time.monotonic)
+    done_books: int = 0
+    failed_books: int = 0
+    files: int = 0
+    bytes: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def add(self, result: BookResult) -> None:
+        with self.lock:
+            self.done_books += 1
+            self.failed_books += result.error is not None
+            self.files += result.files
+            self.bytes += result.bytes
+
+    def summary(self) -> dict[str, float | int]:
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        return {
+            "done_books": self.done_books,
+            "total_books": self.total_books,
+            "failed_books": self.failed_books,
+            "files": self.files,
+            "bytes": self.bytes,
+            "files_per_sec": round(self.files / elapsed, 2),
+            "bytes_per_sec": round(self.bytes / elapsed, 1),
+            "elapsed_sec": round(elapsed, 1),
+        }
+
+
+def snapshot_book_dir(book_dir: Path) -> dict[str, float]:
+    if not book_dir.is_dir():
+        return {}
+    return {path.name: path.stat().st_mtime for path in book_dir.iterdir() if path.is_file()}
+
+
+def crawl_book(
+    book_name: str,
+    force: bool,
+    mode: FetchMode,
+    logger: BoundLogger,
+    github: GithubApiManager,
+    journal: CrawlJournal,
+    pack: bool = False,
+) -> BookResult:
+    # MEMO: count files written by this book from mtimes. It works for both api and archive modes.
+    book_dir = target_book_dir(book_name)
+    before = snapshot_book_dir(book_dir)
+    started_at = time.monotonic()
+    error = None
+    try:
+        fetch_book_data(book_name, force, logger, github, mode, journal)
+    except Exception as e:
+        logger.exception("Failed to crawl book.", book_name=book_name, error=str(e))
+        error = str(e)
+
+    # MEMO: count before packing, which removes the loose files.
+    written = [
+        name for name, mtime in snapshot_book_dir(book_dir).items() if before.get(name) != mtime
+    ]
+    written_bytes = sum((book_dir / name).stat().st_size for name in written)
+    if pack and error is None:
+        try:
+            pack_book(book_name, logger)
+        except Exception as e:
+            # MEMO: one book which fails to pack must not stop the other books.
+            logger.exception("Failed to pack book.", book_name=book_name, error=str(e))
+            error = str(e)
+
+    return BookResult(
+        book_name=book_name,
+        files=len(written),
+        bytes=written_bytes,
+        seconds=time.monotonic() - started_at,
+        error=error,
+    )
+
+
+def crawl_books(
+    repositories: list[RepositoryInfo],
+    workers: int = DEFAULT_BOOK_WORKERS,
+    force: bool = False,
+    mode: FetchMode = "api",
+    logger: BoundLogger = structlog.get_logger(__name__),
+    pack: bool = False,
+) -> CrawlStats:
+    """Crawl books with a bounded worker pool.
+
+    All workers share one GithubApiManager, so one connection pool and one rate limit budget,
+    and one crawl journal.
+    """
+    # MEMO: every book worker may run `max_workers` blob requests at once.
+    github = build_github_api_manager(pool_size=workers * DEFAULT_MAX_WORKERS)
+    stats = CrawlStats(total_books=len(repositories))
+
+    with build_crawl_journal() as journal, ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(crawl_book, repo["name"], force, mode, logger, github, journal, pack)
+            for repo in repositories
+        ]
+        for future in as_completed(futures):
+            result = future.result()
+            stats.add(result)
+            logger.info(
+                "Book crawled.",
+                book_name=result.book_name,
+                book_files=result.files,
+                book_bytes=result.bytes,
+                book_seconds=round(result.seconds, 2),
+                error=result.error,
+                **stats.summary(),
+            )
+
+    logger.info("Crawl finished.", **stats.summary())
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Crawl Standard Ebooks repositories in parallel.")
+    parser.add_argument("--workers", type=int, default=DEFAULT_BOOK_WORKERS)
+    parser.add_argument("--mode", choices=["api", "archive"], default="api")
+    parser.add_argument("--force", action="store_true")
+    parser.add_argument("--pack", action="store_true", help="move text files into blob store.")
+    parser.add_argument("--limit", type=int, default=None, help="crawl only the first N books.")
+    parser.add_argument(
+        "--repositories", type=Path, default=None, help="repository list json. default: today's."
+    )
+    args = parser.parse_args()
+
+    configure_logger()
+    logger = structlog.get_logger(__name__)
+
+    if args.repositories:
+        repositories: list[RepositoryInfo] = read_dict(args.repositories, logger)  # type: ignore
+    else:
+        repositories = fetch_all_repositories(False, logger)
+    crawl_books(repositories[: args.limit], args.workers, args.force, args.mode, logger, args.pack)
+
+
+if __name__ == "__main__":
+    main()
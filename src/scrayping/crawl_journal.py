@@ -0,0 +1,110 @@
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from types import TracebackType
+from typing import Literal
+from typing import Self
+from typing import TypedDict
+
+from scrayping.github_api import FileInfo
+
+# MEMO: pending -> fetched -> verified. fetched means the file is saved but has no sha to check.
+type BlobState = Literal["pending", "fetched", "verified", "failed"]
+COMPLETE_STATES: tuple[BlobState, ...] = ("fetched", "verified")
+
+
+class JournalEntry(TypedDict):
+    book_name: str
+    path: str
+    sha: str | None
+    url: str
+    state: BlobState
+    error: str | None
+
+
+class CrawlJournal:
+    """A per-blob crawl state log stored in SQLite.
+
+    Every blob of `save_files` is recorded as pending before download, and updated when it is saved.
+    A resumed crawl only retries entries which are not complete, without walking the whole catalog.
+    This is shared by worker threads, so every access is serialized by a lock.
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.lock, self.connection:
+            self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS blobs (
+                    book_name TEXT NOT NULL,
+                    path TEXT NOT NULL,
+                    sha TEXT,
+                    url TEXT NOT NULL,
+                    state TEXT NOT NULL,
+                    error TEXT,
+                    updated_at REAL NOT NULL,
+                    PRIMARY KEY (book_name, path)
+                )
+                """
+            )
+
+    def mark_pending(self, book_name: str, file_infos: list[FileInfo]) -> None:
+        with self.lock, self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO blobs VALUES (?, ?, ?, ?, 'pending', NULL, ?)",
+                [
+                    (book_name, info["path"], info.get("sha"), info["url"], time.time())
+                    for info in file_infos
+                ],
+            )
+
+    def mark(self, book_name: str, path: str, state: BlobState, error: str | None = None) -> None:
+        with self.lock, self.connection:
+            self.connection.execute(
+                "UPDATE blobs SET state = ?, error = ?, updated_at = ? "
+                "WHERE book_name = ? AND path = ?",
+                (state, error, time.time(), book_name, path),
+            )
+
+    def incomplete_entries(self, book_name: str | None = None) -> list[JournalEntry]:
+        query = (
+            "SELECT book_name, path, sha, url, state, error FROM blobs WHERE state NOT IN (?, ?)"
+        )
+        params: tuple[str, ...] = COMPLETE_STATES
+        if book_name is not None:
+            query += " AND book_name = ?"
+            params = (*params, book_name)
+        with self.lock:
+            rows = self.connection.execute(query + " ORDER BY book_name, path", params)
+            return [JournalEntry(**row) for row in rows]  # type: ignore
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+
+def to_file_info(entry: JournalEntry) -> FileInfo:
+    return FileInfo(
+        path=entry["path"],
+        mode="100644",
+        type="blob",
+        sha=entry["sha"],  # type: ignore
+        # MEMO: the journal does not record sizes. Nothing reads size on the resume path.
+        size=0,
+        url=entry["url"],
+    )
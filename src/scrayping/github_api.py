@@ -1,18 +1,48 @@
 import base64
+import hashlib
+import json
 import os
+import random
+import threading
+import time
+from collections.abc import Callable
+from collections.abc import Iterable
+from collections.abc import Iterator
+from collections.abc import Mapping
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import as_completed
+from pathlib import Path
 from typing import Annotated
 from typing import Literal
+from typing import NotRequired
 from typing import TypedDict
 
 import requests
 import structlog
 from pydantic import AnyUrl
 from pydantic import UrlConstraints
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
 from structlog.stdlib import BoundLogger
 
 from utils.logger_config import configure_logger
 
 GithubApiUrlDomain = "https://api.github.com"
+# MEMO: GitHub recommends to avoid too many concurrent requests. 8 is enough to hide latency.
+DEFAULT_MAX_WORKERS = 8
+# MEMO: burst size of the token bucket. Short crawls don't need to be paced at all.
+DEFAULT_BURST = 100
+MAX_RETRIES = 5
+# MEMO: GitHub docs say "wait for at least one minute" on secondary rate limit without Retry-After.
+BACKOFF_BASE_SECONDS = 60.0
+BACKOFF_MAX_SECONDS = 15 * 60.0
+# MEMO: max page size of the GitHub API. Default is 30.
+REPOSITORIES_PER_PAGE = 100
+# MEMO: with this media type, blobs and contents api return the file itself instead of base64 json.
+RAW_MEDIA_TYPE = "application/vnd.github.raw"
+RAW_CHUNK_SIZE = 64 * 1024
+# MEMO: response headers kept in the http cache. Link is needed to paginate from cached pages.
+CACHED_HEADERS = ("ETag", "Last-Modified", "Link", "Content-Type")
 
 
 # DEBT: Not using pydantic was better and having type system consistency. It causes many `# type: ignore`.
@@ -32,6 +62,29 @@ def build_github_tree_api(owner: str, repo: str, path: str) -> GithubApiUrl:
     return f"https://api.github.com/repos/{owner}/{repo}/git/trees/master:{path}"  # type: ignore
 
 
+def build_github_blob_api(owner: str, repo: str, sha: str) -> GithubApiUrl:
+    return f"https://api.github.com/repos/{owner}/{repo}/git/blobs/{sha}"  # type: ignore
+
+
+def build_github_tarball_api(owner: str, repo: str) -> GithubApiUrl:
+    # MEMO: GitHub redirects this to codeload.github.com. It costs only one API request per repo.
+    return f"https://api.github.com/repos/{owner}/{repo}/tarball/master"  # type: ignore
+
+
+def calc_git_blob_sha(data: bytes) -> str:
+    # MEMO: same as `git hash-object`. It lets files from archive be compared with tree info sha.
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()  # noqa: S324
+
+
+def calc_git_blob_sha_of_file(path: Path) -> str:
+    # MEMO: same as `calc_git_blob_sha`, but reads the file by chunk to keep memory flat.
+    sha = hashlib.sha1(b"blob %d\0" % path.stat().st_size)  # noqa: S324
+    with open(path, "rb") as fp:
+        while chunk := fp.read(RAW_CHUNK_SIZE):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
 class FileInfo(TypedDict):
     # EXAMPLE: GitHub API response about file info without content itself.
     """{'path': 'chapter-1.xhtml',
@@ -45,7 +98,8 @@ class FileInfo(TypedDict):
     path: str
     mode: str
     type: Literal["blob", "tree"]
-    size: str
+    sha: str
+    size: int
     url: str
 
 
@@ -73,13 +127,153 @@ class RepositoryInfo(TypedDict):
     {'name': 'a-a-milne_the-red-house-mystery',
     "url": "https://github.com/standardebooks/a-a-milne_the-red-house-mystery",
     "owner": "standardebooks",
-    "description": "Epub source for the Standard Ebooks edition of The Red House Mystery, by A. A. Milne"}.
+    "description": "Epub source for the Standard Ebooks edition of The Red House Mystery, by A. A. Milne",
+    "pushed_at": "2024-03-28T02:10:51Z"}.
     """
 
     name: str
     url: str
     owner: str
     description: str
+    # MEMO: old snapshots don't have pushed_at.
+    pushed_at: NotRequired[str]
+
+
+def to_repository_info(repo_data: dict) -> RepositoryInfo:
+    return RepositoryInfo(
+        name=repo_data["name"],
+        url=repo_data["html_url"],
+        owner=repo_data["owner"]["login"],
+        description=repo_data["description"],
+        pushed_at=repo_data["pushed_at"],
+    )
+
+
+class RequestScheduler:
+    """A token bucket paced by GitHub rate limit headers.
+
+    The bucket is refilled at `remaining / seconds_until_reset`, so the quota is spread evenly until
+    the reset time instead of being burned at the start and waiting for an hour.
+    When the quota is exhausted, `acquire` blocks until `X-RateLimit-Reset`.
+    This is shared by all threads of a `GithubApiManager`.
+    """
+
+    def __init__(self, burst: int = DEFAULT_BURST) -> None:
+        self.lock = threading.Lock()
+        self.burst = burst
+        self.tokens = float(burst)
+        # MEMO: None means we have not seen rate limit headers yet, so no pacing.
+        self.rate: float | None = None
+        self.remaining: int | None = None
+        self.reset_at = 0.0
+        self.updated_at = time.monotonic()
+
+    def acquire(self) -> None:
+        while True:
+            with self.lock:
+                wait = self._reserve()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def _reserve(self) -> float:
+        # RETURNS: seconds to wait before trying again. 0 means a token is reserved.
+        if self.remaining == 0:
+            if (wait := self.reset_at - time.time()) > 0:
+                return wait + 1
+            self.remaining, self.rate, self.tokens = None, None, float(self.burst)
+
+        now = time.monotonic()
+        if self.rate is not None:
+            self.tokens = min(float(self.burst), self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+        if self.rate is not None and self.tokens < 1:
+            return (1 - self.tokens) / self.rate
+        self.tokens -= 1
+        if self.remaining:
+            self.remaining -= 1
+        return 0
+
+    def update(self, headers: Mapping[str, str]) -> None:
+        remaining, reset_at = (
+            headers.get("X-RateLimit-Remaining"),
+            headers.get("X-RateLimit-Reset"),
+        )
+        if remaining is None or reset_at is None:
+            return
+        with self.lock:
+            self.remaining = int(remaining)
+            self.reset_at = float(reset_at)
+            self.rate = self.remaining / max(self.reset_at - time.time(), 1.0)
+
+
+class CachedResponse(TypedDict):
+    url: str
+    headers: dict[str, str]
+    body: str
+
+
+class ResponseCache:
+    """An on-disk http cache for conditional requests, keyed by url.
+
+    GitHub doesn't count 304 Not Modified against the rate limit, so sending `If-None-Match` with
+    the stored ETag makes re-crawling unchanged books almost free.
+    EXAMPLE: {cache_dir}/3f/3f1c...e2.json
+    """
+
+    def __init__(self, cache_dir: Path) -> None:
+        self.cache_dir = cache_dir
+
+    def _path(self, url: str) -> Path:
+        key = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, url: str) -> CachedResponse | None:
+        path = self._path(url)
+        if not path.exists():
+            return None
+        try:
+            with open(path) as fp:
+                return json.load(fp)
+        except (OSError, ValueError):
+            # MEMO: a broken cache entry is the same as no cache entry.
+            return None
+
+    def put(self, url: str, response: requests.Response) -> None:
+        headers = {key: response.headers[key] for key in CACHED_HEADERS if key in response.headers}
+        if "ETag" not in headers and "Last-Modified" not in headers:
+            return
+        path = self._path(url)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # MEMO: write and rename, because many threads may write the same entry.
+        tmp_path = path.with_suffix(f".{threading.get_ident()}.tmp")
+        with open(tmp_path, "w") as fp:
+            # MEMO: GitHub api responses are utf-8. Guessing the charset of raw files is slow.
+            body = response.content.decode("utf-8")
+            json.dump(CachedResponse(url=url, headers=headers, body=body), fp)
+        tmp_path.replace(path)
+
+    @staticmethod
+    def conditional_headers(cached: CachedResponse | None) -> dict[str, str]:
+        if cached is None:
+            return {}
+        headers = {}
+        if etag := cached["headers"].get("ETag"):
+            headers["If-None-Match"] = etag
+        if last_modified := cached["headers"].get("Last-Modified"):
+            headers["If-Modified-Since"] = last_modified
+        return headers
+
+    @staticmethod
+    def to_response(cached: CachedResponse) -> requests.Response:
+        response = requests.Response()
+        response.status_code = 200
+        response.url = cached["url"]
+        response.headers = CaseInsensitiveDict(cached["headers"])
+        response.encoding = "utf-8"
+        response._content = cached["body"].encode("utf-8")  # noqa: SLF001
+        return response
 
 
 class GithubApiManager:
@@ -90,12 +284,32 @@ class GithubApiManager:
     Attributes:
     logger: A logger object for logging API requests and responses.
     headers: A dictionary of headers for API requests.
+    max_workers: The number of concurrent requests in `fetch_many_file_content_data`.
+    session: A pooled session shared by all requests. It is thread-safe enough for GET only usage.
+        Its pool keeps `pool_size` connections, which defaults to `max_workers`.
+    scheduler: A token bucket which paces requests to the remaining rate limit budget.
+    cache: An on-disk ETag cache. Conditional requests are not sent when it is None.
     """
 
-    def __init__(self) -> None:
+    def __init__(
+        self,
+        max_workers: int = DEFAULT_MAX_WORKERS,
+        cache_dir: Path | None = None,
+        pool_size: int | None = None,
+    ) -> None:
         self.logger = structlog.get_logger(__name__).bind(module="github_api")
         access_token = os.environ["GITHUB_PERSONAL_ACCESS_TOKEN"]
         self.headers = {"Authorization": f"token {access_token}"}
+        self.max_workers = max_workers
+        # PERFORMANCE: reuse TLS connections. bare `requests.get` opens a new connection per call.
+        self.session = requests.Session()
+        self.session.headers.update(self.headers)
+        self.session.mount(
+            "https://",
+            HTTPAdapter(pool_connections=max_workers, pool_maxsize=pool_size or max_workers),
+        )
+        self.scheduler = RequestScheduler()
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
 
     def _log_api_request(self, url: str, method="GET") -> None:
         self.logger.info("API Request", url=url, method=method)
@@ -108,10 +322,60 @@ class GithubApiManager:
         else:
             self.logger.debug("API Request Successful", url=url, status_code=status_code)
 
+    def _get(self, url: str, accept: str | None = None) -> requests.Response:
+        headers = {"Accept": accept} if accept else {}
+        if self.cache is None:
+            return self._send(url, headers)
+
+        # MEMO: the same url returns a different body for a different media type.
+        cache_key = f"{url} {accept}" if accept else url
+        cached = self.cache.get(cache_key)
+        response = self._send(url, headers | ResponseCache.conditional_headers(cached))
+        if cached is not None and response.status_code == 304:
+            self.logger.debug("API Response Not Modified", url=url)
+            return ResponseCache.to_response(cached)
+        if response.status_code == 200:
+            self.cache.put(cache_key, response)
+        return response
+
+    def _send(
+        self, url: str, headers: dict[str, str] | None = None, stream: bool = False
+    ) -> requests.Response:
+        for attempt in range(MAX_RETRIES + 1):
+            self.scheduler.acquire()
+            self._log_api_request(url)
+            response = self.session.get(url, headers=headers, stream=stream)
+            self.scheduler.update(response.headers)
+            # PERFORMANCE: `text` is only logged on failure. Decoding every body is waste, and for
+            # a streamed response it would load the whole body.
+            self._log_api_response(
+                url, response.status_code, response.text if response.status_code >= 400 else ""
+            )
+
+            wait = self._retry_wait(response, attempt)
+            if wait is None or attempt == MAX_RETRIES:
+                return response
+            self.logger.warning("Rate limited. Retrying.", url=url, wait=wait, attempt=attempt)
+            time.sleep(wait)
+        return response
+
+    def _retry_wait(self, response: requests.Response, attempt: int) -> float | None:
+        # RETURNS: seconds to wait before retrying. None means the response should not be retried.
+        if response.status_code not in {403, 429}:
+            return None
+        if retry_after := response.headers.get("Retry-After"):
+            return float(retry_after)
+        if response.headers.get("X-RateLimit-Remaining") == "0":
+            # MEMO: primary rate limit. The scheduler blocks until the reset time at next acquire.
+            return 0.0
+        if response.status_code == 429 or "secondary rate limit" in response.text.lower():
+            backoff = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2**attempt)
+            return backoff * random.uniform(1.0, 1.5)  # noqa: S311
+        # MEMO: 403 without rate limit is a permission error. Retrying doesn't help.
+        return None
+
     def fetch_file_tree_info(self, file_tree_url: GithubApiUrl) -> list[FileInfo]:
-        self._log_api_request(file_tree_url)  # type: ignore
-        response = requests.get(file_tree_url, headers=self.headers)  # type: ignore
-        self._log_api_response(file_tree_url, response.status_code, response.text)  # type: ignore
+        response = self._get(file_tree_url)  # type: ignore
 
         if response.status_code == 200:
             return response.json()["tree"]
@@ -123,58 +387,150 @@ class GithubApiManager:
             raise Exception(msg)
 
     def fetch_single_file_content_data(self, file_api_url: GithubApiUrl) -> ContentData:
-        self._log_api_request(file_api_url)  # type: ignore
-        response = requests.get(file_api_url, headers=self.headers)  # type: ignore
-        self._log_api_response(file_api_url, response.status_code, response.text)  # type: ignore
-        return response.json()
+        response = self._get(file_api_url)  # type: ignore
+        if response.status_code == 200:
+            return response.json()
+        msg = f"Failed to get file content. status: {response.status_code}"
+        if response.text:
+            msg += f" Response: {response.text}"
+        raise Exception(msg)
+
+    def _map_concurrently[T](
+        self,
+        func: Callable[[GithubApiUrl], T],
+        urls: Iterable[GithubApiUrl],
+        max_workers: int | None = None,
+    ) -> dict[GithubApiUrl, T]:
+        # RETURNS: results by url. Failed urls are logged and not included.
+        results: dict[GithubApiUrl, T] = {}
+        with ThreadPoolExecutor(max_workers=max_workers or self.max_workers) as executor:
+            futures = {executor.submit(func, url): url for url in urls}
+            for future in as_completed(futures):
+                url = futures[future]
+                try:
+                    results[url] = future.result()
+                except Exception as e:
+                    self.logger.exception("Failed to fetch file.", url=url, error=str(e))
+        return results
+
+    def fetch_many_file_content_data(
+        self, file_api_urls: Iterable[GithubApiUrl], max_workers: int | None = None
+    ) -> dict[GithubApiUrl, ContentData]:
+        """Fetch many files concurrently over the pooled session.
+
+        Args:
+            file_api_urls: GitHub API urls of blobs or contents.
+            max_workers: The concurrency limit. `self.max_workers` is used when it is None.
+
+        Returns:
+            A dict from url to its content data. Failed urls are logged and not included.
+        """
+        return self._map_concurrently(
+            self.fetch_single_file_content_data, file_api_urls, max_workers
+        )
+
+    def fetch_raw_file(self, file_api_url: GithubApiUrl) -> bytes:
+        # MEMO: for small files like toc.xhtml. It goes through the http cache.
+        response = self._get(file_api_url, RAW_MEDIA_TYPE)  # type: ignore
+        if response.status_code == 200:
+            return response.content
+        msg = f"Failed to get raw file. status: {response.status_code}"
+        if response.text:
+            msg += f" Response: {response.text}"
+        raise Exception(msg)
+
+    def fetch_raw_file_stream(self, file_api_url: GithubApiUrl) -> requests.Response:
+        """Start downloading a raw file without base64 json and without loading it into memory.
+
+        The caller should read `response.iter_content` and close the response.
+        """
+        response = self._send(file_api_url, {"Accept": RAW_MEDIA_TYPE}, stream=True)  # type: ignore
+        if response.status_code == 200:
+            return response
+        msg = f"Failed to get raw file. status: {response.status_code}"
+        if response.text:
+            msg += f" Response: {response.text}"
+        raise Exception(msg)
+
+    def fetch_many_raw_files[T](
+        self,
+        file_api_urls: Iterable[GithubApiUrl],
+        consume: Callable[[GithubApiUrl, Iterator[bytes]], T],
+        max_workers: int | None = None,
+    ) -> dict[GithubApiUrl, T]:
+        """Stream many raw files concurrently, passing each body to `consume` by chunk.
+
+        Args:
+            file_api_urls: GitHub API urls of blobs or contents.
+            consume: Called in a worker thread with the url and body chunks. EXAMPLE: save to disk.
+            max_workers: The concurrency limit. `self.max_workers` is used when it is None.
+
+        Returns:
+            A dict from url to the result of `consume`. Failed urls are logged and not included.
+        """
+
+        def fetch(url: GithubApiUrl) -> T:
+            with self.fetch_raw_file_stream(url) as response:
+                return consume(url, response.iter_content(RAW_CHUNK_SIZE))
+
+        return self._map_concurrently(fetch, file_api_urls, max_workers)
+
+    def fetch_archive_stream(self, archive_url: GithubApiUrl) -> requests.Response:
+        """Start downloading a repository archive without loading it into memory.
+
+        The caller should read `response.raw` and close the response.
+        """
+        response = self._send(archive_url, stream=True)  # type: ignore
+        if response.status_code == 200:
+            return response
+        msg = f"Failed to get archive. status: {response.status_code}"
+        if response.text:
+            msg += f" Response: {response.text}"
+        raise Exception(msg)
 
     def fetch_user_repositories(self, user_name: str) -> list[RepositoryInfo]:
         api_url = build_github_api_url(f"/users/{user_name}/repos")
-        self._log_api_request(api_url)
-        response = requests.get(api_url, headers=self.headers)
-        self._log_api_response(api_url, response.status_code, response.text)
+        response = self._get(api_url)
 
         if response.status_code == 200:
-            repositories = []
-            for repo_data in response.json():
-                repositories.append(
-                    RepositoryInfo(
-                        name=repo_data["name"],
-                        url=repo_data["html_url"],
-                        owner=repo_data["owner"]["login"],
-                        description=repo_data["description"],
-                    )
-                )
-            return repositories
+            return [to_repository_info(repo_data) for repo_data in response.json()]
         else:
             msg = "Failed to get repositories."
             raise Exception(msg)
 
-    def fetch_all_user_repositories(self, user_name: str) -> list[RepositoryInfo]:
-        repositories: list[RepositoryInfo] = []
-        api_url = build_github_api_url(f"/users/{user_name}/repos")
+    def iter_user_repository_pages(
+        self, user_name: str, start_page: int = 1, per_page: int = REPOSITORIES_PER_PAGE
+    ) -> Iterator[list[RepositoryInfo]]:
+        """Yield repositories page by page, following the `next` link.
+
+        Args:
+            user_name: GitHub user name. EXAMPLE: standardebooks
+            start_page: The page to start from. It is used to resume an interrupted crawl.
+            per_page: The page size.
+
+        Yields:
+            Repositories of a single page. Every page but the last has `per_page` repositories.
+        """
+        api_url: str | None = build_github_api_url(
+            f"/users/{user_name}/repos?per_page={per_page}&page={start_page}"
+        )
         while api_url:
-            response = requests.get(api_url, headers=self.headers)
-            if response.status_code == 200:
-                repositories.extend(list(response.json()))
-                link_header = response.headers.get("Link")
-                if link_header:
-                    links = link_header.split(",")
-                    for link in links:
-                        if 'rel="next"' in link:
-                            # MAY: I don't need to validate this link. But volunerable to injection attack.
-                            api_url = link.strip().split(";")[0][1:-1]
-                            break
-                    else:
-                        api_url = None
-                else:
-                    api_url = None
-
-            else:
+            response = self._get(api_url)
+            if response.status_code != 200:
                 msg = "Failed to get repositories."
                 raise Exception(msg)
+            yield [to_repository_info(repo_data) for repo_data in response.json()]
+            # MEMO: requests parses the Link header. No need to split it by hand.
+            api_url = response.links.get("next", {}).get("url")
 
-        return repositories
+    def iter_user_repositories(
+        self, user_name: str, start_page: int = 1
+    ) -> Iterator[RepositoryInfo]:
+        for repositories in self.iter_user_repository_pages(user_name, start_page):
+            yield from repositories
+
+    def fetch_all_user_repositories(self, user_name: str) -> list[RepositoryInfo]:
+        return list(self.iter_user_repositories(user_name))
 
     def valivade_url(self, url: str, author: str, title: str) -> GithubApiUrl:
         # WARNING: This is a very naive implementation.
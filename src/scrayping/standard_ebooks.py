@@ -1,24 +1,72 @@
-import base64
 import json
 import os
+import sys
+import tarfile
+from collections.abc import Iterable
+from collections.abc import Iterator
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
+from pathlib import PurePosixPath
+from typing import Literal
 
 import structlog
 from structlog.stdlib import BoundLogger
 
+from scrayping.crawl_journal import CrawlJournal
+from scrayping.crawl_journal import to_file_info
+from scrayping.github_api import REPOSITORIES_PER_PAGE
+from scrayping.github_api import ContentData
 from scrayping.github_api import FileInfo
 from scrayping.github_api import GithubApiManager
 from scrayping.github_api import GithubApiUrl
 from scrayping.github_api import RepositoryInfo
+from scrayping.github_api import build_github_blob_api
 from scrayping.github_api import build_github_file_api
+from scrayping.github_api import build_github_tarball_api
 from scrayping.github_api import build_github_tree_api
+from scrayping.github_api import calc_git_blob_sha
+from scrayping.github_api import calc_git_blob_sha_of_file
+from utils.data_io import append_jsonl
+from utils.data_io import blob_store_dir
 from utils.data_io import read_dict
+from utils.data_io import read_jsonl
+from utils.data_io import read_manifest
+from utils.data_io import save_blob
+from utils.data_io import save_bytes
 from utils.data_io import save_chunk
-from utils.data_io import save_xhtml
+from utils.data_io import save_manifest
+from utils.data_io import xhtml_exists
 from utils.logger_config import configure_logger
 
 BOOK_DIR = os.environ.get("BOOK_DIR", "/books")
+HTTP_CACHE_DIR = Path(f"{BOOK_DIR}/.http_cache")
+TEXT_DIR_IN_REPO = PurePosixPath("src/epub/text")
+TOC_PATH_IN_REPO = PurePosixPath("src/epub/toc.xhtml")
+
+# MEMO: "api" fetches a tree and every blob one by one. "archive" downloads one tarball per book.
+type FetchMode = Literal["api", "archive"]
+
+
+CRAWL_JOURNAL_PATH = Path(f"{BOOK_DIR}/.crawl_journal.sqlite3")
+
+
+def build_github_api_manager(pool_size: int | None = None) -> GithubApiManager:
+    return GithubApiManager(cache_dir=HTTP_CACHE_DIR, pool_size=pool_size)
+
+
+def build_crawl_journal() -> CrawlJournal:
+    return CrawlJournal(CRAWL_JOURNAL_PATH)
+
+
+@contextmanager
+def open_crawl_journal(journal: CrawlJournal | None = None) -> Iterator[CrawlJournal]:
+    # MEMO: a given journal belongs to the caller. Only a journal opened here is closed here.
+    if journal is not None:
+        yield journal
+        return
+    with build_crawl_journal() as new_journal:
+        yield new_journal
 
 
 def build_text_file_tree_url(book_name: str) -> GithubApiUrl:
@@ -37,41 +85,166 @@ def target_book_dir(book_name: str) -> Path:
     return Path(f"{BOOK_DIR}/{book_name}")
 
 
+def toc_xhtml_path(book_name: str) -> Path:
+    return target_book_dir(book_name) / "toc.xhtml"
+
+
+def toc_file_info_path(book_name: str) -> Path:
+    return target_book_dir(book_name) / "toc_file_info.json"
+
+
 def scrape_files(
-    book_name: str, force=False, logger: BoundLogger = structlog.get_logger(__name__)
+    book_name: str,
+    force=False,
+    logger: BoundLogger = structlog.get_logger(__name__),
+    github: GithubApiManager | None = None,
+    journal: CrawlJournal | None = None,
 ) -> None:
     tree_info_chunk: list[FileInfo] = read_dict(tree_info_path(book_name), logger)  # type: ignore
 
+    manifest = read_manifest(target_book_dir(book_name))
+    target_file_infos: list[FileInfo] = []
     for each_file_info in tree_info_chunk:
-        github = GithubApiManager()
-        try:
-            # EXAMPLE: books/john-maynard-keynes_the-economic-consequences-of-the-peace/chapter-1.xhtml
-            target_path = target_book_dir(book_name) / each_file_info["path"]
-            if not force and target_path.exists():
-                logger.info(
-                    "File already exists.",
-                    path=target_path,
-                    book_name=book_name,
-                    fiil_name=target_path.name,
+        # EXAMPLE: books/john-maynard-keynes_the-economic-consequences-of-the-peace/chapter-1.xhtml
+        target_path = target_book_dir(book_name) / each_file_info["path"]
+        if not force and xhtml_exists(target_path, manifest):
+            logger.info(
+                "File already exists.",
+                path=target_path,
+                book_name=book_name,
+                fiil_name=target_path.name,
+            )
+            continue
+        target_file_infos.append(each_file_info)
+
+    save_files(book_name, target_file_infos, logger, github, journal)
+
+
+def is_blob_saved(path: Path, sha: str | None, manifest: dict[str, str]) -> bool:
+    # MEMO: a git blob sha is the hash of the content, so the same sha means the same bytes.
+    if not sha:
+        return False
+    if path.exists():
+        return calc_git_blob_sha_of_file(path) == sha
+    return manifest.get(path.name) == sha
+
+
+def save_files(
+    book_name: str,
+    file_infos: list[FileInfo],
+    logger: BoundLogger = structlog.get_logger(__name__),
+    github: GithubApiManager | None = None,
+    journal: CrawlJournal | None = None,
+) -> list[str]:
+    # RETURNS: paths of files which failed. Their old content, if any, is still on disk.
+    github = github or build_github_api_manager()
+    with open_crawl_journal(journal) as journal:
+        journal.mark_pending(book_name, file_infos)
+        failed_paths: list[str] = []
+        manifest = read_manifest(target_book_dir(book_name))
+
+        target_file_infos: dict[GithubApiUrl, FileInfo] = {}
+        for each_file_info in file_infos:
+            # PERFORMANCE: blob requests skip the http cache, as bodies are streamed to disk.
+            # A forced crawl would download every blob again without this check.
+            if is_blob_saved(
+                target_book_dir(book_name) / each_file_info["path"],
+                each_file_info.get("sha"),
+                manifest,
+            ):
+                journal.mark(book_name, each_file_info["path"], "verified")
+                continue
+            try:
+                url = github.valivade_url(each_file_info["url"], "standardebooks", book_name)
+            except Exception as e:
+                logger.exception(
+                    "Failed to process file.",
+                    at="save_files",
+                    file_path=each_file_info["path"],
+                    error=str(e),
                 )
+                journal.mark(book_name, each_file_info["path"], "failed", str(e))
+                failed_paths.append(each_file_info["path"])
                 continue
-            url = github.valivade_url(each_file_info["url"], "standardebooks", book_name)
-            content_data = github.fetch_single_file_content_data(url)
-            save_xhtml(
-                base64.b64decode(content_data["content"]).decode("utf-8"), target_path, logger
+            target_file_infos[url] = each_file_info
+
+        def save_raw_file(url: GithubApiUrl, chunks: Iterator[bytes]) -> None:
+            each_file_info = target_file_infos[url]
+            save_bytes(
+                chunks,
+                target_book_dir(book_name) / each_file_info["path"],
+                logger,
+                each_file_info.get("sha"),
             )
-        except Exception as e:
-            logger.exception(
-                "Failed to process file.",
-                at="scrape_files",
-                file_path=each_file_info["path"],
-                error=str(e),
-                content_data=content_data,
+
+        # PERFORMANCE: fetch all blobs of the book concurrently over one pooled session.
+        # Raw media type skips base64 json, and bodies go to disk by chunk without decoding.
+        saved = github.fetch_many_raw_files(target_file_infos, save_raw_file)
+        for url, each_file_info in target_file_infos.items():
+            if url not in saved:
+                # MEMO: the reason is already logged by `fetch_many_raw_files`.
+                journal.mark(
+                    book_name, each_file_info["path"], "failed", f"Failed to save. url: {url}"
+                )
+                failed_paths.append(each_file_info["path"])
+                continue
+            journal.mark(
+                book_name,
+                each_file_info["path"],
+                "verified" if each_file_info.get("sha") else "fetched",
             )
+        return failed_paths
+
+
+def pack_book(book_name: str, logger: BoundLogger = structlog.get_logger(__name__)) -> None:
+    """Move the loose text files of a book into the shared blob store, leaving a manifest.
+
+    Boilerplate like `uncopyright.xhtml` is almost the same in every book, so it is stored once.
+    `toc.xhtml` and json files are kept loose. `read_xhtml` reads packed files transparently.
+    """
+    book_dir = target_book_dir(book_name)
+    manifest = read_manifest(book_dir)
+    packed_paths: list[Path] = []
+    for file_info in read_dict(tree_info_path(book_name), logger):
+        path = book_dir / file_info["path"]
+        if not path.exists():
+            continue
+        manifest[path.name] = save_blob(path.read_bytes(), blob_store_dir(book_dir))
+        packed_paths.append(path)
+
+    # MEMO: remove loose files only after the manifest is saved, so nothing is lost on crash.
+    save_manifest(manifest, book_dir, logger)
+    for path in packed_paths:
+        path.unlink()
+    logger.info("Packed book.", book_name=book_name, files=len(packed_paths))
+
+
+def resume_crawl(
+    logger: BoundLogger = structlog.get_logger(__name__),
+    github: GithubApiManager | None = None,
+    journal: CrawlJournal | None = None,
+) -> None:
+    """Retry only the journal entries which are not complete, book by book."""
+    github = github or build_github_api_manager()
+    with open_crawl_journal(journal) as journal:
+        file_infos_by_book: dict[str, list[FileInfo]] = {}
+        for entry in journal.incomplete_entries():
+            file_infos_by_book.setdefault(entry["book_name"], []).append(to_file_info(entry))
+
+        logger.info(
+            "Resume crawl.",
+            books=len(file_infos_by_book),
+            files=sum(len(file_infos) for file_infos in file_infos_by_book.values()),
+        )
+        for book_name, file_infos in file_infos_by_book.items():
+            save_files(book_name, file_infos, logger, github, journal)
 
 
 def save_tree_info(
-    book_name: str, force=False, logger: BoundLogger = structlog.get_logger(__name__)
+    book_name: str,
+    force=False,
+    logger: BoundLogger = structlog.get_logger(__name__),
+    github: GithubApiManager | None = None,
 ) -> None:
     if not force and tree_info_path(book_name).exists():
         logger.info(
@@ -80,7 +253,7 @@ def save_tree_info(
         return
     text_file_tree_url = build_text_file_tree_url(book_name)
     save_chunk(
-        GithubApiManager().fetch_file_tree_info(text_file_tree_url),
+        (github or build_github_api_manager()).fetch_file_tree_info(text_file_tree_url),
         tree_info_path(book_name),
         logger,
     )
@@ -88,33 +261,201 @@ def save_tree_info(
 
 
 def fetch_raw_toc_file(
-    book_name: str, force: bool = False, logger: BoundLogger = structlog.get_logger(__name__)
+    book_name: str,
+    force: bool = False,
+    logger: BoundLogger = structlog.get_logger(__name__),
+    github: GithubApiManager | None = None,
 ) -> None:
-    if not force and Path(f"{BOOK_DIR}/{book_name}/toc.xhtml").exists():
+    if not force and toc_xhtml_path(book_name).exists():
         logger.info("toc.xhtml already exists.", book_name=book_name)
         return
-    toc_file_url = build_toc_file_url(book_name)
-    toc_file_info = GithubApiManager().fetch_single_file_content_data(toc_file_url)
-    try:
-        toc_file_info["content"] = base64.b64decode(toc_file_info["content"]).decode("utf-8")
-    except Exception as e:
-        logger.exception(
-            "Failed to process file.", at="scrape_files", error=str(e), toc_file_info=toc_file_info
-        )
+    # MEMO: only metadata goes to toc_file_info.json. The toc itself is toc.xhtml.
+    data = (github or build_github_api_manager()).fetch_raw_file(build_toc_file_url(book_name))
+    save_chunk(build_toc_file_info(book_name, data), toc_file_info_path(book_name), logger)
+    save_bytes([data], toc_xhtml_path(book_name), logger)
+
 
-    save_chunk(toc_file_info, Path(f"{BOOK_DIR}/{book_name}/toc_file_info.json"), logger)
-    save_xhtml(toc_file_info["content"], Path(f"{BOOK_DIR}/{book_name}/toc.xhtml"), logger)
+def repositories_snapshot_path(date: str) -> Path:
+    # EXAMPLE: books/2024-04-10_standardebooks_repositories.json
+    return Path(f"{BOOK_DIR}/{date}_standardebooks_repositories.json")
+
+
+def find_previous_repositories_snapshot(today: str) -> Path | None:
+    # MEMO: the date prefix is ISO format, so sorting by name is sorting by date.
+    snapshots = sorted(
+        path
+        for path in Path(BOOK_DIR).glob("*_standardebooks_repositories.json")
+        if path.name < repositories_snapshot_path(today).name
+    )
+    return snapshots[-1] if snapshots else None
 
 
 def fetch_all_repositories(
-    force=False, logger: BoundLogger = structlog.get_logger(__name__)
-) -> None:
+    force=False,
+    logger: BoundLogger = structlog.get_logger(__name__),
+    github: GithubApiManager | None = None,
+) -> list[RepositoryInfo]:
     today = datetime.now().strftime("%Y-%m-%d")
-    if not force and Path(f"{BOOK_DIR}/{today}_standardebooks_repositories.json").exists():
-        return
-    github = GithubApiManager()
+    if not force and repositories_snapshot_path(today).exists():
+        return read_dict(repositories_snapshot_path(today), logger)  # type: ignore
+    github = github or build_github_api_manager()
     repositories = github.fetch_all_user_repositories("standardebooks")
-    save_chunk(repositories, Path(f"{BOOK_DIR}/{today}_standardebooks_repositories.json"), logger)
+    save_chunk(repositories, repositories_snapshot_path(today), logger)
+    return repositories
+
+
+def fetch_all_repositories_as_jsonl(
+    logger: BoundLogger = structlog.get_logger(__name__), github: GithubApiManager | None = None
+) -> Path:
+    """Persist repositories page by page as JSON Lines, resuming from the last complete page.
+
+    Memory stays flat, and an interrupted crawl doesn't fetch finished pages again.
+    """
+    today = datetime.now().strftime("%Y-%m-%d")
+    path = repositories_snapshot_path(today).with_suffix(".jsonl")
+    records: list[RepositoryInfo] = read_jsonl(path, logger) if path.exists() else []
+    completed_pages = len(records) // REPOSITORIES_PER_PAGE
+    # MEMO: a partial last page is dropped and fetched again. It may be the end, or interrupted.
+    path.unlink(missing_ok=True)
+    append_jsonl(records[: completed_pages * REPOSITORIES_PER_PAGE], path, logger)
+
+    github = github or build_github_api_manager()
+    for repositories in github.iter_user_repository_pages("standardebooks", completed_pages + 1):
+        append_jsonl(repositories, path, logger)
+    return path
+
+
+def find_changed_repositories(
+    previous: list[RepositoryInfo], current: list[RepositoryInfo]
+) -> list[RepositoryInfo]:
+    pushed_at_map = {repo["name"]: repo.get("pushed_at") for repo in previous}
+    return [
+        repo
+        for repo in current
+        # MEMO: a repository without pushed_at in the old snapshot is treated as changed.
+        if pushed_at_map.get(repo["name"]) is None
+        or pushed_at_map[repo["name"]] != repo.get("pushed_at")
+    ]
+
+
+def sync_book_data(
+    book_name: str,
+    logger: BoundLogger = structlog.get_logger(__name__),
+    github: GithubApiManager | None = None,
+    journal: CrawlJournal | None = None,
+) -> None:
+    """Re-download only the blobs whose sha differs from the stored `info.json`."""
+    github = github or build_github_api_manager()
+    if not tree_info_path(book_name).exists():
+        fetch_book_data(book_name, False, logger, github, journal=journal)
+        return
+
+    stored_shas = {
+        file_info["path"]: file_info.get("sha")
+        for file_info in read_dict(tree_info_path(book_name), logger)
+    }
+    tree_info_chunk = github.fetch_file_tree_info(build_text_file_tree_url(book_name))
+    manifest = read_manifest(target_book_dir(book_name))
+    changed_file_infos = [
+        file_info
+        for file_info in tree_info_chunk
+        if stored_shas.get(file_info["path"]) != file_info["sha"]
+        # MEMO: a packed book has its files in the manifest, not on disk.
+        or not xhtml_exists(target_book_dir(book_name) / file_info["path"], manifest)
+    ]
+    removed_paths = stored_shas.keys() - {file_info["path"] for file_info in tree_info_chunk}
+    logger.info(
+        "Sync book.",
+        book_name=book_name,
+        changed=len(changed_file_infos),
+        removed=len(removed_paths),
+    )
+
+    failed_paths = set(save_files(book_name, changed_file_infos, logger, github, journal))
+    remove_book_files(book_name, removed_paths, logger)
+    # MEMO: toc.xhtml is not in the text tree. With the http cache, it costs nothing if unchanged.
+    fetch_raw_toc_file(book_name, True, logger, github)
+    save_chunk(
+        keep_stored_shas(tree_info_chunk, stored_shas, failed_paths),
+        tree_info_path(book_name),
+        logger,
+    )
+    # MEMO: changed files are saved loose. Pack them again, so the sync does not unpack the book.
+    if read_manifest(target_book_dir(book_name)):
+        pack_book(book_name, logger)
+
+
+def remove_book_files(
+    book_name: str, paths: Iterable[str], logger: BoundLogger = structlog.get_logger(__name__)
+) -> None:
+    book_dir = target_book_dir(book_name)
+    manifest = read_manifest(book_dir)
+    for path in paths:
+        (book_dir / path).unlink(missing_ok=True)
+        manifest.pop(path, None)
+    # MEMO: blobs are shared by books, so they are left in the store.
+    if manifest != read_manifest(book_dir):
+        save_manifest(manifest, book_dir, logger)
+
+
+def keep_stored_shas(
+    tree_info_chunk: list[FileInfo], stored_shas: dict[str, str | None], failed_paths: set[str]
+) -> list[FileInfo]:
+    """Put back the old sha of files which failed, so the next sync fetches them again.
+
+    A failed file which was never stored is left out, and it is seen as new next time.
+    """
+    file_infos: list[FileInfo] = []
+    for file_info in tree_info_chunk:
+        if file_info["path"] not in failed_paths:
+            file_infos.append(file_info)
+        elif stored_sha := stored_shas.get(file_info["path"]):
+            file_infos.append({**file_info, "sha": stored_sha})
+    return file_infos
+
+
+def sync_all_repositories(
+    logger: BoundLogger = structlog.get_logger(__name__),
+    github: GithubApiManager | None = None,
+    journal: CrawlJournal | None = None,
+) -> list[RepositoryInfo]:
+    """Fetch today's repository list and sync only repositories pushed since the last snapshot."""
+    github = github or build_github_api_manager()
+    today = datetime.now().strftime("%Y-%m-%d")
+    previous_path = find_previous_repositories_snapshot(today)
+    previous: list[RepositoryInfo] = []
+    if previous_path:
+        previous = read_dict(previous_path, logger)  # type: ignore
+
+    # MEMO: today's snapshot is saved after the syncs. Saved first, a failed book is never retried.
+    current = github.fetch_all_user_repositories("standardebooks")
+    changed_repositories = find_changed_repositories(previous, current)
+    logger.info(
+        "Sync repositories.",
+        previous_snapshot=previous_path,
+        repositories=len(current),
+        changed=len(changed_repositories),
+    )
+    failed_names: set[str] = set()
+    # MEMO: one journal for all books, instead of one sqlite connection per book.
+    with open_crawl_journal(journal) as journal:
+        for repo in changed_repositories:
+            try:
+                sync_book_data(repo["name"], logger, github, journal)
+            except Exception as e:
+                logger.exception("Failed to sync book.", book_name=repo["name"], error=str(e))
+                failed_names.add(repo["name"])
+
+    # MEMO: a failed book has no pushed_at in the snapshot, so the next run sees it as changed.
+    save_chunk(
+        [
+            {**repo, "pushed_at": None} if repo["name"] in failed_names else repo  # type: ignore
+            for repo in current
+        ],
+        repositories_snapshot_path(today),
+        logger,
+    )
+    return changed_repositories
 
 
 def fetch_30_repositories(
@@ -123,19 +464,100 @@ def fetch_30_repositories(
     file_path = Path(f"{BOOK_DIR}/trial_standardebooks_repositories.json")
     if file_path.exists():
         return read_dict(Path(f"{BOOK_DIR}/trial_standardebooks_repositories.json"), logger)  # type: ignore
-    github = GithubApiManager()
+    github = build_github_api_manager()
     repositories = github.fetch_user_repositories("standardebooks")
     save_chunk(repositories, file_path, logger)
 
     return repositories
 
 
+def build_file_info(book_name: str, path: str, data: bytes) -> FileInfo:
+    sha = calc_git_blob_sha(data)
+    return FileInfo(
+        path=path,
+        mode="100644",
+        type="blob",
+        sha=sha,
+        size=len(data),
+        url=build_github_blob_api("standardebooks", book_name, sha),  # type: ignore
+    )
+
+
+def build_toc_file_info(book_name: str, data: bytes) -> ContentData:
+    # MEMO: subset of the contents API response without `content`, which is saved as toc.xhtml.
+    return {  # type: ignore
+        "name": TOC_PATH_IN_REPO.name,
+        "path": str(TOC_PATH_IN_REPO),
+        "sha": calc_git_blob_sha(data),
+        "size": len(data),
+        "url": build_toc_file_url(book_name) + "?ref=master",
+        "type": "file",
+    }
+
+
+def fetch_book_archive(
+    book_name: str,
+    force=False,
+    logger: BoundLogger = structlog.get_logger(__name__),
+    github: GithubApiManager | None = None,
+) -> None:
+    """Fetch a book with one tarball download instead of one request per file.
+
+    Only `src/epub/text/*` and `src/epub/toc.xhtml` are extracted. `info.json` and
+    `toc_file_info.json` are built from the archive, so the output is the same as the api mode.
+    """
+    if not force and tree_info_path(book_name).exists() and toc_xhtml_path(book_name).exists():
+        logger.info("Book already exists.", path=target_book_dir(book_name), book_name=book_name)
+        return
+    github = github or build_github_api_manager()
+
+    tree_info_chunk: list[FileInfo] = []
+    with (
+        github.fetch_archive_stream(
+            build_github_tarball_api("standardebooks", book_name)
+        ) as response,
+        # PERFORMANCE: "r|gz" reads the archive as a stream. Nothing but wanted files is kept.
+        tarfile.open(fileobj=response.raw, mode="r|gz") as archive,
+    ):
+        for member in archive:
+            if not member.isfile():
+                continue
+            # EXAMPLE: standardebooks-a-a-milne_winnie-the-pooh-7c0e3a1/src/epub/text/chapter-1.xhtml
+            path_in_repo = PurePosixPath(*PurePosixPath(member.name).parts[1:])
+            is_text = path_in_repo.parent == TEXT_DIR_IN_REPO
+            if not is_text and path_in_repo != TOC_PATH_IN_REPO:
+                continue
+            data = archive.extractfile(member).read()  # type: ignore
+
+            if is_text:
+                tree_info_chunk.append(build_file_info(book_name, path_in_repo.name, data))
+                save_bytes([data], target_book_dir(book_name) / path_in_repo.name, logger)
+            else:
+                save_chunk(
+                    build_toc_file_info(book_name, data), toc_file_info_path(book_name), logger
+                )
+                save_bytes([data], toc_xhtml_path(book_name), logger)
+
+    # MEMO: the tree api returns entries sorted by path.
+    tree_info_chunk.sort(key=lambda file_info: file_info["path"])
+    save_chunk(tree_info_chunk, tree_info_path(book_name), logger)
+
+
 def fetch_book_data(
-    book_name: str, force=False, logger: BoundLogger = structlog.get_logger(__name__)
+    book_name: str,
+    force=False,
+    logger: BoundLogger = structlog.get_logger(__name__),
+    github: GithubApiManager | None = None,
+    mode: FetchMode = "api",
+    journal: CrawlJournal | None = None,
 ) -> None:
-    fetch_raw_toc_file(book_name, force, logger)
-    save_tree_info(book_name, force, logger)
-    scrape_files(book_name, force, logger)
+    github = github or build_github_api_manager()
+    if mode == "archive":
+        fetch_book_archive(book_name, force, logger, github)
+        return
+    fetch_raw_toc_file(book_name, force, logger, github)
+    save_tree_info(book_name, force, logger, github)
+    scrape_files(book_name, force, logger, github, journal)
 
 
 def main():
@@ -143,19 +565,38 @@ def main():
 
     logger = structlog.get_logger(__name__)
 
-    title = "john-maynard-keynes_the-economic-consequences-of-the-peace"
-    fetch_book_data(title, False, logger)
+    github = build_github_api_manager()
+    with build_crawl_journal() as journal:
+        title = "john-maynard-keynes_the-economic-consequences-of-the-peace"
+        fetch_book_data(title, False, logger, github, journal=journal)
 
-    repos = fetch_30_repositories(logger)
-    for repo in repos:
-        book_name = repo["name"]
-        print(book_name)
-        fetch_book_data(book_name, False, logger)
+        repos = fetch_30_repositories(logger)
+        for repo in repos:
+            book_name = repo["name"]
+            print(book_name)
+            fetch_book_data(book_name, False, logger, github, journal=journal)
 
     # save_chunk(repositories, Path(f"{BOOK_DIR}/{today}_standardebooks_repositories.json"), logger)
 
     # fetch_all_repositories(False, logger)
 
 
+def resume_main():
+    configure_logger()
+    with build_crawl_journal() as journal:
+        resume_crawl(structlog.get_logger(__name__), journal=journal)
+
+
+def sync_main():
+    configure_logger()
+    with build_crawl_journal() as journal:
+        sync_all_repositories(structlog.get_logger(__name__), journal=journal)
+
+
 if __name__ == "__main__":
-    main()
+    if sys.argv[1:] == ["sync"]:
+        sync_main()
+    elif sys.argv[1:] == ["resume"]:
+        resume_main()
+    else:
+        main()
@@ -0,0 +1,310 @@
+"""catalog_index.py: A persistent per-book metadata index of BOOK_DIR stored in SQLite.
+
+Research selectors used to glob every book directory and read every toc.json on each run.
+This index is refreshed incrementally by mtime, and the selectors become queries.
+
+EXAMPLE: python -m text_process.catalog_index
+"""
+
+import os
+import re
+import sqlite3
+import threading
+import time
+from collections.abc import Iterable
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from types import TracebackType
+from typing import Self
+from typing import TypedDict
+
+import structlog
+from structlog.stdlib import BoundLogger
+
+from text_process.toc_node import count_toc_nodes
+from text_process.toc_node import load_toc
+from text_process.toc_node import max_nest_level
+from utils.data_io import read_manifest
+from utils.logger_config import configure_logger
+
+BOOK_DIR = Path(os.environ.get("BOOK_DIR", "/books"))
+CATALOG_INDEX_PATH = BOOK_DIR / ".catalog_index.sqlite3"
+
+# EXAMPLE: <html xmlns="http://www.w3.org/1999/xhtml" ... xml:lang="en-US">
+LANGUAGE_PATTERN = re.compile(rb'xml:lang="([^"]+)"')
+# MEMO: the lang attribute is in the root tag, which is in the first few hundred bytes.
+LANGUAGE_SEARCH_BYTES = 2048
+
+
+class BookRecord(TypedDict):
+    book_name: str
+    signature: int
+    file_count: int
+    total_size: int
+    has_chapter_1: bool
+    chapter_files: int
+    # MEMO: None when toc.json does not exist or is broken.
+    max_nest_level: int | None
+    toc_entries: int | None
+    language: str | None
+
+
+def scan_book_dir(repo_dir: Path) -> tuple[int, dict[str, os.stat_result]]:
+    """Stat a book directory without reading any file.
+
+    Returns:
+        The signature, which is the newest mtime of the directory and its files, and stats by name.
+    """
+    stats = {entry.name: entry.stat() for entry in os.scandir(repo_dir) if entry.is_file()}
+    mtimes = [repo_dir.stat().st_mtime_ns, *(stat.st_mtime_ns for stat in stats.values())]
+    return max(mtimes), stats
+
+
+def find_language(repo_dir: Path) -> str | None:
+    if not (repo_dir / "toc.xhtml").exists():
+        return None
+    with open(repo_dir / "toc.xhtml", "rb") as fp:
+        if match := LANGUAGE_PATTERN.search(fp.read(LANGUAGE_SEARCH_BYTES)):
+            return match.group(1).decode("ascii")
+    return None
+
+
+def build_book_record(
+    repo_dir: Path, signature: int, stats: dict[str, os.stat_result], file_names: list[str]
+) -> BookRecord:
+    nest_level = toc_entries = None
+    if (repo_dir / "toc.json").exists():
+        try:
+            toc = load_toc(repo_dir / "toc.json")
+            nest_level = max_nest_level(toc)
+            toc_entries = count_toc_nodes(toc)
+        except (ValueError, KeyError, TypeError):
+            # MEMO: a broken toc.json is recorded as unknown, and it is re-read after it changes.
+            pass
+
+    return BookRecord(
+        book_name=repo_dir.name,
+        signature=signature,
+        file_count=len(file_names),
+        total_size=sum(stat.st_size for stat in stats.values()),
+        has_chapter_1=any(name.startswith("chapter-1") for name in file_names),
+        chapter_files=sum(
+            name.startswith("chapter-") and name.endswith(".xhtml") for name in file_names
+        ),
+        max_nest_level=nest_level,
+        toc_entries=toc_entries,
+        language=find_language(repo_dir),
+    )
+
+
+class CatalogIndex:
+    """Per-book metadata of BOOK_DIR stored in SQLite.
+
+    `refresh` only re-reads books whose signature changed, so a refresh of an unchanged corpus
+    is one `scandir` per book. Queries never touch the book directories.
+    """
+
+    def __init__(self, db_path: Path) -> None:
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(db_path, check_same_thread=False)
+        self.connection.row_factory = sqlite3.Row
+        with self.lock, self.connection:
+            self.connection.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS books (
+                    book_name TEXT PRIMARY KEY,
+                    signature INTEGER NOT NULL,
+                    file_count INTEGER NOT NULL,
+                    total_size INTEGER NOT NULL,
+                    has_chapter_1 INTEGER NOT NULL,
+                    chapter_files INTEGER NOT NULL,
+                    max_nest_level INTEGER,
+                    toc_entries INTEGER,
+                    language TEXT,
+                    updated_at REAL NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS files (
+                    book_name TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    size INTEGER,
+                    PRIMARY KEY (book_name, name)
+                );
+                CREATE INDEX IF NOT EXISTS books_max_nest_level ON books (max_nest_level);
+                """
+            )
+
+    def signatures(self) -> dict[str, int]:
+        with self.lock:
+            rows = self.connection.execute("SELECT book_name, signature FROM books")
+            return {row["book_name"]: row["signature"] for row in rows}
+
+    def refresh(
+        self, book_dir: Path = BOOK_DIR, logger: BoundLogger = structlog.get_logger(__name__)
+    ) -> int:
+        """Update records of new and changed books, and delete records of removed books.
+
+        Returns:
+            The number of books which were re-read.
+        """
+        known = self.signatures()
+        seen: set[str] = set()
+        updated = 0
+        for repo_dir in book_dir.iterdir():
+            # MEMO: dot directories are crawler data like `.objects` and `.http_cache`.
+            if not repo_dir.is_dir() or repo_dir.name.startswith("."):
+                continue
+            seen.add(repo_dir.name)
+            signature, stats = scan_book_dir(repo_dir)
+            if known.get(repo_dir.name) == signature:
+                continue
+            # MEMO: packed files are listed by the manifest instead of the directory.
+            packed_names = [name for name in read_manifest(repo_dir) if name not in stats]
+            file_names = sorted([*stats, *packed_names])
+            self.put(
+                build_book_record(repo_dir, signature, stats, file_names), stats, packed_names
+            )
+            updated += 1
+
+        if removed := known.keys() - seen:
+            self.delete(removed)
+        logger.info(
+            "Catalog index refreshed.", books=len(seen), updated=updated, removed=len(removed)
+        )
+        return updated
+
+    def put(
+        self, record: BookRecord, stats: dict[str, os.stat_result], packed_names: list[str]
+    ) -> None:
+        book_name = record["book_name"]
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO books VALUES "
+                "(:book_name, :signature, :file_count, :total_size, :has_chapter_1, "
+                ":chapter_files, :max_nest_level, :toc_entries, :language, :updated_at)",
+                {**record, "updated_at": time.time()},
+            )
+            self.connection.execute("DELETE FROM files WHERE book_name = ?", (book_name,))
+            self.connection.executemany(
+                "INSERT INTO files VALUES (?, ?, ?)",
+                [(book_name, name, stat.st_size) for name, stat in stats.items()]
+                + [(book_name, name, None) for name in packed_names],
+            )
+
+    def delete(self, book_names: Iterable[str]) -> None:
+        params = [(book_name,) for book_name in book_names]
+        with self.lock, self.connection:
+            self.connection.executemany("DELETE FROM books WHERE book_name = ?", params)
+            self.connection.executemany("DELETE FROM files WHERE book_name = ?", params)
+
+    def find_books(
+        self,
+        has_chapter_1: bool | None = None,
+        min_nest_level: int | None = None,
+        max_nest_level: int | None = None,
+        language: str | None = None,
+    ) -> list[str]:
+        """Return book names matching all given conditions. None means no condition.
+
+        `min_nest_level` and `max_nest_level` are inclusive bounds of the max nest level of a book.
+        They match only books with a non-empty toc.
+        """
+        conditions: list[str] = []
+        params: list[object] = []
+        if has_chapter_1 is not None:
+            conditions.append("has_chapter_1 = ?")
+            params.append(has_chapter_1)
+        if min_nest_level is not None or max_nest_level is not None:
+            conditions.append("toc_entries > 0")
+        if min_nest_level is not None:
+            conditions.append("max_nest_level >= ?")
+            params.append(min_nest_level)
+        if max_nest_level is not None:
+            conditions.append("max_nest_level <= ?")
+            params.append(max_nest_level)
+        if language is not None:
+            conditions.append("language = ?")
+            params.append(language)
+        query = "SELECT book_name FROM books"
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        with self.lock:
+            rows = self.connection.execute(query + " ORDER BY book_name", params)
+            return [row["book_name"] for row in rows]
+
+    def nest_levels(self) -> dict[str, int]:
+        # MEMO: only books with a non-empty toc. The selectors skipped the others.
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT book_name, max_nest_level FROM books WHERE toc_entries > 0"
+            )
+            return {row["book_name"]: row["max_nest_level"] for row in rows}
+
+    def get(self, book_name: str) -> BookRecord | None:
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT * FROM books WHERE book_name = ?", (book_name,)
+            ).fetchone()
+        if row is None:
+            return None
+        record = dict(row)
+        record.pop("updated_at")
+        record["has_chapter_1"] = bool(record["has_chapter_1"])
+        return BookRecord(**record)
+
+    def files(self, book_name: str) -> list[str]:
+        with self.lock:
+            rows = self.connection.execute(
+                "SELECT name FROM files WHERE book_name = ? ORDER BY name", (book_name,)
+            )
+            return [row["name"] for row in rows]
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self.lock:
+            self.connection.close()
+
+
+def build_catalog_index(
+    book_dir: Path = BOOK_DIR, logger: BoundLogger = structlog.get_logger(__name__)
+) -> CatalogIndex:
+    # MEMO: open the index next to the books and bring it up to date.
+    index = CatalogIndex(book_dir / CATALOG_INDEX_PATH.name)
+    index.refresh(book_dir, logger)
+    return index
+
+
+@contextmanager
+def open_catalog_index(
+    index: CatalogIndex | None = None,
+    book_dir: Path = BOOK_DIR,
+    logger: BoundLogger = structlog.get_logger(__name__),
+) -> Iterator[CatalogIndex]:
+    # MEMO: a given index belongs to the caller. Only an index built here is closed here.
+    if index is not None:
+        yield index
+        return
+    with build_catalog_index(book_dir, logger) as new_index:
+        yield new_index
+
+
+def main():
+    configure_logger()
+    logger = structlog.get_logger(__name__)
+    with build_catalog_index(BOOK_DIR, logger):
+        pass
+
+
+if __name__ == "__main__":
+    main()
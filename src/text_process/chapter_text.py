@@ -0,0 +1,105 @@
+"""chapter_text.py: Stream paragraph texts of a Standard Ebooks book in toc order.
+
+EXAMPLE:
+    for chapter_id, paragraph_index, text in iter_book_paragraphs(book_dir, load_toc(...)):
+        ...
+"""
+
+import io
+from collections.abc import Iterable
+from collections.abc import Iterator
+from pathlib import Path
+from typing import IO
+from typing import NamedTuple
+
+from lxml import etree
+
+from text_process.toc_node import TocNode
+from text_process.toc_node import iter_toc_nodes
+from utils.data_io import read_xhtml_bytes
+
+XHTML_NAMESPACE = "{http://www.w3.org/1999/xhtml}"
+P_TAG = f"{XHTML_NAMESPACE}p"
+# MEMO: chapters are `section`. Short stories in collections are `article`.
+CONTAINER_TAGS = (f"{XHTML_NAMESPACE}section", f"{XHTML_NAMESPACE}article")
+# MEMO: front and back matter which has no body text.
+SKIPPED_TITLES = frozenset({"Titlepage", "Imprint", "Colophon", "Uncopyright", "halftitlepage"})
+
+
+class ParagraphRecord(NamedTuple):
+    chapter_id: str
+    paragraph_index: int
+    text: str
+
+
+def split_href(href: str) -> tuple[str, str]:
+    # EXAMPLE: "text/chapter-1.xhtml#chapter-1-2" -> ("chapter-1.xhtml", "chapter-1-2")
+    # EXAMPLE: "text/chapter-1.xhtml" -> ("chapter-1.xhtml", "chapter-1")
+    file_name, _, fragment = href.split("text/")[-1].partition("#")
+    return file_name, fragment or file_name.removesuffix(".xhtml")
+
+
+def group_chapter_ids_by_file(toc: Iterable[TocNode]) -> dict[str, set[str]]:
+    # MEMO: dict keeps the toc order of files.
+    chapter_ids: dict[str, set[str]] = {}
+    for node in iter_toc_nodes(toc):
+        if node.title in SKIPPED_TITLES or not node.href:
+            continue
+        file_name, chapter_id = split_href(node.href)
+        chapter_ids.setdefault(file_name, set()).add(chapter_id)
+    return chapter_ids
+
+
+def normalize_text(element: etree._Element) -> str:
+    # MEMO: indentation of the source is not text. Inline tags like <i> must not add spaces.
+    return " ".join("".join(element.itertext()).split())
+
+
+def iter_file_paragraphs(source: IO[bytes], chapter_ids: set[str]) -> Iterator[ParagraphRecord]:
+    """Yield direct `<p>` children of the wanted sections in one file, in document order.
+
+    Elements are cleared as soon as they are read, so memory does not grow with the file size.
+    """
+    # MEMO: ids of open containers. None for containers without id.
+    container_stack: list[str | None] = []
+    paragraph_indexes: dict[str, int] = {}
+    for event, element in etree.iterparse(
+        source, events=("start", "end"), tag=(P_TAG, *CONTAINER_TAGS)
+    ):
+        if event == "start":
+            if element.tag != P_TAG:
+                container_stack.append(element.get("id"))
+            continue
+
+        if element.tag == P_TAG:
+            parent = element.getparent()
+            chapter_id = container_stack[-1] if container_stack else None
+            if chapter_id in chapter_ids and parent is not None and parent.tag in CONTAINER_TAGS:
+                index = paragraph_indexes.get(chapter_id, 0)
+                paragraph_indexes[chapter_id] = index + 1
+                yield ParagraphRecord(chapter_id, index, normalize_text(element))
+        else:
+            container_stack.pop()
+
+        # PERFORMANCE: drop what was read. Tails are kept because they belong to the parent.
+        element.clear(keep_tail=True)
+        while element.getprevious() is not None:
+            del element.getparent()[0]
+
+
+def open_xhtml(path: Path) -> IO[bytes]:
+    # MEMO: packed books have no loose file, so the blob is read into memory.
+    if path.exists():
+        return open(path, "rb")
+    return io.BytesIO(read_xhtml_bytes(path))
+
+
+def iter_book_paragraphs(book_dir: Path, toc: Iterable[TocNode]) -> Iterator[ParagraphRecord]:
+    """Yield `(chapter_id, paragraph_index, text)` of every chapter in the toc.
+
+    Each file is parsed once with iterparse, even when the toc points to many sections in it.
+    Front and back matter in SKIPPED_TITLES are not read.
+    """
+    for file_name, chapter_ids in group_chapter_ids_by_file(toc).items():
+        with open_xhtml(book_dir / file_name) as source:
+            yield from iter_file_paragraphs(source, chapter_ids)
@@ -0,0 +1,155 @@
+"""plain_text.py: Read `texts/*.txt` novels through mmap, without copying the whole book.
+
+One pass over the mapped bytes finds paragraphs (blocks between blank lines) and chapter headings.
+Paragraphs are yielded as byte spans of the file, and only the text which is asked for is decoded.
+
+EXAMPLE:
+    with PlainTextReader(Path("texts/LostHorizon.txt")) as reader:
+        for chapter in reader.iter_chapters():
+            print(chapter.title, len(chapter.paragraphs))
+"""
+
+import codecs
+import mmap
+import re
+from collections.abc import Iterator
+from pathlib import Path
+from types import TracebackType
+from typing import Literal
+from typing import NamedTuple
+from typing import Self
+
+HeadingKind = Literal[
+    "PART", "CHAPTER", "PROLOGUE", "EPILOGUE", "OPENING", "TRANSCRIBER_NOTES", "THE_END"
+]
+
+# MEMO: a run of line breaks. Lines with only spaces are blank lines too. CRLF files are common.
+NEWLINES_PATTERN = re.compile(rb"(?:[ \t]*\r?\n)+")
+# MEMO: same headings as `old_processer.make_component_tag`, with roman numbers added.
+# EXAMPLE: "CHAPTER 1", "CHAPTER IX", "Chapter 3. The Storm", "PROLOGUE", "THE END"
+NUMBER = rb"(?:\d+|[IVXLCDM]+)\b"
+# MEMO: headings are often centered with spaces. Only keywords ignore case.
+# WHYNOT: `(?i)` for the whole pattern makes "Part civil war broke out." a heading of "civil".
+HEADING_PATTERNS: dict[HeadingKind, re.Pattern[bytes]] = {
+    "PART": re.compile(rb"\s*(?i:PART)\s+" + NUMBER),
+    "CHAPTER": re.compile(rb"\s*(?i:CHAPTER)\s+" + NUMBER),
+    "PROLOGUE": re.compile(rb"\s*(?i:PROLOGUE)\b"),
+    "EPILOGUE": re.compile(rb"\s*(?i:EPILOGUE)\b"),
+    "OPENING": re.compile(rb"\s*(?i:OPENING)\b"),
+    "TRANSCRIBER_NOTES": re.compile(rb"\s*(?i:TRANSCRIBER(?:'S)?\s+NOTES?)\b"),
+    "THE_END": re.compile(rb"\s*THE END\b"),
+}
+# WHYNOT: "Part of Conway was always an onlooker ..." starts like a heading. Headings are short.
+HEADING_MAX_BYTES = 120
+
+
+class Span(NamedTuple):
+    """A paragraph as byte offsets of the file. Single line breaks inside are not removed yet."""
+
+    start: int
+    end: int
+    # MEMO: line breaks which follow the paragraph. 0 for the last paragraph.
+    newlines: int
+
+
+class PlainTextChapter(NamedTuple):
+    # MEMO: kind is None for the front matter before the first heading.
+    kind: HeadingKind | None
+    title: str
+    paragraphs: list[Span]
+
+
+def find_heading_kind(data: bytes | mmap.mmap, span: Span) -> HeadingKind | None:
+    if span.end - span.start > HEADING_MAX_BYTES:
+        return None
+    for kind, pattern in HEADING_PATTERNS.items():
+        if pattern.match(data, span.start, span.end):
+            return kind
+    return None
+
+
+class PlainTextReader:
+    """A memory-mapped plain text novel.
+
+    `old_processer.remove_single_newlines` copies the whole book five times. Here the file is
+    mapped, scanned once, and each paragraph is decoded on its own when it is used.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.fp = open(path, "rb")
+        try:
+            # MEMO: an empty file can not be mapped.
+            self.data: bytes | mmap.mmap = (
+                mmap.mmap(self.fp.fileno(), 0, access=mmap.ACCESS_READ)
+                if self.fp.seek(0, 2)
+                else b""
+            )
+        except BaseException:
+            # MEMO: __exit__ never runs when __init__ raises, so the file is closed here.
+            self.fp.close()
+            raise
+        self.start = len(codecs.BOM_UTF8) if self.data[:3] == codecs.BOM_UTF8 else 0
+
+    def __enter__(self) -> Self:
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        self.close()
+
+    def close(self) -> None:
+        if isinstance(self.data, mmap.mmap):
+            self.data.close()
+        self.fp.close()
+
+    def iter_paragraphs(self) -> Iterator[Span]:
+        """Yield non-empty paragraphs in file order. Leading and trailing blank lines are dropped."""
+        start = self.start
+        for match in NEWLINES_PATTERN.finditer(self.data, self.start):
+            newlines = match.group().count(b"\n")
+            # MEMO: a single line break is inside a paragraph.
+            if newlines < 2:
+                continue
+            if start < match.start():
+                yield Span(start, match.start(), newlines)
+            start = match.end()
+        end = len(self.data)
+        if start < end and self.data[start:end].strip():
+            yield Span(start, end, 0)
+
+    def text(self, span: Span) -> str:
+        # MEMO: single line breaks and indentation become one space, as they are only wrapping.
+        return " ".join(str(self.data[span.start : span.end], "utf-8").split())
+
+    def iter_chapters(self) -> Iterator[PlainTextChapter]:
+        """Group paragraphs by headings in the same pass which finds the paragraphs."""
+        chapter = PlainTextChapter(None, "", [])
+        for span in self.iter_paragraphs():
+            if (kind := find_heading_kind(self.data, span)) is None:
+                chapter.paragraphs.append(span)
+                continue
+            if chapter.kind is not None or chapter.paragraphs:
+                yield chapter
+            chapter = PlainTextChapter(kind, self.text(span), [])
+        if chapter.kind is not None or chapter.paragraphs:
+            yield chapter
+
+    def iter_normalized_text(self) -> Iterator[str]:
+        """Yield the text with single line breaks removed, paragraph by paragraph.
+
+        Blank lines between paragraphs are kept as they are, like `remove_single_newlines`.
+        """
+        for span in self.iter_paragraphs():
+            yield self.text(span)
+            yield "\n" * span.newlines
+
+
+def read_normalized_text(path: Path) -> str:
+    # MEMO: one copy of the result, instead of one for each replace in `remove_single_newlines`.
+    with PlainTextReader(path) as reader:
+        return "".join(reader.iter_normalized_text())
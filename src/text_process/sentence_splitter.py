@@ -0,0 +1,40 @@
+"""sentence_splitter.py: A rule based English sentence splitter for novel text."""
+
+import re
+from collections.abc import Iterator
+
+# MEMO: a sentence ends with terminal punctuation and optional closing quotes or brackets,
+# followed by space and something which can start a sentence.
+SENTENCE_END_PATTERN = re.compile(r"[.!?…]+[\"”’)\]]*(?=\s+[\"“‘(\[]?[A-Z0-9])")
+# EXAMPLE: "Mr. Gillingham" is not two sentences.
+ABBREVIATIONS = frozenset(
+    "Mr Mrs Ms Dr St Mt Messrs Mme Mlle Jr Sr Capt Col Gen Lt Rev Prof Hon Gov Sgt No vs viz etc "
+    "i.e e.g".split()
+)
+ABBREVIATION_PATTERN = re.compile(r"(\S+)\.$")
+
+
+def is_abbreviation(text_before_end: str) -> bool:
+    if match := ABBREVIATION_PATTERN.search(text_before_end):
+        word = match.group(1).lstrip('"“‘(')
+        # MEMO: single capital letters are initials like "J. M. Keynes".
+        return word in ABBREVIATIONS or (len(word) == 1 and word.isupper())
+    return False
+
+
+def iter_sentences(text: str) -> Iterator[str]:
+    """Split normalized text into sentences. Empty sentences are not yielded."""
+    start = 0
+    for match in SENTENCE_END_PATTERN.finditer(text):
+        end = match.end()
+        if match.group().startswith(".") and is_abbreviation(text[start : match.start() + 1]):
+            continue
+        if sentence := text[start:end].strip():
+            yield sentence
+        start = end
+    if sentence := text[start:].strip():
+        yield sentence
+
+
+def split_sentences(text: str) -> list[str]:
+    return list(iter_sentences(text))
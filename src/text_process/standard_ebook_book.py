@@ -0,0 +1,287 @@
+"""standard_ebook_book.py: Convert a downloaded Standard Ebooks book directory into `domain.book.Book`.
+
+Structure:
+    Book -> Chapter (toc level 0) -> Section (toc level 1) -> SubSection (deeper or untitled)
+    -> Paragraph -> (SubParagraph for each block of a blockquote) -> (Line for verse) -> Sentence
+
+EXAMPLE: python -m text_process.standard_ebook_book --workers 8
+"""
+
+import argparse
+import os
+from collections.abc import Iterable
+from collections.abc import Iterator
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import structlog
+from lxml import etree
+from lxml.etree import _Element as Element
+from structlog.stdlib import BoundLogger
+
+from domain.book import Book
+from domain.book import Chapter
+from domain.book import Line
+from domain.book import Paragraph
+from domain.book import Section
+from domain.book import Sentence
+from domain.book import SubParagraph
+from domain.book import SubSection
+from domain.componet import TextComponent
+from domain.serialization import ComponentCache
+from domain.serialization import hash_sources
+from text_process.chapter_text import SKIPPED_TITLES
+from text_process.chapter_text import group_chapter_ids_by_file
+from text_process.chapter_text import split_href
+from text_process.sentence_splitter import iter_sentences
+from text_process.toc_node import TocNode
+from text_process.toc_node import load_toc
+from utils.data_io import read_xhtml_bytes
+from utils.logger_config import configure_logger
+from utils.xhtml import read_root
+
+BOOK_DIR = Path(os.environ.get("BOOK_DIR", "/books"))
+BOOK_CACHE_DIR = BOOK_DIR / ".book_cache"
+# MEMO: bump this when the conversion result changes. Cached books of old versions are not used.
+CONVERTER_VERSION = 2
+
+COMPONENTS_BY_NEST_LEVEL: tuple[type[TextComponent], ...] = (Chapter, Section, SubSection)
+CONTAINER_TAGS = frozenset({"section", "article"})
+# MEMO: they only wrap blocks, so their children are read as if they were in the parent.
+WRAPPER_TAGS = frozenset({"div", "footer", "aside"})
+
+
+def local_name(element: Element) -> str:
+    # MEMO: works for both HTMLParser (no namespace) and XMLParser ("{namespace}p") roots.
+    return element.tag.rpartition("}")[2] if isinstance(element.tag, str) else ""
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+def split_lines(p_element: Element) -> list[str]:
+    # EXAMPLE: <p><span>Isn’t it funny</span><br/><span>How a bear likes honey?</span></p>
+    lines = [p_element.text or ""]
+    for child in p_element:
+        if local_name(child) == "br":
+            lines.append("")
+        else:
+            lines[-1] += "".join(child.itertext())
+        lines[-1] += child.tail or ""
+    return [line for line in map(normalize_text, lines) if line]
+
+
+def convert_paragraph(
+    p_element: Element, component_class: type[TextComponent] = Paragraph
+) -> TextComponent | None:
+    if any(local_name(child) == "br" for child in p_element):
+        lines = [Line(contents=[Sentence(contents=line)]) for line in split_lines(p_element)]
+        return component_class(contents=lines, part_title="verse") if lines else None
+    sentences = [
+        Sentence(contents=sentence)
+        for sentence in iter_sentences(normalize_text("".join(p_element.itertext())))
+    ]
+    return component_class(contents=sentences) if sentences else None
+
+
+def convert_blockquote(blockquote_element: Element) -> TextComponent | None:
+    # EXAMPLE: epub:type is "z3998:verse", "z3998:song", "z3998:letter" or none.
+    blocks = [
+        block
+        for p_element in blockquote_element.iter("p", "{*}p")
+        if (block := convert_paragraph(p_element, SubParagraph)) is not None
+    ]
+    if not blocks:
+        return None
+    return Paragraph(contents=blocks, part_title=blockquote_element.get("epub:type", "blockquote"))
+
+
+def convert_children(element: Element, toc_ids: set[str]) -> list[TextComponent]:
+    """Convert children of a container in document order.
+
+    Args:
+        element: A section, an article or a wrapper like div.
+        toc_ids: Ids which have their own toc entry. They are converted from the toc, not here.
+    """
+    contents: list[TextComponent] = []
+    for child in element:
+        match local_name(child):
+            case "p":
+                component = convert_paragraph(child)
+            case "blockquote":
+                component = convert_blockquote(child)
+            case tag if tag in CONTAINER_TAGS:
+                if child.get("id") in toc_ids:
+                    continue
+                sub_contents = convert_children(child, toc_ids)
+                component = SubSection(contents=sub_contents) if sub_contents else None
+            case tag if tag in WRAPPER_TAGS:
+                contents.extend(convert_children(child, toc_ids))
+                continue
+            case _:
+                # MEMO: headings are taken from the toc title instead.
+                # WHYNOT: figures, tables and lists are not prose to translate. Skipped for now.
+                continue
+        if component is not None:
+            contents.append(component)
+    return contents
+
+
+def index_elements_by_id(root: Element) -> dict[str, Element]:
+    # PERFORMANCE: one walk per file, instead of one `//*[@id=...]` search per toc entry.
+    elements_by_id: dict[str, Element] = {}
+    for element in root.iter(etree.Element):
+        # MEMO: the first element wins on duplicate ids, same as `//*[@id=...][1]`.
+        if (element_id := element.get("id")) is not None:
+            elements_by_id.setdefault(element_id, element)
+    return elements_by_id
+
+
+class BookConverter:
+    """Convert one book directory. Each xhtml file is parsed once, and shared by its toc entries."""
+
+    def __init__(
+        self,
+        book_dir: Path,
+        toc: list[TocNode],
+        logger: BoundLogger = structlog.get_logger(__name__),
+    ) -> None:
+        self.book_dir = book_dir
+        self.toc = toc
+        self.logger = logger
+        self.toc_ids_by_file = group_chapter_ids_by_file(toc)
+        self.elements_by_id_by_file: dict[str, dict[str, Element]] = {}
+
+    def find_container(self, file_name: str, chapter_id: str) -> Element | None:
+        root = read_root(self.book_dir / file_name)
+        if (elements_by_id := self.elements_by_id_by_file.get(file_name)) is None:
+            elements_by_id = self.elements_by_id_by_file[file_name] = index_elements_by_id(root)
+        if (container := elements_by_id.get(chapter_id)) is not None:
+            return container
+        # MEMO: some files have a container whose id is not the file name.
+        # WHYNOT: when the file has other toc entries, body would repeat their text here.
+        if len(self.toc_ids_by_file.get(file_name, ())) > 1:
+            self.logger.warning(
+                "Toc entry is not found.",
+                book_name=self.book_dir.name,
+                file_name=file_name,
+                chapter_id=chapter_id,
+            )
+            return None
+        return next((element for element in root.iter("body", "{*}body")), None)
+
+    def convert(self) -> Book:
+        chapters = self.convert_nodes(self.toc, 0)
+        return Book(contents=chapters, part_title=self.book_dir.name)  # type: ignore
+
+    def convert_nodes(self, nodes: Iterable[TocNode], nest_level: int) -> list[TextComponent]:
+        return [
+            component
+            for node in nodes
+            if node.title not in SKIPPED_TITLES and node.href
+            if (component := self.convert_node(node, nest_level)) is not None
+        ]
+
+    def convert_node(self, node: TocNode, nest_level: int) -> TextComponent | None:
+        file_name, chapter_id = split_href(node.href)
+        contents: list[TextComponent] = []
+        if (container := self.find_container(file_name, chapter_id)) is not None:
+            contents = convert_children(container, self.toc_ids_by_file.get(file_name, set()))
+        contents += self.convert_nodes(node.subchapters, nest_level + 1)
+        if not contents:
+            return None
+        component_class = COMPONENTS_BY_NEST_LEVEL[
+            min(nest_level, len(COMPONENTS_BY_NEST_LEVEL) - 1)
+        ]
+        return component_class(contents=contents, part_title=node.title)
+
+
+def convert_book(book_dir: Path, toc: list[TocNode] | None = None) -> Book:
+    return BookConverter(book_dir, toc or load_toc(book_dir / "toc.json")).convert()
+
+
+def book_source_paths(book_dir: Path, toc: list[TocNode]) -> list[Path]:
+    return [book_dir / "toc.json", *(book_dir / name for name in group_chapter_ids_by_file(toc))]
+
+
+def load_book(book_dir: Path, cache: ComponentCache | None = None) -> Book:
+    """Convert a book, or load it from the cache when its sources are unchanged."""
+    toc = load_toc(book_dir / "toc.json")
+    if cache is None:
+        return convert_book(book_dir, toc)
+    key = hash_sources(
+        book_source_paths(book_dir, toc),
+        f"standard_ebook_book:{CONVERTER_VERSION}",
+        read_xhtml_bytes,
+    )
+    return cache.get_or_build(key, lambda: convert_book(book_dir, toc))
+
+
+def convert_book_safely(
+    book_dir: Path, cache_dir: Path | None = None
+) -> tuple[Path, int | None, str | None]:
+    # MEMO: this runs in worker processes, so it reports errors by return value.
+    # PERFORMANCE: only the chapter count goes back. Pickling a whole Book costs more than the
+    # conversion, and the book is already in the cache.
+    try:
+        cache = ComponentCache(cache_dir) if cache_dir else None
+        return book_dir, len(load_book(book_dir, cache)), None
+    except Exception as e:
+        return book_dir, None, f"{type(e).__name__}: {e}"
+
+
+def iter_converted_books(
+    book_dirs: list[Path], workers: int | None = None, cache_dir: Path | None = None
+) -> Iterator[tuple[Path, int | None, str | None]]:
+    """Convert books with a process pool. Results come in the order of `book_dirs`.
+
+    When `cache_dir` is given, unchanged books are loaded from the cache instead of converted.
+    Use `load_book` with the same cache to read the converted books.
+
+    Yields:
+        The book directory, the number of chapters or None, and the error message or None.
+    """
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1) as executor:
+        yield from executor.map(convert_book_safely, book_dirs, [cache_dir] * len(book_dirs))
+
+
+def convert_all_books(
+    book_dir: Path = BOOK_DIR,
+    workers: int | None = None,
+    logger: BoundLogger = structlog.get_logger(__name__),
+    cache_dir: Path | None = BOOK_CACHE_DIR,
+) -> dict[str, str]:
+    # RETURNS: error messages of failed books by book name.
+    book_dirs = sorted(
+        repo_dir
+        for repo_dir in book_dir.iterdir()
+        if repo_dir.is_dir() and not repo_dir.name.startswith(".")
+        if (repo_dir / "toc.json").exists()
+    )
+    failures: dict[str, str] = {}
+    for repo_dir, chapters, error in iter_converted_books(book_dirs, workers, cache_dir):
+        if chapters is None:
+            failures[repo_dir.name] = error or ""
+            logger.error("Failed to convert book.", book_name=repo_dir.name, error=error)
+            continue
+        logger.info("Book converted.", book_name=repo_dir.name, chapters=chapters)
+    logger.info(
+        "Book conversion finished.", converted=len(book_dirs) - len(failures), failed=len(failures)
+    )
+    return failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert Standard Ebooks books to domain books.")
+    parser.add_argument("--workers", type=int, default=None, help="default: number of cpus.")
+    parser.add_argument("--no-cache", action="store_true", help="convert even unchanged books.")
+    args = parser.parse_args()
+
+    configure_logger()
+    logger = structlog.get_logger(__name__)
+    convert_all_books(BOOK_DIR, args.workers, logger, None if args.no_cache else BOOK_CACHE_DIR)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,28 @@
+import argparse
 import json
 import os
-from dataclasses import asdict
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from dataclasses import field
 from pathlib import Path
-from typing import Self
+from typing import Literal
 
 import structlog
 from lxml import etree
-from lxml.etree import HTMLParser
 from lxml.etree import _Element as Element
 from structlog.stdlib import BoundLogger
 
+from text_process.toc_node import TocNode
+from utils.data_io import write_atomically
 from utils.logger_config import configure_logger
+from utils.xhtml import LI_HREF_XPATH
+from utils.xhtml import LI_NAME_XPATH
+from utils.xhtml import LI_NUMBER_XPATH
+from utils.xhtml import LI_SUBCHAPTERS_XPATH
+from utils.xhtml import find_title
+from utils.xhtml import find_toc_chapters
+from utils.xhtml import first_result
+from utils.xhtml import parse_xhtml
 
 BOOK_DIR = Path(os.environ.get("BOOK_DIR", "/books"))
 
@@ -20,59 +30,9 @@ BOOK_DIR = Path(os.environ.get("BOOK_DIR", "/books"))
 namespaces = {"xhtml": "http://www.w3.org/1999/xhtml"}
 
 
-@dataclass
-class Chapter:
-    title: str = field(init=False)
-    number: str
-    name: str
-    href: str
-    nest_level: int
-    query: str
-    url: str  # TODO: you can get base file url from info.json but I didn't implement it and url is empty now.
-    subchapters: list[Self | Element] = field(default_factory=list)
-    """
-    # Example:
-    title : 'III: The Division of Labour'
-    number: 'III'
-    name : ': The Division of Labour'
-    ## MEMO: I hate this format.
-
-    # NOTICE: in some data, specially book, this format broken.
-    result is BOOKIIIBOOK_NAME
-    I expect BOOKIII: BOOK_NAME
-    I hate this format more.
-
-    # MEMO:nest level:
-    these book nest_levl is very deep. max is 5.
-    aleksandr-kuprin_short-fiction_s-koteliansky_j-m-murry_stephen-graham_rosa-savory-graham_leo-pasvols
-    alexander-pushkin_eugene-onegin_henry-spalding
-    adam-smith_the-wealth-of-nations
-
-    # HACK: I used post init. but I noticed that I should not use it, because reading this data from dict.json is difficult owingt to post_init action.
-    # But this is simple and rewriting cost is high.
-    """
-
-    def __post_init__(self):
-        self.subchapters = process_raw_chapters_into_formated(
-            raw_chapters=self.subchapters,  # type: ignore
-            query=self.query + "/ol/li",
-            nest_level=self.nest_level + 1,
-            url=self.url,
-        )
-        self.title = "".join(self.number + self.name)
-
-    def to_dict(self):
-        if self.subchapters:
-            self.subchapters = [subchapter.to_dict() for subchapter in self.subchapters]  # type: ignore
-
-        return asdict(self)
-
-
 def find_root(xml_data: bytes) -> Element:
-    # MEMO: HTMLParser is easy for me more than lxml.etree.XMLParser.
-    parser = HTMLParser(encoding="UTF-8")
-    # WHYNOT: if I use xml.etree.ElementTree, I can read from utf-8 string, but I don't want to do mix-usage of xml.etree.ElementTree and lxml.etree.
-    return etree.fromstring(xml_data, parser)
+    # MEMO: the parser and the root of the same bytes are shared. See utils.xhtml.
+    return parse_xhtml(xml_data)
 
 
 def parse_from_xml_data(query: str, xml_data: bytes) -> list[Element]:
@@ -81,41 +41,113 @@ def parse_from_xml_data(query: str, xml_data: bytes) -> list[Element]:
 
 
 def find_file_title(xml_data: bytes) -> str | None:
-    return parse_from_xml_data("//html/head/title", xml_data=xml_data)[0].text
+    return find_title(find_root(xml_data))
 
 
 def find_chapters(xml_data: bytes) -> list[Element]:
-    return parse_from_xml_data("//html/body/nav[@id='toc'][1]/ol/li", xml_data)
+    return find_toc_chapters(find_root(xml_data))
 
 
 def process_raw_chapters_into_formated(
     raw_chapters: list[Element], query: str, nest_level=0, url=""
-) -> list[Chapter]:
+) -> list[TocNode]:
     return [
         make_chapter(raw_chapter, query, nest_level, url, index)
         for index, raw_chapter in enumerate(raw_chapters, start=1)
     ]
 
 
-def make_chapter(a_element: Element, query: str, nest_level: int, url: str, index: int) -> Chapter:
+def make_chapter(a_element: Element, query: str, nest_level: int, url: str, index: int) -> TocNode:
     # EXAMPLE: `<a href="text/chapter-3.xhtml"><span epub:type="z3998:roman">III</span>: The Conference</a>`.
+    number = first_result(a_element, LI_NUMBER_XPATH)
+    name = first_result(a_element, LI_NAME_XPATH)
+    query = query + f"[{index}]" if query else ""
+    return TocNode(
+        title=number + name,
+        number=number,
+        name=name,
+        href=first_result(a_element, LI_HREF_XPATH),
+        nest_level=nest_level,
+        query=query,
+        url=url,
+        subchapters=process_raw_chapters_into_formated(
+            LI_SUBCHAPTERS_XPATH(a_element),  # type: ignore
+            query + "/ol/li",
+            nest_level + 1,
+            url,
+        ),
+    )
 
-    def get_query_result_with_check(element: Element, query: str) -> str:
-        if result := element.xpath(query):
-            return result[0]  # type: ignore # reason at parse_from_xml_data
-        return ""
 
-    return Chapter(
-        number=get_query_result_with_check(a_element, "a/span/text()"),
-        name=get_query_result_with_check(a_element, "a/text()"),
-        href=get_query_result_with_check(a_element, "a/@href"),
+def first_text(element: Element) -> str:
+    # MEMO: same as the first result of `element/text()`. Text nodes are `text` and tails of children.
+    if element.text:
+        return element.text
+    for child in element:
+        if child.tail:
+            return child.tail
+    return ""
+
+
+def build_chapter(li_element: Element, query: str, nest_level: int, url: str) -> TocNode:
+    """Build a TocNode and its subchapters by walking children once, without XPath.
+
+    The result is the same as `make_chapter`.
+    """
+    number = name = href = ""
+    for a_element in li_element.iterchildren("a"):
+        # MEMO: each field is the first match in document order, like `a/span/text()`[0].
+        if not name:
+            name = first_text(a_element)
+        if not href:
+            href = a_element.get("href", "")
+        if not number:
+            number = next(filter(None, map(first_text, a_element.iterchildren("span"))), "")
+
+    subchapters = [
+        build_chapter(sub_li_element, query + f"/ol/li[{index}]", nest_level + 1, url)
+        for index, sub_li_element in enumerate(
+            (
+                sub_li_element
+                for ol_element in li_element.iterchildren("ol")
+                for sub_li_element in ol_element.iterchildren("li")
+            ),
+            start=1,
+        )
+    ]
+    return TocNode(
+        title=f"{number}{name}",
+        number=str(number),
+        name=str(name),
+        href=str(href),
         nest_level=nest_level,
-        query=query + f"[{index}]" if query else "",
+        query=query,
         url=url,
-        subchapters=a_element.xpath("ol/li"),  # type: ignore
+        subchapters=subchapters,
     )
 
 
+def build_chapters(root: Element) -> list[TocNode]:
+    # MEMO: walks `//html/body/nav[@id='toc'][1]/ol/li` by hand.
+    query = "//html/body/nav[@id='toc'][1]/ol/li"
+    nav_elements = (
+        next((nav for nav in body.iterchildren("nav") if nav.get("id") == "toc"), None)
+        for html_element in root.iter("html")
+        for body in html_element.iterchildren("body")
+    )
+    li_elements = (
+        li_element
+        for nav_element in nav_elements
+        if nav_element is not None
+        for ol_element in nav_element.iterchildren("ol")
+        for li_element in ol_element.iterchildren("li")
+    )
+    return [
+        build_chapter(li_element, query + f"[{index}]", 0, "")
+        for index, li_element in enumerate(li_elements, start=1)
+    ]
+
+
 # //section[@id='chapter-39']/@id
 # //section[@id='chapter-39']/@epub:type
 
@@ -124,10 +156,10 @@ def create_dict_formated_chapters(chapters):
     return [chapter.to_dict() for chapter in chapters]
 
 
-def create_formated_chapters(xml_data: bytes) -> list[Chapter]:
-    return process_raw_chapters_into_formated(
-        find_chapters(xml_data), "//html/body/nav[@id='toc'][1]/ol/li"
-    )
+def create_formated_chapters(xml_data: bytes) -> list[TocNode]:
+    # PERFORMANCE: `build_chapters` parses once and never evaluates XPath per node.
+    # Deep books like adam-smith_the-wealth-of-nations were slow with `process_raw_chapters_into_formated`.
+    return build_chapters(find_root(xml_data))
 
 
 def show(element: Element | list[Element]) -> None:
@@ -157,14 +189,45 @@ def tutorial():
         json.dump([c.to_dict() for c in chapters], fp)
 
 
-def process_repo(repo_dir: Path, logger: BoundLogger, force=False) -> None:
-    if not (repo_dir / "toc.xhtml").exists():
-        logger.warning("toc.xhtml does not exist", repo_path=repo_dir)
-        return
+# MEMO: "missing" means no toc.xhtml. "skipped" means toc.json is newer than toc.xhtml.
+type ConvertStatus = Literal["created", "skipped", "missing", "failed"]
+
+
+@dataclass
+class ConvertResult:
+    repo_dir: Path
+    status: ConvertStatus
+    error: str | None = None
 
-    if (repo_dir / "toc.json").exists() and not force:
-        logger.info("toc.json already exists", repo_path=repo_dir)
-        return
+
+@dataclass
+class ConvertSummary:
+    created: int = 0
+    skipped: int = 0
+    missing: int = 0
+    failures: dict[str, str] = field(default_factory=dict)
+
+    def add(self, result: ConvertResult) -> None:
+        if result.status == "failed":
+            self.failures[result.repo_dir.name] = result.error or ""
+        else:
+            setattr(self, result.status, getattr(self, result.status) + 1)
+
+
+def is_toc_json_fresh(repo_dir: Path) -> bool:
+    toc_json_path = repo_dir / "toc.json"
+    return (
+        toc_json_path.exists()
+        and toc_json_path.stat().st_mtime >= (repo_dir / "toc.xhtml").stat().st_mtime
+    )
+
+
+def convert_toc(repo_dir: Path, force=False) -> ConvertResult:
+    # MEMO: this runs in worker processes, so it reports by return value instead of logging.
+    if not (repo_dir / "toc.xhtml").exists():
+        return ConvertResult(repo_dir, "missing")
+    if not force and is_toc_json_fresh(repo_dir):
+        return ConvertResult(repo_dir, "skipped")
 
     try:
         with open(repo_dir / "toc.xhtml") as file:
@@ -172,22 +235,90 @@ def process_repo(repo_dir: Path, logger: BoundLogger, force=False) -> None:
 
         chapters = create_formated_chapters(xml_data)
 
-        with open(repo_dir / "toc.json", "w") as fp:
-            json.dump([c.to_dict() for c in chapters], fp)
+        # MEMO: workers may be killed mid-write. A torn toc.json would look fresh by mtime.
+        write_atomically(json.dumps([c.to_dict() for c in chapters]), repo_dir / "toc.json")
+    except Exception as e:
+        return ConvertResult(repo_dir, "failed", f"{type(e).__name__}: {e}")
+    return ConvertResult(repo_dir, "created")
 
-        logger.info("toc.json created", repo_path=repo_dir)
 
-    except Exception as e:
-        logger.exception("Failed to process repo", repo_path=repo_dir, exception=e)
+def process_repo(repo_dir: Path, logger: BoundLogger, force=False) -> None:
+    result = convert_toc(repo_dir, force)
+    match result.status:
+        case "missing":
+            logger.warning("toc.xhtml does not exist", repo_path=repo_dir)
+        case "skipped":
+            logger.info("toc.json is up to date", repo_path=repo_dir)
+        case "failed":
+            logger.error("Failed to process repo", repo_path=repo_dir, error=result.error)
+        case "created":
+            logger.info("toc.json created", repo_path=repo_dir)
+
+
+def find_repo_dirs(book_dir: Path = BOOK_DIR) -> list[Path]:
+    # MEMO: dot directories are crawler data like `.objects` and `.http_cache`.
+    return sorted(
+        repo_dir
+        for repo_dir in book_dir.iterdir()
+        if repo_dir.is_dir() and not repo_dir.name.startswith(".")
+    )
+
+
+def convert_all_tocs(
+    book_dir: Path = BOOK_DIR,
+    workers: int | None = None,
+    force=False,
+    logger: BoundLogger = structlog.get_logger(__name__),
+) -> ConvertSummary:
+    """Convert toc.xhtml to toc.json of every book with a process pool.
+
+    Args:
+        book_dir: The directory which has one directory per book.
+        workers: The number of processes. `os.cpu_count()` is used when it is None.
+        force: Convert even when toc.json is newer than toc.xhtml. EXAMPLE: after a parser change.
+        logger: A logger.
+
+    Returns:
+        Counts of each status, and error messages of failed repos by repo name.
+    """
+    repo_dirs = find_repo_dirs(book_dir)
+    workers = workers or os.cpu_count() or 1
+    summary = ConvertSummary()
+    # PERFORMANCE: one toc is small, so send repos in chunks to cut inter-process round trips.
+    chunksize = max(1, len(repo_dirs) // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for result in executor.map(
+            convert_toc, repo_dirs, [force] * len(repo_dirs), chunksize=chunksize
+        ):
+            summary.add(result)
+            if result.status == "failed":
+                logger.error(
+                    "Failed to process repo", repo_path=result.repo_dir, error=result.error
+                )
+
+    logger.info(
+        "TOC conversion finished.",
+        workers=workers,
+        created=summary.created,
+        skipped=summary.skipped,
+        missing=summary.missing,
+        failed=len(summary.failures),
+    )
+    return summary
 
 
 def main():
+    parser = argparse.ArgumentParser(description="Convert toc.xhtml to toc.json of every book.")
+    parser.add_argument("--workers", type=int, default=None, help="default: number of cpus.")
+    parser.add_argument("--force", action="store_true", help="convert even up-to-date books.")
+    args = parser.parse_args()
+
     configure_logger()
     logger = structlog.get_logger(__name__)
 
-    for repo_dir in list(BOOK_DIR.glob("*")):
-        if repo_dir.is_dir():
-            process_repo(repo_dir, logger, force=True)
+    summary = convert_all_tocs(BOOK_DIR, args.workers, args.force, logger)
+    for repo_name, error in summary.failures.items():
+        logger.error("Failed repo", repo_name=repo_name, error=error)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,127 @@
+"""toc_node.py: A light TOC model, written to toc.json by `standard_ebook_toc` and read back.
+
+`standard_ebook_toc` builds TocNode from toc.xhtml, and `load_toc` builds it by `json.load` directly.
+"""
+
+import json
+from collections.abc import Iterable
+from collections.abc import Iterator
+from pathlib import Path
+from typing import Any
+from typing import Self
+
+
+class TocNode:
+    """An entry of toc.xhtml.
+
+    # EXAMPLE:
+    title : 'III: The Division of Labour'
+    number: 'III'
+    name : ': The Division of Labour'
+    ## MEMO: I hate this format.
+
+    # NOTICE: in some data, specially book, this format broken.
+    result is BOOKIIIBOOK_NAME
+    I expect BOOKIII: BOOK_NAME
+
+    # MEMO: nest level of these books is very deep. max is 5.
+    aleksandr-kuprin_short-fiction_s-koteliansky_j-m-murry_stephen-graham_rosa-savory-graham_leo-pasvols
+    alexander-pushkin_eugene-onegin_henry-spalding
+    adam-smith_the-wealth-of-nations
+    """
+
+    # PERFORMANCE: slots make thousands of nodes small, and no dataclass machinery runs on load.
+    __slots__ = ("title", "number", "name", "href", "nest_level", "query", "url", "subchapters")
+
+    def __init__(
+        self,
+        title: str,
+        number: str,
+        name: str,
+        href: str,
+        nest_level: int,
+        query: str,
+        url: str,
+        subchapters: list[Self],
+    ) -> None:
+        self.title = title
+        self.number = number
+        self.name = name
+        self.href = href
+        self.nest_level = nest_level
+        self.query = query
+        # TODO: you can get base file url from info.json but I didn't implement it and url is empty now.
+        self.url = url
+        self.subchapters = subchapters
+
+    def __repr__(self) -> str:
+        return f"TocNode(title={self.title!r}, nest_level={self.nest_level}, href={self.href!r})"
+
+    @classmethod
+    def from_json_object(cls, data: dict[str, Any]) -> Self:
+        # MEMO: used as `object_hook`, so subchapters are already TocNode when a parent is built.
+        return cls(
+            data["title"],
+            data["number"],
+            data["name"],
+            data["href"],
+            data["nest_level"],
+            data["query"],
+            data["url"],
+            data.get("subchapters") or [],
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        # MEMO: the key order of toc.json. It was `asdict` of the old Chapter dataclass.
+        return {
+            "title": self.title,
+            "number": self.number,
+            "name": self.name,
+            "href": self.href,
+            "nest_level": self.nest_level,
+            "query": self.query,
+            "url": self.url,
+            "subchapters": [subchapter.to_dict() for subchapter in self.subchapters],
+        }
+
+
+def load_toc(path: Path | str) -> list[TocNode]:
+    # PERFORMANCE: nodes are built while json is decoded. No second walk over dicts.
+    with open(path, "rb") as fp:
+        return json.load(fp, object_hook=TocNode.from_json_object)
+
+
+def iter_toc_nodes(nodes: Iterable[TocNode]) -> Iterator[TocNode]:
+    # MEMO: pre-order, same as the order in toc.xhtml. Iterative, so deep books never hit recursion.
+    stack = list(reversed(list(nodes)))
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.subchapters))
+
+
+def max_nest_level(nodes: Iterable[TocNode]) -> int:
+    # MEMO: children are always deeper than parents, so this equals the max over leaves.
+    return max((node.nest_level for node in iter_toc_nodes(nodes)), default=0)
+
+
+def count_toc_nodes(nodes: Iterable[TocNode]) -> int:
+    return sum(1 for _ in iter_toc_nodes(nodes))
+
+
+def flatten_toc(nodes: Iterable[TocNode]) -> tuple[list[TocNode], list[int]]:
+    """Flatten a TOC in pre-order for bulk statistics.
+
+    Returns:
+        Nodes in pre-order, and the index of the parent of each node. -1 means a top level node.
+    """
+    flat_nodes: list[TocNode] = []
+    parents: list[int] = []
+    stack = [(node, -1) for node in reversed(list(nodes))]
+    while stack:
+        node, parent = stack.pop()
+        index = len(flat_nodes)
+        flat_nodes.append(node)
+        parents.append(parent)
+        stack.extend((subchapter, index) for subchapter in reversed(node.subchapters))
+    return flat_nodes, parents
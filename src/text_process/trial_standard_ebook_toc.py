@@ -1,18 +1,22 @@
 import json
 import os
-from dataclasses import asdict
-from dataclasses import dataclass
-from dataclasses import field
 from pathlib import Path
-from typing import Self
 
 import structlog
 from lxml import etree
-from lxml.etree import HTMLParser
 from lxml.etree import _Element as Element
 from structlog.stdlib import BoundLogger
 
+from text_process.toc_node import TocNode
 from utils.logger_config import configure_logger
+from utils.xhtml import LI_HREF_XPATH
+from utils.xhtml import LI_NAME_XPATH
+from utils.xhtml import LI_NUMBER_XPATH
+from utils.xhtml import LI_SUBCHAPTERS_XPATH
+from utils.xhtml import find_title
+from utils.xhtml import find_toc_chapters
+from utils.xhtml import first_result
+from utils.xhtml import parse_xhtml
 
 BOOK_DIR = Path(os.environ.get("BOOK_DIR", "/books"))
 
@@ -20,59 +24,9 @@ BOOK_DIR = Path(os.environ.get("BOOK_DIR", "/books"))
 namespaces = {"xhtml": "http://www.w3.org/1999/xhtml"}
 
 
-@dataclass
-class Chapter:
-    title: str = field(init=False)
-    number: str
-    name: str
-    href: str
-    nest_level: int
-    query: str
-    url: str  # TODO: you can get base file url from info.json but I didn't implement it and url is empty now.
-    subchapters: list[Self | Element] = field(default_factory=list)
-    """
-    # Example:
-    title : 'III: The Division of Labour'
-    number: 'III'
-    name : ': The Division of Labour'
-    ## MEMO: I hate this format.
-
-    # NOTICE: in some data, specially book, this format broken.
-    result is BOOKIIIBOOK_NAME
-    I expect BOOKIII: BOOK_NAME
-    I hate this format more.
-
-    # MEMO:nest level:
-    these book nest_levl is very deep. max is 5.
-    aleksandr-kuprin_short-fiction_s-koteliansky_j-m-murry_stephen-graham_rosa-savory-graham_leo-pasvols
-    alexander-pushkin_eugene-onegin_henry-spalding
-    adam-smith_the-wealth-of-nations
-
-    # HACK: I used post init. but I noticed that I should not use it, because reading this data from dict.json is difficult owingt to post_init action.
-    # But this is simple and rewriting cost is high.
-    """
-
-    def __post_init__(self):
-        self.subchapters = process_raw_chapters_into_formated(
-            raw_chapters=self.subchapters,  # type: ignore
-            query=self.query + "/ol/li",
-            nest_level=self.nest_level + 1,
-            url=self.url,
-        )
-        self.title = "".join(self.number + self.name)
-
-    def to_dict(self):
-        if self.subchapters:
-            self.subchapters = [subchapter.to_dict() for subchapter in self.subchapters]  # type: ignore
-
-        return asdict(self)
-
-
 def find_root(xml_data: bytes) -> Element:
-    # MEMO: HTMLParser is easy for me more than lxml.etree.XMLParser.
-    parser = HTMLParser(encoding="UTF-8")
-    # WHYNOT: if I use xml.etree.ElementTree, I can read from utf-8 string, but I don't want to do mix-usage of xml.etree.ElementTree and lxml.etree.
-    return etree.fromstring(xml_data, parser)
+    # MEMO: the parser and the root of the same bytes are shared. See utils.xhtml.
+    return parse_xhtml(xml_data)
 
 
 def parse_from_xml_data(query: str, xml_data: bytes) -> list[Element]:
@@ -81,50 +35,49 @@ def parse_from_xml_data(query: str, xml_data: bytes) -> list[Element]:
 
 
 def find_file_title(xml_data: bytes) -> str | None:
-    return parse_from_xml_data("//html/head/title", xml_data=xml_data)[0].text
+    return find_title(find_root(xml_data))
 
 
 def find_chapters(xml_data: bytes) -> list[Element]:
-    return parse_from_xml_data("//html/body/nav[@id='toc'][1]/ol/li", xml_data)
+    return find_toc_chapters(find_root(xml_data))
 
 
 def process_raw_chapters_into_formated(
     raw_chapters: list[Element], query: str, nest_level=0, url=""
-) -> list[Chapter]:
+) -> list[TocNode]:
     return [
         make_chapter(raw_chapter, query, nest_level, url, index)
         for index, raw_chapter in enumerate(raw_chapters, start=1)
     ]
 
 
-def make_chapter(a_element: Element, query: str, nest_level: int, url: str, index: int) -> Chapter:
+def make_chapter(a_element: Element, query: str, nest_level: int, url: str, index: int) -> TocNode:
     # EXAMPLE: `<a href="text/chapter-3.xhtml"><span epub:type="z3998:roman">III</span>: The Conference</a>`.
-
-    def get_query_result_with_check(element: Element, query: str) -> str:
-        if result := element.xpath(query):
-            return result[0]  # type: ignore # reason at parse_from_xml_data
-        return ""
-
-    return Chapter(
-        number=get_query_result_with_check(a_element, "a/span/text()"),
-        name=get_query_result_with_check(a_element, "a/text()"),
-        href=get_query_result_with_check(a_element, "a/@href"),
+    number = first_result(a_element, LI_NUMBER_XPATH)
+    name = first_result(a_element, LI_NAME_XPATH)
+    query = query + f"[{index}]" if query else ""
+    return TocNode(
+        title=number + name,
+        number=number,
+        name=name,
+        href=first_result(a_element, LI_HREF_XPATH),
         nest_level=nest_level,
-        query=query + f"[{index}]" if query else "",
+        query=query,
         url=url,
-        subchapters=a_element.xpath("ol/li"),  # type: ignore
+        subchapters=process_raw_chapters_into_formated(
+            LI_SUBCHAPTERS_XPATH(a_element),  # type: ignore
+            query + "/ol/li",
+            nest_level + 1,
+            url,
+        ),
     )
 
 
-# //section[@id='chapter-39']/@id
-# //section[@id='chapter-39']/@epub:type
-
-
 def create_dict_formated_chapters(chapters):
     return [chapter.to_dict() for chapter in chapters]
 
 
-def create_formated_chapters(xml_data: bytes) -> list[Chapter]:
+def create_formated_chapters(xml_data: bytes) -> list[TocNode]:
     return process_raw_chapters_into_formated(
         find_chapters(xml_data), "//html/body/nav[@id='toc'][1]/ol/li"
     )
@@ -1,4 +1,8 @@
 import json
+import os
+import threading
+import zlib
+from collections.abc import Iterable
 from pathlib import Path
 
 from structlog.stdlib import BoundLogger
@@ -6,6 +10,13 @@ from structlog.stdlib import BoundLogger
 from scrayping.github_api import ContentData
 from scrayping.github_api import FileInfo
 from scrayping.github_api import RepositoryInfo
+from scrayping.github_api import calc_git_blob_sha
+from scrayping.github_api import calc_git_blob_sha_of_file
+
+# MEMO: content-addressed blob store shared by all books. `BOOK_DIR/.objects/ab/cdef...`.
+BLOB_STORE_DIR_NAME = ".objects"
+# MEMO: a packed book dir has `manifest.json` which maps file names to blob sha instead of files.
+MANIFEST_NAME = "manifest.json"
 
 
 def save_chunk(
@@ -18,14 +29,106 @@ def save_chunk(
         logger.info("Saved data.", path=path)
 
 
-def save_xhtml(data: str, path: Path, logger: BoundLogger) -> None:
+def append_jsonl(data: list[RepositoryInfo], path: Path, logger: BoundLogger) -> None:
     path.parent.mkdir(parents=True, exist_ok=True)
-    with open(path, "w") as fp:
+    with open(path, "a") as fp:
+        fp.writelines(json.dumps(record) + "\n" for record in data)
+    if logger:
+        logger.info("Appended data.", path=path, count=len(data))
+
+
+def write_atomically(data: str | bytes, path: Path) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    # MEMO: write to a temp file and rename, so a crash never leaves a half written file.
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp_path, "wb" if isinstance(data, bytes) else "w") as fp:
         fp.write(data)
+    os.replace(tmp_path, path)
+
+
+def save_xhtml(data: str, path: Path, logger: BoundLogger) -> None:
+    write_atomically(data, path)
     if logger:
         logger.info("Saved data.", path=path)
 
 
+def save_bytes(
+    chunks: Iterable[bytes], path: Path, logger: BoundLogger, expected_sha: str | None = None
+) -> None:
+    """Write chunks to disk as they come, without decoding or joining them.
+
+    Args:
+        chunks: The body. EXAMPLE: `response.iter_content(...)`
+        path: The destination. It is replaced atomically.
+        logger: A logger.
+        expected_sha: When given, the written file is checked against this git blob sha before
+            it replaces `path`. A mismatch raises ValueError and leaves `path` untouched.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, "wb") as fp:
+            for chunk in chunks:
+                fp.write(chunk)
+        if expected_sha and (actual_sha := calc_git_blob_sha_of_file(tmp_path)) != expected_sha:
+            msg = f"Sha mismatch. expected: {expected_sha}, actual: {actual_sha}"
+            raise ValueError(msg)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+    if logger:
+        logger.info("Saved data.", path=path)
+
+
+def blob_store_dir(book_dir: Path) -> Path:
+    return book_dir.parent / BLOB_STORE_DIR_NAME
+
+
+def blob_path(sha: str, store_dir: Path) -> Path:
+    return store_dir / sha[:2] / sha[2:]
+
+
+def save_blob(data: bytes, store_dir: Path, logger=None) -> str:
+    """Save data once under its git blob sha, compressed with zlib like git objects.
+
+    Returns:
+        The git blob sha. When the same content is already stored, nothing is written.
+    """
+    sha = calc_git_blob_sha(data)
+    path = blob_path(sha, store_dir)
+    if path.exists():
+        return sha
+    write_atomically(zlib.compress(data), path)
+    if logger:
+        logger.info("Saved blob.", path=path, sha=sha)
+    return sha
+
+
+def read_blob(sha: str, store_dir: Path) -> bytes:
+    with open(blob_path(sha, store_dir), "rb") as fp:
+        return zlib.decompress(fp.read())
+
+
+def read_manifest(book_dir: Path) -> dict[str, str]:
+    if not (book_dir / MANIFEST_NAME).exists():
+        return {}
+    with open(book_dir / MANIFEST_NAME) as fp:
+        return json.load(fp)
+
+
+def save_manifest(manifest: dict[str, str], book_dir: Path, logger: BoundLogger) -> None:
+    write_atomically(json.dumps(manifest, sort_keys=True), book_dir / MANIFEST_NAME)
+    if logger:
+        logger.info("Saved manifest.", path=book_dir / MANIFEST_NAME, files=len(manifest))
+
+
+def xhtml_exists(path: Path, manifest: dict[str, str] | None = None) -> bool:
+    # PERFORMANCE: pass the manifest of the book when many files of it are checked.
+    if manifest is None:
+        manifest = read_manifest(path.parent)
+    return path.exists() or path.name in manifest
+
+
 def read_dict(path, logger=None) -> list:
     if logger:
         logger.info("Reading data.", path=path)
@@ -33,8 +136,29 @@ def read_dict(path, logger=None) -> list:
         return json.load(fp)
 
 
+def read_jsonl(path, logger=None) -> list:
+    if logger:
+        logger.info("Reading data.", path=path)
+    with open(path) as fp:
+        return [json.loads(line) for line in fp if line.strip()]
+
+
 def read_xhtml(path: Path | str, logger=None) -> str:
     if logger:
         logger.info("Reading data.", path=path)
+    path = Path(path)
+    if not path.exists() and (sha := read_manifest(path.parent).get(path.name)):
+        return read_blob(sha, blob_store_dir(path.parent)).decode("utf-8")
     with open(path) as fp:
         return fp.read()
+
+
+def read_xhtml_bytes(path: Path | str, logger=None) -> bytes:
+    # MEMO: same as `read_xhtml` without decoding. lxml parses bytes faster than str.
+    if logger:
+        logger.info("Reading data.", path=path)
+    path = Path(path)
+    if not path.exists() and (sha := read_manifest(path.parent).get(path.name)):
+        return read_blob(sha, blob_store_dir(path.parent))
+    with open(path, "rb") as fp:
+        return fp.read()
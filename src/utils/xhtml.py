@@ -0,0 +1,87 @@
+"""xhtml.py: A shared access layer for Standard Ebooks xhtml files.
+
+Every reader should parse through this module, so that parsers and XPath objects are built once.
+Roots returned here are cached and shared. Do not modify them.
+"""
+
+import threading
+from functools import lru_cache
+from pathlib import Path
+
+from lxml import etree
+from lxml.etree import HTMLParser
+from lxml.etree import _Element as Element
+
+from utils.data_io import MANIFEST_NAME
+from utils.data_io import read_xhtml_bytes
+
+# MEMO: documents in a corpus scan are read once or twice in a row, so a small cache is enough.
+ROOT_CACHE_SIZE = 32
+
+# PERFORMANCE: XPath objects are compiled once at import instead of on every `.xpath(query)` call.
+TITLE_XPATH = etree.XPath("//html/head/title")
+TOC_CHAPTERS_XPATH = etree.XPath("//html/body/nav[@id='toc'][1]/ol/li")
+# EXAMPLE: SECTION_PARAGRAPHS_XPATH(root, section_id="chapter-1")
+SECTION_PARAGRAPHS_XPATH = etree.XPath("//section[@id=$section_id]/p")
+BODY_SECTIONS_XPATH = etree.XPath("//html/body/section")
+# MEMO: relative to a toc `<li>`.
+LI_NUMBER_XPATH = etree.XPath("a/span/text()")
+LI_NAME_XPATH = etree.XPath("a/text()")
+LI_HREF_XPATH = etree.XPath("a/@href")
+LI_SUBCHAPTERS_XPATH = etree.XPath("ol/li")
+
+# WHYNOT: an lxml parser must not be used by two threads at once, so each thread has its own.
+_local = threading.local()
+
+
+def get_parser() -> HTMLParser:
+    # MEMO: HTMLParser is easy for me more than lxml.etree.XMLParser.
+    # WHYNOT: if I use xml.etree.ElementTree, I can read from utf-8 string, but I don't want to do mix-usage of xml.etree.ElementTree and lxml.etree.
+    if (parser := getattr(_local, "parser", None)) is None:
+        parser = _local.parser = HTMLParser(encoding="UTF-8")
+    return parser
+
+
+@lru_cache(maxsize=ROOT_CACHE_SIZE)
+def parse_xhtml(xml_data: bytes) -> Element:
+    # MEMO: cached by content, so asking the same bytes for a title and chapters parses once.
+    return etree.fromstring(xml_data, get_parser())
+
+
+@lru_cache(maxsize=ROOT_CACHE_SIZE)
+def _read_root(path: Path, mtime_ns: int) -> Element:
+    return etree.fromstring(read_xhtml_bytes(path), get_parser())
+
+
+def read_root(path: Path | str) -> Element:
+    """Parse an xhtml file once and return the cached root while the file is unchanged.
+
+    Packed books are read from the blob store like `read_xhtml`.
+    """
+    path = Path(path)
+    # MEMO: a packed file changes only with its manifest.
+    stat_path = path if path.exists() else path.parent / MANIFEST_NAME
+    return _read_root(path, stat_path.stat().st_mtime_ns)
+
+
+def first_result(element: Element, xpath: etree.XPath) -> str:
+    # ANNOTATE: the result is a list of "smart strings" for text() and @attr queries.
+    if result := xpath(element):
+        return str(result[0])  # type: ignore
+    return ""
+
+
+def find_title(root: Element) -> str | None:
+    return TITLE_XPATH(root)[0].text  # type: ignore
+
+
+def find_toc_chapters(root: Element) -> list[Element]:
+    return TOC_CHAPTERS_XPATH(root)  # type: ignore
+
+
+def find_section_paragraphs(root: Element, section_id: str) -> list[Element]:
+    return SECTION_PARAGRAPHS_XPATH(root, section_id=section_id)  # type: ignore
+
+
+def find_body_sections(root: Element) -> list[Element]:
+    return BODY_SECTIONS_XPATH(root)  # type: ignore
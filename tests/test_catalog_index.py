@@ -0,0 +1,99 @@
+import json
+
+import pytest
+
+from text_process import catalog_index
+from text_process.catalog_index import CatalogIndex
+from text_process.toc_node import TocNode
+
+
+def toc_node(href: str, nest_level: int, subchapters: list[TocNode] | None = None) -> TocNode:
+    return TocNode(href, "", href, href, nest_level, "", "", subchapters or [])
+
+
+def make_book(book_dir, book_name: str, toc: list[TocNode] | str | None) -> None:
+    repo_dir = book_dir / book_name
+    repo_dir.mkdir()
+    (repo_dir / "chapter-1.xhtml").write_text("<p>text</p>")
+    (repo_dir / "toc.xhtml").write_text('<html xml:lang="en-GB"></html>')
+    if isinstance(toc, str):
+        (repo_dir / "toc.json").write_text(toc)
+    elif toc is not None:
+        (repo_dir / "toc.json").write_text(json.dumps([node.to_dict() for node in toc]))
+
+
+@pytest.fixture
+def book_dir(tmp_path):
+    book_dir = tmp_path / "books"
+    book_dir.mkdir()
+    make_book(book_dir, "author_flat", [toc_node("text/chapter-1.xhtml", 0)])
+    make_book(
+        book_dir,
+        "author_nested",
+        [toc_node("text/part-1.xhtml", 0, [toc_node("text/chapter-1.xhtml", 1)])],
+    )
+    make_book(book_dir, "author_empty", [])
+    make_book(book_dir, "author_broken", "{not json")
+    (book_dir / ".objects").mkdir()
+    return book_dir
+
+
+@pytest.fixture
+def index(tmp_path, book_dir):
+    with CatalogIndex(tmp_path / "index.sqlite3") as index:
+        index.refresh(book_dir)
+        yield index
+
+
+def test_refresh_records_books(index):
+    record = index.get("author_nested")
+
+    assert index.find_books() == ["author_broken", "author_empty", "author_flat", "author_nested"]
+    assert record is not None
+    assert (record["max_nest_level"], record["toc_entries"]) == (1, 2)
+    assert record["has_chapter_1"] is True
+    assert record["language"] == "en-GB"
+    assert index.files("author_nested") == ["chapter-1.xhtml", "toc.json", "toc.xhtml"]
+
+
+def test_unchanged_book_is_not_read_again(monkeypatch, index, book_dir):
+    def fail(*args):
+        raise AssertionError
+
+    monkeypatch.setattr(catalog_index, "build_book_record", fail)
+
+    assert index.refresh(book_dir) == 0
+
+
+def test_changed_book_is_read_again(index, book_dir):
+    (book_dir / "author_flat" / "chapter-2.xhtml").write_text("<p>more</p>")
+
+    assert index.refresh(book_dir) == 1
+    assert index.get("author_flat")["chapter_files"] == 2  # type: ignore
+
+
+def test_removed_book_is_deleted(index, book_dir):
+    for path in (book_dir / "author_flat").iterdir():
+        path.unlink()
+    (book_dir / "author_flat").rmdir()
+
+    index.refresh(book_dir)
+
+    assert index.get("author_flat") is None
+    assert index.files("author_flat") == []
+    assert "author_flat" not in index.find_books()
+
+
+def test_broken_toc_json_is_stored_as_null(index):
+    record = index.get("author_broken")
+
+    assert record is not None
+    assert (record["max_nest_level"], record["toc_entries"]) == (None, None)
+
+
+def test_nest_level_bounds_skip_empty_toc(index):
+    assert index.get("author_empty")["toc_entries"] == 0  # type: ignore
+    assert index.find_books(max_nest_level=0) == ["author_flat"]
+    assert index.find_books(min_nest_level=1) == ["author_nested"]
+    assert index.find_books(min_nest_level=0, max_nest_level=1) == ["author_flat", "author_nested"]
+    assert index.nest_levels() == {"author_flat": 0, "author_nested": 1}
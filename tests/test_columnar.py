@@ -0,0 +1,69 @@
+from domain.book import Book
+from domain.book import Chapter
+from domain.book import Paragraph
+from domain.book import Sentence
+from domain.columnar import ComponentStore
+
+
+def build_book(title: str) -> Book:
+    return Book(
+        contents=[
+            Chapter(
+                contents=[
+                    Paragraph(
+                        contents=[
+                            Sentence(contents="It was a dark night."),
+                            Sentence(contents="Rain."),
+                        ]
+                    ),
+                    Paragraph(contents=[Sentence(contents="He said, “Go.”")]),
+                ],
+                part_title="I",
+            ),
+            Chapter(
+                contents=[Paragraph(contents=[Sentence(contents="The end.")])], part_title="II"
+            ),
+        ],
+        part_title=title,
+    )
+
+
+def test_counters_match_calc_stats():
+    book = build_book("a")
+    view = ComponentStore().add_component(book)
+
+    book.calc_stats()
+
+    views = [view]
+    nodes = [book]
+    while views:
+        each_view, node = views.pop(), nodes.pop()
+        assert each_view.kind == node.kind
+        assert each_view.counters == node.counters
+        if not isinstance(node.contents, str):
+            views.extend(each_view)
+            nodes.extend(node.contents)
+    assert view.counters["token_count"] == 0
+
+
+def test_store_keeps_books_apart():
+    store = ComponentStore()
+    first = store.add_component(build_book("a"))
+    second = store.add_component(build_book("b"))
+
+    assert [book.part_title for book in store.books()] == ["a", "b"]
+    assert len(store.books()[0]) == 2
+    assert first.sentence_texts == [sentence.contents for sentence in build_book("a").sentences]
+    assert second.counters == build_book("b").stats()
+
+
+def test_to_component_round_trip():
+    book = build_book("a")
+    view = ComponentStore().add_component(book)
+
+    rebuilt = view.to_component()
+
+    assert rebuilt.stats() == book.stats()
+    assert [sentence.contents for sentence in rebuilt.sentences] == [
+        sentence.contents for sentence in book.sentences
+    ]
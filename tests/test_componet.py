@@ -0,0 +1,179 @@
+import json
+
+import pytest
+
+from domain.book import Book
+from domain.book import Chapter
+from domain.book import Line
+from domain.book import Paragraph
+from domain.book import Sentence
+from domain.book import SubParagraph
+from domain.serialization import dump_component
+from domain.serialization import load_component
+
+
+def build_book() -> Book:
+    return Book(
+        contents=[
+            Chapter(
+                contents=[
+                    Paragraph(contents=[Sentence(contents="A."), Sentence(contents="B.")]),
+                    Paragraph(
+                        contents=[
+                            SubParagraph(contents=[Sentence(contents="C.")]),
+                            SubParagraph(contents=[Sentence(contents="D.")]),
+                        ],
+                        part_title="blockquote",
+                    ),
+                    Paragraph(
+                        contents=[
+                            Line(contents=[Sentence(contents="l1")]),
+                            Line(contents=[Sentence(contents="l2")]),
+                        ],
+                        part_title="verse",
+                    ),
+                ],
+                part_title="I",
+            )
+        ],
+        part_title="book",
+    )
+
+
+def test_make_count_numbers_sentences_in_order():
+    book = build_book()
+
+    book.make_count()
+
+    assert [book.find_by_serial_id(i).contents for i in range(6)] == [
+        "A.",
+        "B.",
+        "C.",
+        "D.",
+        "l1",
+        "l2",
+    ]
+    assert [line.ids["line"] for line in book.iter_nodes("line")] == [0, 1]
+    assert book.find_by_serial_id(4).ids["serial_id"] == 4
+
+
+def test_make_count_only_wanted_kinds():
+    book = build_book()
+
+    book.make_count("paragraph")
+
+    assert [paragraph.ids["paragraph"] for paragraph in book.iter_nodes("paragraph")] == [0, 1, 2]
+    assert all("serial_id" not in sentence.ids for sentence in book.sentences)
+    with pytest.raises(ValueError, match="make_count"):
+        book.find_by_serial_id(0)
+
+
+def test_find_by_serial_id_needs_make_count():
+    with pytest.raises(ValueError, match="make_count"):
+        build_book().find_by_serial_id(0)
+
+
+def test_render_sentence():
+    sentence = Sentence(contents="Hello.")
+    assert "".join(sentence.iter_rendered("plain")) == "Hello.\n"
+    assert "".join(sentence.iter_rendered("tagged")) == "<>Hello.\n"
+
+    sentence.make_count()
+
+    assert "".join(sentence.iter_rendered("tagged")) == "<0>Hello.\n"
+    assert json.loads("".join(sentence.iter_rendered("jsonl"))) == {
+        "serial_id": 0,
+        "text": "Hello.",
+        "path": [],
+    }
+
+
+def test_render_nested_blocks_with_one_blank_line():
+    book = build_book()
+    book.make_count()
+
+    assert "".join(book.iter_rendered("plain")) == "book\n\nI\n\nA. B.\n\nC.\n\nD.\n\nl1\nl2\n\n"
+    tagged = "".join(book.iter_rendered("tagged")).splitlines()
+    assert tagged[:4] == ["<book>book_0", "<chapter>I_0", "<paragraph>_0", "<0>A."]
+    assert [line for line in tagged if line[1:2].isdigit()] == [
+        "<0>A.",
+        "<1>B.",
+        "<2>C.",
+        "<3>D.",
+        "<4>l1",
+        "<5>l2",
+    ]
+    records = [json.loads(line) for line in book.iter_rendered("jsonl")]
+    assert [record["serial_id"] for record in records] == list(range(6))
+    assert [record["text"] for record in records] == ["A.", "B.", "C.", "D.", "l1", "l2"]
+
+
+def test_unknown_render_style():
+    with pytest.raises(ValueError, match="Unknown render style"):
+        list(build_book().iter_rendered("html"))  # type: ignore
+
+
+def first_paragraph(book: Book) -> Paragraph:
+    return book.contents[0].contents[0]  # type: ignore
+
+
+def set_sentence_text(book: Book) -> None:
+    first_paragraph(book).contents[0].contents = "A changed sentence."  # type: ignore
+
+
+def replace_contents(book: Book) -> None:
+    first_paragraph(book).contents = [Sentence(contents="Only one.")]
+
+
+def add_in_place(book: Book) -> None:
+    first_paragraph(book).contents += [Sentence(contents="E f g.")]
+
+
+MUTATIONS = {
+    "append": lambda book: first_paragraph(book).contents.append(Sentence(contents="E f.")),
+    "extend": lambda book: first_paragraph(book).contents.extend([Sentence(contents="E.")]),
+    "iadd": add_in_place,
+    "insert": lambda book: first_paragraph(book).contents.insert(0, Sentence(contents="Z z.")),
+    "setitem": lambda book: first_paragraph(book).contents.__setitem__(
+        1, Sentence(contents="Bee bee.")
+    ),
+    "setitem_slice": lambda book: first_paragraph(book).contents.__setitem__(
+        slice(0, 2), [Sentence(contents="X.")]
+    ),
+    "delitem": lambda book: first_paragraph(book).contents.__delitem__(0),
+    "pop": lambda book: first_paragraph(book).contents.pop(),
+    "remove": lambda book: first_paragraph(book).contents.remove(
+        first_paragraph(book).contents[1]
+    ),
+    "clear": lambda book: first_paragraph(book).contents.clear(),
+    "reverse": lambda book: first_paragraph(book).contents.reverse(),
+    "assign_contents": replace_contents,
+    "assign_sentence": set_sentence_text,
+    "remove_chapter_block": lambda book: book.contents[0].contents.pop(1),
+}
+
+
+@pytest.mark.parametrize("mutate", MUTATIONS.values(), ids=MUTATIONS.keys())
+def test_mutation_invalidates_caches_of_ancestors(mutate):
+    book = build_book()
+    # MEMO: fill the counters and the sentence index of every node before the change.
+    for node in book.iter_nodes():
+        node.stats()
+        node.sentences  # noqa: B018
+
+    mutate(book)
+
+    fresh = load_component(dump_component(book))
+    for node, fresh_node in zip(book.iter_nodes(), fresh.iter_nodes(), strict=True):
+        assert node.stats() == fresh_node.stats()
+        assert [s.contents for s in node.sentences] == [s.contents for s in fresh_node.sentences]
+
+
+def test_added_component_gets_parent():
+    book = build_book()
+    sentence = Sentence(contents="New.")
+
+    first_paragraph(book).contents.append(sentence)
+
+    assert sentence.parent is first_paragraph(book)
+    assert book.stats()["sentence_count"] == 7
@@ -0,0 +1,35 @@
+import pytest
+
+from scrayping import crawl
+from scrayping import standard_ebooks
+from scrayping.crawl_journal import CrawlJournal
+
+
+@pytest.fixture
+def fake_crawl(monkeypatch, tmp_path):
+    monkeypatch.setattr(standard_ebooks, "BOOK_DIR", str(tmp_path))
+    monkeypatch.setattr(crawl, "build_github_api_manager", lambda pool_size=None: None)
+    monkeypatch.setattr(crawl, "build_crawl_journal", lambda: CrawlJournal(tmp_path / "j.sqlite3"))
+
+    def fetch_book_data(book_name, force, logger, github, mode, journal):
+        (tmp_path / book_name).mkdir(exist_ok=True)
+        (tmp_path / book_name / "chapter-1.xhtml").write_bytes(b"<p>text</p>")
+
+    def pack_book(book_name, logger):
+        if book_name == "author_broken":
+            msg = "disk full"
+            raise OSError(msg)
+        (tmp_path / book_name / "chapter-1.xhtml").unlink()
+
+    monkeypatch.setattr(crawl, "fetch_book_data", fetch_book_data)
+    monkeypatch.setattr(crawl, "pack_book", pack_book)
+
+
+def test_failed_pack_does_not_stop_crawl(fake_crawl):
+    repositories = [{"name": "author_broken"}, {"name": "author_good"}]
+
+    stats = crawl.crawl_books(repositories, workers=2, pack=True)  # type: ignore
+
+    assert (stats.done_books, stats.failed_books) == (2, 1)
+    assert stats.files == 2
+    assert stats.bytes == 2 * len(b"<p>text</p>")
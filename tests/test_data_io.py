@@ -0,0 +1,68 @@
+import pytest
+
+from scrayping.github_api import calc_git_blob_sha
+from utils.data_io import blob_path
+from utils.data_io import blob_store_dir
+from utils.data_io import read_blob
+from utils.data_io import read_manifest
+from utils.data_io import read_xhtml
+from utils.data_io import read_xhtml_bytes
+from utils.data_io import save_blob
+from utils.data_io import save_manifest
+from utils.data_io import xhtml_exists
+
+XHTML = "<html><body><p>It was a dark and stormy night.</p></body></html>\n"
+
+
+@pytest.fixture
+def book_dir(tmp_path):
+    book_dir = tmp_path / "books" / "author_title"
+    book_dir.mkdir(parents=True)
+    return book_dir
+
+
+def test_save_blob_is_content_addressed(book_dir):
+    store_dir = blob_store_dir(book_dir)
+
+    sha = save_blob(XHTML.encode(), store_dir)
+    mtime = blob_path(sha, store_dir).stat().st_mtime_ns
+
+    assert sha == calc_git_blob_sha(XHTML.encode())
+    assert save_blob(XHTML.encode(), store_dir) == sha
+    assert blob_path(sha, store_dir).stat().st_mtime_ns == mtime
+    assert read_blob(sha, store_dir) == XHTML.encode()
+
+
+def test_read_xhtml_falls_back_to_manifest(book_dir):
+    sha = save_blob(XHTML.encode(), blob_store_dir(book_dir))
+    save_manifest({"chapter-1.xhtml": sha}, book_dir, None)
+
+    path = book_dir / "chapter-1.xhtml"
+
+    assert not path.exists()
+    assert xhtml_exists(path)
+    assert read_xhtml(path) == XHTML
+    assert read_xhtml_bytes(path) == XHTML.encode()
+
+
+def test_loose_file_wins_over_manifest(book_dir):
+    sha = save_blob(b"<html>old</html>", blob_store_dir(book_dir))
+    save_manifest({"chapter-1.xhtml": sha}, book_dir, None)
+    (book_dir / "chapter-1.xhtml").write_text(XHTML)
+
+    assert read_xhtml(book_dir / "chapter-1.xhtml") == XHTML
+
+
+def test_missing_file_is_not_found(book_dir):
+    assert read_manifest(book_dir) == {}
+    assert not xhtml_exists(book_dir / "chapter-1.xhtml")
+    with pytest.raises(FileNotFoundError):
+        read_xhtml(book_dir / "chapter-1.xhtml")
+
+
+def test_xhtml_exists_uses_given_manifest(book_dir):
+    manifest = {"chapter-1.xhtml": "0" * 40}
+
+    assert xhtml_exists(book_dir / "chapter-1.xhtml", manifest)
+    assert not xhtml_exists(book_dir / "chapter-2.xhtml", manifest)
+    assert not xhtml_exists(book_dir / "chapter-1.xhtml", {})
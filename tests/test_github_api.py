@@ -0,0 +1,237 @@
+import json
+
+import pytest
+import requests
+from requests.structures import CaseInsensitiveDict
+
+from scrayping import github_api
+from scrayping.github_api import BACKOFF_BASE_SECONDS
+from scrayping.github_api import BACKOFF_MAX_SECONDS
+from scrayping.github_api import MAX_RETRIES
+from scrayping.github_api import GithubApiManager
+from scrayping.github_api import RequestScheduler
+from scrayping.github_api import ResponseCache
+
+URL = "https://api.github.com/repos/standardebooks/book/git/trees/master:src/epub/text"
+
+
+def make_response(status_code: int, body: bytes = b"", headers: dict | None = None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers = CaseInsensitiveDict(headers or {})
+    response._content = body
+    response.url = URL
+    return response
+
+
+class FakeClock:
+    """Stands in for the `time` module. `sleep` only moves the clock."""
+
+    EPOCH = 1_700_000_000.0
+
+    def __init__(self) -> None:
+        self.now = 0.0
+        self.sleeps: list[float] = []
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def time(self) -> float:
+        return self.EPOCH + self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch) -> FakeClock:
+    clock = FakeClock()
+    monkeypatch.setattr(github_api, "time", clock)
+    return clock
+
+
+def rate_limit_headers(clock: FakeClock, remaining: int, reset_in: float) -> dict[str, str]:
+    return {
+        "X-RateLimit-Remaining": str(remaining),
+        "X-RateLimit-Reset": str(int(clock.time() + reset_in)),
+    }
+
+
+@pytest.fixture
+def github(monkeypatch, tmp_path) -> GithubApiManager:
+    monkeypatch.setenv("GITHUB_PERSONAL_ACCESS_TOKEN", "dummy")
+    return GithubApiManager(cache_dir=tmp_path)
+
+
+def test_get_returns_cached_body_on_304(github):
+    body = json.dumps({"tree": [{"path": "chapter-1.xhtml"}]}).encode()
+    sent_headers: list[dict[str, str]] = []
+    responses = [make_response(200, body, {"ETag": '"abc"'}), make_response(304)]
+
+    def send(url, headers=None, stream=False):
+        sent_headers.append(headers or {})
+        return responses.pop(0)
+
+    github._send = send
+    assert github._get(URL).content == body
+
+    response = github._get(URL)
+
+    assert sent_headers[1]["If-None-Match"] == '"abc"'
+    assert response.status_code == 200
+    assert response.json() == {"tree": [{"path": "chapter-1.xhtml"}]}
+
+
+def test_get_does_not_cache_without_validators(github):
+    github._send = lambda url, headers=None, stream=False: make_response(200, b"{}")
+
+    github._get(URL)
+
+    assert github.cache.get(URL) is None
+
+
+def test_get_keeps_media_types_apart(github):
+    github._send = lambda url, headers=None, stream=False: make_response(
+        200, headers["Accept"].encode() if headers.get("Accept") else b"json", {"ETag": '"e"'}
+    )
+
+    github._get(URL)
+    github._get(URL, "application/vnd.github.raw")
+
+    assert github.cache.get(URL)["body"] == "json"
+    assert github.cache.get(f"{URL} application/vnd.github.raw")["body"] == (
+        "application/vnd.github.raw"
+    )
+
+
+def test_broken_cache_entry_is_a_miss(tmp_path):
+    cache = ResponseCache(tmp_path)
+    cache.put(URL, make_response(200, b"{}", {"ETag": '"e"'}))
+    cache._path(URL).write_text("{broken")
+
+    assert cache.get(URL) is None
+    assert ResponseCache.conditional_headers(cache.get(URL)) == {}
+
+
+@pytest.mark.parametrize(
+    ("status_code", "headers", "body", "expected"),
+    [
+        (200, {}, b"", None),
+        (404, {}, b"", None),
+        (403, {}, b"Resource not accessible by integration", None),
+        (403, {"Retry-After": "7"}, b"", 7.0),
+        (429, {"Retry-After": "3"}, b"", 3.0),
+        (403, {"X-RateLimit-Remaining": "0"}, b"API rate limit exceeded", 0.0),
+    ],
+)
+def test_retry_wait(github, status_code, headers, body, expected):
+    assert github._retry_wait(make_response(status_code, body, headers), 0) == expected
+
+
+@pytest.mark.parametrize("attempt", [0, 1, 2])
+def test_retry_wait_backs_off_on_secondary_rate_limit(github, attempt):
+    response = make_response(403, b"You have exceeded a secondary rate limit.")
+
+    wait = github._retry_wait(response, attempt)
+
+    backoff = BACKOFF_BASE_SECONDS * 2**attempt
+    assert backoff <= wait <= backoff * 1.5
+
+
+def test_retry_wait_is_capped(github):
+    wait = github._retry_wait(make_response(429), 20)
+
+    assert BACKOFF_MAX_SECONDS <= wait <= BACKOFF_MAX_SECONDS * 1.5
+
+
+def test_scheduler_does_not_pace_without_headers(clock):
+    scheduler = RequestScheduler(burst=3)
+
+    for _ in range(10):
+        scheduler.acquire()
+
+    assert clock.sleeps == []
+
+
+def test_scheduler_spreads_remaining_quota_until_reset(clock):
+    scheduler = RequestScheduler(burst=2)
+    scheduler.update(rate_limit_headers(clock, remaining=10, reset_in=100))
+
+    for _ in range(4):
+        scheduler.acquire()
+
+    # MEMO: 10 requests in 100 seconds. The burst goes at once, then one request per 10 seconds.
+    assert clock.sleeps == pytest.approx([10.0, 10.0])
+    assert scheduler.remaining == 6
+
+
+def test_scheduler_waits_for_reset_when_quota_is_exhausted(clock):
+    scheduler = RequestScheduler(burst=2)
+    scheduler.update(rate_limit_headers(clock, remaining=0, reset_in=30))
+
+    scheduler.acquire()
+    scheduler.acquire()
+
+    assert clock.sleeps == pytest.approx([31.0])
+    assert scheduler.rate is None
+
+
+def test_scheduler_ignores_partial_headers(clock):
+    scheduler = RequestScheduler(burst=1)
+    scheduler.update({"X-RateLimit-Remaining": "0"})
+
+    scheduler.acquire()
+
+    assert clock.sleeps == []
+
+
+def fake_session_get(github: GithubApiManager, responses: list[requests.Response]) -> list[str]:
+    sent: list[str] = []
+
+    def get(url, headers=None, stream=False):
+        sent.append(url)
+        return responses.pop(0)
+
+    github.session.get = get  # type: ignore
+    return sent
+
+
+def test_send_backs_off_on_secondary_rate_limit(github, clock):
+    secondary = b"You have exceeded a secondary rate limit."
+    sent = fake_session_get(
+        github, [make_response(403, secondary), make_response(403, secondary), make_response(200)]
+    )
+
+    response = github._send(URL)
+
+    assert response.status_code == 200
+    assert len(sent) == 3
+    first, second = clock.sleeps
+    assert BACKOFF_BASE_SECONDS <= first <= BACKOFF_BASE_SECONDS * 1.5
+    assert BACKOFF_BASE_SECONDS * 2 <= second <= BACKOFF_BASE_SECONDS * 3
+
+
+def test_send_gives_up_after_max_retries(github, clock):
+    fake_session_get(github, [make_response(429) for _ in range(MAX_RETRIES + 1)])
+
+    response = github._send(URL)
+
+    assert response.status_code == 429
+    assert len(clock.sleeps) == MAX_RETRIES
+
+
+def test_send_waits_for_reset_on_primary_rate_limit(github, clock):
+    sent = fake_session_get(
+        github,
+        [
+            make_response(403, b"API rate limit exceeded", rate_limit_headers(clock, 0, 120)),
+            make_response(200),
+        ],
+    )
+
+    response = github._send(URL)
+
+    assert response.status_code == 200
+    assert len(sent) == 2
+    assert sum(clock.sleeps) == pytest.approx(121.0)
@@ -0,0 +1,89 @@
+import codecs
+
+import pytest
+
+from text_process.plain_text import PlainTextReader
+from text_process.plain_text import read_normalized_text
+
+NOVEL = """\
+Front matter.
+
+   CHAPTER I
+
+The first
+paragraph.
+
+Part of it was
+wrapped.
+
+
+Chapter 2. The Storm
+
+Rain.
+
+PART III
+
+   THE END
+"""
+
+
+@pytest.fixture
+def write_text(tmp_path):
+    def write(text: str, name: str = "novel.txt", encoding: str = "utf-8"):
+        path = tmp_path / name
+        path.write_bytes(text.encode(encoding))
+        return path
+
+    return write
+
+
+def chapters_of(path) -> list[tuple[str | None, str, list[str]]]:
+    with PlainTextReader(path) as reader:
+        return [
+            (chapter.kind, chapter.title, [reader.text(span) for span in chapter.paragraphs])
+            for chapter in reader.iter_chapters()
+        ]
+
+
+def test_chapters_by_headings(write_text):
+    assert chapters_of(write_text(NOVEL)) == [
+        (None, "", ["Front matter."]),
+        ("CHAPTER", "CHAPTER I", ["The first paragraph.", "Part of it was wrapped."]),
+        ("CHAPTER", "Chapter 2. The Storm", ["Rain."]),
+        ("PART", "PART III", []),
+        ("THE_END", "THE END", []),
+    ]
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "Part civil war broke out.\n",
+        "the end of the road.\n",
+        "Chapter and verse were quoted.\n",
+        "PART " + "I" * 130 + "\n",
+    ],
+)
+def test_prose_is_not_a_heading(write_text, text):
+    assert [kind for kind, _, _ in chapters_of(write_text(text))] == [None]
+
+
+def test_no_headings(write_text):
+    path = write_text("One\nline.\n\nTwo.\r\n   \r\nThree.")
+
+    assert chapters_of(path) == [(None, "", ["One line.", "Two.", "Three."])]
+    assert read_normalized_text(path) == "One line.\n\nTwo.\n\nThree."
+
+
+@pytest.mark.parametrize("text", ["", "\n\n  \n"])
+def test_empty_file(write_text, text):
+    path = write_text(text)
+
+    assert chapters_of(path) == []
+    assert read_normalized_text(path) == ""
+
+
+def test_bom_is_skipped(write_text):
+    path = write_text(codecs.BOM_UTF8.decode() + "CHAPTER 1\n\nText.", encoding="utf-8")
+
+    assert chapters_of(path) == [("CHAPTER", "CHAPTER 1", ["Text."])]
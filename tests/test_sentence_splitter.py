@@ -0,0 +1,43 @@
+import pytest
+
+from text_process.sentence_splitter import split_sentences
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("It rained. We stayed in.", ["It rained.", "We stayed in."]),
+        ("Is it? Yes! Go.", ["Is it?", "Yes!", "Go."]),
+        ("Mr. Gillingham came in. He sat down.", ["Mr. Gillingham came in.", "He sat down."]),
+        ("Dr. Watson and St. Paul met.", ["Dr. Watson and St. Paul met."]),
+        ("J. M. Keynes wrote it. Then he slept.", ["J. M. Keynes wrote it.", "Then he slept."]),
+        ("Fruit, e.g. apples. Good.", ["Fruit, e.g. apples.", "Good."]),
+        ("It is 5 p.m. now.", ["It is 5 p.m. now."]),
+        ("He waited… Then he left.", ["He waited…", "Then he left."]),
+    ],
+)
+def test_split_sentences(text, expected):
+    assert split_sentences(text) == expected
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("“Go away.” Then she left.", ["“Go away.”", "Then she left."]),
+        ("“Is it?” “Yes.”", ["“Is it?”", "“Yes.”"]),
+        ("“Go away!” she said. He went.", ["“Go away!” she said.", "He went."]),
+        ('He said, "Stop." She laughed.', ['He said, "Stop."', "She laughed."]),
+        ("He said (quietly.) Then no.", ["He said (quietly.)", "Then no."]),
+    ],
+)
+def test_quoted_sentence_ends(text, expected):
+    assert split_sentences(text) == expected
+
+
+@pytest.mark.parametrize("text", ["", "   "])
+def test_empty_text(text):
+    assert split_sentences(text) == []
+
+
+def test_text_without_end():
+    assert split_sentences("No end") == ["No end"]
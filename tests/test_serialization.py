@@ -0,0 +1,118 @@
+import pytest
+
+from domain.book import Book
+from domain.book import Chapter
+from domain.book import Paragraph
+from domain.book import Sentence
+from domain.serialization import HEADER
+from domain.serialization import ComponentCache
+from domain.serialization import FormatError
+from domain.serialization import dump_component
+from domain.serialization import load_component
+
+
+def build_book() -> Book:
+    return Book(
+        contents=[
+            Chapter(
+                contents=[
+                    Paragraph(
+                        contents=[Sentence(contents="It was."), Sentence(contents="Naïve ✓")]
+                    ),
+                    Paragraph(contents=[], part_title="empty"),
+                ],
+                part_title="Chapter I",
+            ),
+            Chapter(contents=[Paragraph(contents=[Sentence(contents="")])], part_title=""),
+        ],
+        part_title="author_title",
+    )
+
+
+def shape(node) -> tuple:
+    if isinstance(node.contents, str):
+        return (node.kind, node.contents)
+    return (node.kind, node.part_title, [shape(child) for child in node.contents])
+
+
+def test_round_trip():
+    book = build_book()
+
+    loaded = load_component(dump_component(book))
+
+    assert type(loaded) is Book
+    assert shape(loaded) == shape(book)
+    assert [sentence.contents for sentence in loaded.sentences] == ["It was.", "Naïve ✓", ""]
+    assert all(child.parent is loaded for child in loaded.contents)
+
+
+def test_round_trip_keeps_stats():
+    book = build_book()
+
+    assert load_component(dump_component(book)).stats() == book.stats()
+
+
+@pytest.mark.parametrize("data", [b"", b"NOTMAGIC" + b"\0" * 32])
+def test_broken_data(data):
+    with pytest.raises(FormatError):
+        load_component(data)
+
+
+def test_cache_builds_once(tmp_path):
+    cache = ComponentCache(tmp_path)
+    calls: list[Book] = []
+
+    def build() -> Book:
+        calls.append(book := build_book())
+        return book
+
+    first = cache.get_or_build("key", build)
+    second = cache.get_or_build("key", build)
+
+    assert len(calls) == 1
+    assert shape(second) == shape(first)
+
+
+def corrupt(data: bytes, position: int, value: bytes) -> bytes:
+    return data[:position] + value + data[position + len(value) :]
+
+
+def test_truncated_data():
+    data = dump_component(build_book())
+
+    for size in (len(data) - 1, HEADER.size + 3, HEADER.size):
+        with pytest.raises(FormatError):
+            load_component(data[:size])
+
+
+def test_bad_kind_code():
+    data = dump_component(build_book())
+
+    with pytest.raises(FormatError, match="kind code"):
+        load_component(corrupt(data, HEADER.size + 1, b"\xff"))
+
+
+def test_bad_parent_index():
+    data = dump_component(build_book())
+    count = HEADER.unpack_from(data)[2]
+    second_parent = HEADER.size + count + 4
+
+    with pytest.raises(FormatError, match="parent"):
+        load_component(corrupt(data, second_parent, (5).to_bytes(4, "little")))
+
+
+def test_text_which_is_not_utf8():
+    data = dump_component(build_book())
+
+    with pytest.raises(FormatError, match="utf-8"):
+        load_component(corrupt(data, len(data) - 1, b"\xff"))
+
+
+def test_damaged_cache_file_is_a_miss(tmp_path):
+    cache = ComponentCache(tmp_path)
+    cache.put("key", build_book())
+    path = cache._path("key")
+    path.write_bytes(corrupt(path.read_bytes(), HEADER.size, b"\xff"))
+
+    assert cache.get("key") is None
+    assert shape(cache.get_or_build("key", build_book)) == shape(build_book())
@@ -0,0 +1,157 @@
+import json
+import os
+
+import pytest
+from structlog.testing import capture_logs
+
+from domain.serialization import ComponentCache
+from text_process.standard_ebook_book import BookConverter
+from text_process.standard_ebook_book import convert_book
+from text_process.standard_ebook_book import load_book
+from text_process.toc_node import TocNode
+from text_process.toc_node import load_toc
+
+CHAPTER_1 = """<?xml version="1.0" encoding="utf-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<body>
+<section id="chapter-1" epub:type="chapter">
+<h2>I</h2>
+<p>Mr. Smith came in. He sat
+  down.</p>
+<blockquote epub:type="z3998:verse">
+<p><span>Isn’t it funny</span><br/><span>How a bear likes honey?</span></p>
+</blockquote>
+<blockquote>
+<p>Dear sir.</p>
+<p>Yours.</p>
+</blockquote>
+<div><p>In a div.</p></div>
+<section id="scene"><p>A scene.</p></section>
+<section id="chapter-1-1"><h3>Part</h3><p>“Go away.” Then she left.</p></section>
+<figure><p>Not prose.</p></figure>
+</section>
+</body>
+</html>
+"""
+# MEMO: the section id is not the file name, so the body is read instead.
+CHAPTER_2 = '<html><body><section id="chapter-two"><p>The end.</p></section></body></html>'
+
+
+def toc_node(title: str, href: str, nest_level: int, subchapters=None) -> TocNode:
+    return TocNode(title, "", title, href, nest_level, "", "", subchapters or [])
+
+
+@pytest.fixture
+def book_dir(tmp_path):
+    book_dir = tmp_path / "author_title"
+    book_dir.mkdir()
+    toc = [
+        toc_node("Titlepage", "text/titlepage.xhtml", 0),
+        toc_node(
+            "I",
+            "text/chapter-1.xhtml",
+            0,
+            [toc_node("Part", "text/chapter-1.xhtml#chapter-1-1", 1)],
+        ),
+        toc_node("Lost", "text/chapter-1.xhtml#missing", 0),
+        toc_node("II", "text/chapter-2.xhtml", 0),
+    ]
+    (book_dir / "toc.json").write_text(json.dumps([node.to_dict() for node in toc]))
+    (book_dir / "titlepage.xhtml").write_text("<html><body><p>Title.</p></body></html>")
+    (book_dir / "chapter-1.xhtml").write_text(CHAPTER_1)
+    (book_dir / "chapter-2.xhtml").write_text(CHAPTER_2)
+    return book_dir
+
+
+def shape(node) -> tuple:
+    if isinstance(node.contents, str):
+        return (node.kind, node.contents)
+    return (node.kind, node.part_title, [shape(child) for child in node.contents])
+
+
+def test_convert_book(book_dir):
+    book = convert_book(book_dir)
+
+    chapter_1, chapter_2 = book.contents
+    assert (book.part_title, chapter_1.part_title, chapter_2.part_title) == (
+        "author_title",
+        "I",
+        "II",
+    )
+    assert shape(chapter_1.contents[0]) == (
+        "paragraph",
+        "",
+        [("sentence", "Mr. Smith came in."), ("sentence", "He sat down.")],
+    )
+    assert shape(chapter_2) == (
+        "chapter",
+        "II",
+        [("subsection", "", [("paragraph", "", [("sentence", "The end.")])])],
+    )
+
+
+def test_verse_and_blockquote(book_dir):
+    verse, blockquote = convert_book(book_dir).contents[0].contents[1:3]
+
+    assert shape(verse) == (
+        "paragraph",
+        "z3998:verse",
+        [
+            (
+                "subparagraph",
+                "verse",
+                [
+                    ("line", "", [("sentence", "Isn’t it funny")]),
+                    ("line", "", [("sentence", "How a bear likes honey?")]),
+                ],
+            )
+        ],
+    )
+    assert shape(blockquote) == (
+        "paragraph",
+        "blockquote",
+        [
+            ("subparagraph", "", [("sentence", "Dear sir.")]),
+            ("subparagraph", "", [("sentence", "Yours.")]),
+        ],
+    )
+
+
+def test_nested_containers(book_dir):
+    chapter_1 = convert_book(book_dir).contents[0]
+
+    assert [shape(component) for component in chapter_1.contents[3:]] == [
+        ("paragraph", "", [("sentence", "In a div.")]),
+        ("subsection", "", [("paragraph", "", [("sentence", "A scene.")])]),
+        (
+            "section",
+            "Part",
+            [("paragraph", "", [("sentence", "“Go away.”"), ("sentence", "Then she left.")])],
+        ),
+    ]
+    assert "Not prose." not in [sentence.contents for sentence in chapter_1.sentences]
+
+
+def test_missing_toc_entry_does_not_repeat_body(book_dir):
+    converter = BookConverter(book_dir, load_toc(book_dir / "toc.json"))
+
+    with capture_logs() as logs:
+        book = converter.convert()
+
+    assert [chapter.part_title for chapter in book.contents] == ["I", "II"]
+    assert [log["chapter_id"] for log in logs if log["event"] == "Toc entry is not found."] == [
+        "missing"
+    ]
+
+
+def test_load_book_uses_cache(book_dir, tmp_path):
+    cache = ComponentCache(tmp_path / "cache")
+    book = load_book(book_dir, cache)
+    chapter_2_path = book_dir / "chapter-2.xhtml"
+    chapter_2_path.write_text(CHAPTER_2.replace("The end.", "The new end."))
+    # MEMO: parsed roots are cached by mtime, which may not move within one timestamp tick.
+    mtime_ns = chapter_2_path.stat().st_mtime_ns + 1_000_000_000
+    os.utime(chapter_2_path, ns=(mtime_ns, mtime_ns))
+
+    assert shape(load_book(book_dir, cache)) != shape(book)
+    assert shape(load_book(book_dir, cache)) == shape(convert_book(book_dir))
@@ -0,0 +1,85 @@
+import json
+import os
+
+import pytest
+
+from text_process.standard_ebook_toc import convert_all_tocs
+from text_process.standard_ebook_toc import is_toc_json_fresh
+
+TOC_XHTML = """<?xml version="1.0" encoding="utf-8"?>
+<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops">
+<body>
+<nav id="toc" epub:type="toc">
+<ol>
+<li><a href="text/chapter-1.xhtml"><span epub:type="z3998:roman">I</span>: Start</a>
+<ol><li><a href="text/chapter-1.xhtml#part-1">Part</a></li></ol>
+</li>
+<li><a href="text/chapter-2.xhtml">End</a></li>
+</ol>
+</nav>
+</body>
+</html>
+"""
+
+
+def set_mtime(path, mtime: int) -> None:
+    os.utime(path, (mtime, mtime))
+
+
+@pytest.fixture
+def book_dir(tmp_path):
+    for name, toc in [("author_good", TOC_XHTML), ("author_broken", "")]:
+        (tmp_path / name).mkdir()
+        (tmp_path / name / "toc.xhtml").write_text(toc)
+    (tmp_path / "author_missing").mkdir()
+    (tmp_path / ".objects").mkdir()
+    return tmp_path
+
+
+def test_convert_all_tocs(book_dir):
+    summary = convert_all_tocs(book_dir, workers=1)
+
+    assert (summary.created, summary.skipped, summary.missing) == (1, 0, 1)
+    assert list(summary.failures) == ["author_broken"]
+    toc = json.loads((book_dir / "author_good" / "toc.json").read_text())
+    assert [node["title"] for node in toc] == ["I: Start", "End"]
+    assert toc[0]["subchapters"][0]["href"] == "text/chapter-1.xhtml#part-1"
+    assert not (book_dir / "author_broken" / "toc.json").exists()
+    assert not (book_dir / ".objects" / "toc.json").exists()
+
+
+def test_fresh_toc_json_is_skipped(book_dir):
+    convert_all_tocs(book_dir, workers=1)
+    toc_json_path = book_dir / "author_good" / "toc.json"
+    toc_json_path.write_text("[]")
+
+    summary = convert_all_tocs(book_dir, workers=1)
+
+    assert (summary.created, summary.skipped) == (0, 1)
+    assert toc_json_path.read_text() == "[]"
+
+
+@pytest.mark.parametrize("force", [False, True])
+def test_stale_or_forced_toc_json_is_converted(book_dir, force):
+    repo_dir = book_dir / "author_good"
+    (repo_dir / "toc.json").write_text("[]")
+    set_mtime(repo_dir / "toc.json", 1_000)
+    set_mtime(repo_dir / "toc.xhtml", 1_000 if force else 2_000)
+
+    summary = convert_all_tocs(book_dir, workers=1, force=force)
+
+    assert summary.created == 1
+    assert json.loads((repo_dir / "toc.json").read_text()) != []
+
+
+def test_is_toc_json_fresh(tmp_path):
+    (tmp_path / "toc.xhtml").write_text(TOC_XHTML)
+    assert not is_toc_json_fresh(tmp_path)
+
+    (tmp_path / "toc.json").write_text("[]")
+    set_mtime(tmp_path / "toc.xhtml", 1_000)
+    set_mtime(tmp_path / "toc.json", 1_000)
+    assert is_toc_json_fresh(tmp_path)
+
+    set_mtime(tmp_path / "toc.xhtml", 2_000)
+    assert not is_toc_json_fresh(tmp_path)
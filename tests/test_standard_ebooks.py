@@ -0,0 +1,160 @@
+import json
+from collections.abc import Callable
+from collections.abc import Iterable
+from collections.abc import Iterator
+
+import pytest
+
+from scrayping import standard_ebooks
+from scrayping.crawl_journal import CrawlJournal
+from scrayping.github_api import FileInfo
+from scrayping.github_api import calc_git_blob_sha
+from utils.data_io import read_manifest
+from utils.data_io import read_xhtml
+from utils.data_io import save_manifest
+
+BOOK_NAME = "author_title"
+BLOB_URL = f"https://api.github.com/repos/standardebooks/{BOOK_NAME}/git/blobs/"
+
+
+def file_info(path: str, data: bytes) -> FileInfo:
+    sha = calc_git_blob_sha(data)
+    return FileInfo(
+        path=path, mode="100644", type="blob", sha=sha, size=len(data), url=BLOB_URL + sha
+    )
+
+
+class FakeGithub:
+    """Serves a text tree and blobs. Blobs of `failing_paths` are never saved."""
+
+    def __init__(self, files: dict[str, bytes], failing_paths: Iterable[str] = ()) -> None:
+        self.tree = [file_info(path, data) for path, data in files.items()]
+        self.blobs = {info["url"]: files[info["path"]] for info in self.tree}
+        self.failing_urls = {info["url"] for info in self.tree if info["path"] in failing_paths}
+        self.requested_urls: list[str] = []
+
+    def fetch_file_tree_info(self, url) -> list[FileInfo]:
+        return self.tree
+
+    def valivade_url(self, url: str, author: str, title: str) -> str:
+        return url
+
+    def fetch_many_raw_files(
+        self, urls: Iterable[str], consume: Callable[[str, Iterator[bytes]], None]
+    ) -> dict[str, None]:
+        urls = list(urls)
+        self.requested_urls.extend(urls)
+        return {
+            url: consume(url, iter([self.blobs[url]]))
+            for url in urls
+            if url not in self.failing_urls
+        }
+
+    def fetch_raw_file(self, url) -> bytes:
+        return b"<html><nav id='toc'></nav></html>"
+
+
+@pytest.fixture
+def book_dir(monkeypatch, tmp_path):
+    monkeypatch.setattr(standard_ebooks, "BOOK_DIR", str(tmp_path))
+    book_dir = tmp_path / BOOK_NAME
+    book_dir.mkdir()
+    old_files = {"chapter-1.xhtml": b"<p>old 1</p>", "chapter-2.xhtml": b"<p>old 2</p>"}
+    for path, data in old_files.items():
+        (book_dir / path).write_bytes(data)
+    (book_dir / "info.json").write_text(
+        json.dumps([file_info(path, data) for path, data in old_files.items()])
+    )
+    return book_dir
+
+
+@pytest.fixture
+def journal(tmp_path):
+    with CrawlJournal(tmp_path / "journal.sqlite3") as journal:
+        yield journal
+
+
+def stored_shas(book_dir) -> dict[str, str]:
+    return {info["path"]: info["sha"] for info in json.loads((book_dir / "info.json").read_text())}
+
+
+def test_sync_keeps_old_sha_of_failed_blob(book_dir, journal):
+    new_files = {"chapter-1.xhtml": b"<p>new 1</p>", "chapter-2.xhtml": b"<p>new 2</p>"}
+    github = FakeGithub(new_files, failing_paths=["chapter-2.xhtml"])
+
+    standard_ebooks.sync_book_data(BOOK_NAME, github=github, journal=journal)
+
+    assert (book_dir / "chapter-1.xhtml").read_bytes() == b"<p>new 1</p>"
+    assert (book_dir / "chapter-2.xhtml").read_bytes() == b"<p>old 2</p>"
+    assert stored_shas(book_dir) == {
+        "chapter-1.xhtml": calc_git_blob_sha(b"<p>new 1</p>"),
+        "chapter-2.xhtml": calc_git_blob_sha(b"<p>old 2</p>"),
+    }
+    assert [entry["path"] for entry in journal.incomplete_entries(BOOK_NAME)] == [
+        "chapter-2.xhtml"
+    ]
+
+
+def test_failed_blob_is_fetched_by_next_sync(book_dir, journal):
+    new_files = {"chapter-1.xhtml": b"<p>old 1</p>", "chapter-2.xhtml": b"<p>new 2</p>"}
+    standard_ebooks.sync_book_data(
+        BOOK_NAME, github=FakeGithub(new_files, ["chapter-2.xhtml"]), journal=journal
+    )
+
+    standard_ebooks.sync_book_data(BOOK_NAME, github=FakeGithub(new_files), journal=journal)
+
+    assert (book_dir / "chapter-2.xhtml").read_bytes() == b"<p>new 2</p>"
+    assert stored_shas(book_dir)["chapter-2.xhtml"] == calc_git_blob_sha(b"<p>new 2</p>")
+    assert journal.incomplete_entries(BOOK_NAME) == []
+
+
+def test_new_file_which_failed_is_left_out(book_dir, journal):
+    new_files = {
+        "chapter-1.xhtml": b"<p>old 1</p>",
+        "chapter-2.xhtml": b"<p>old 2</p>",
+        "chapter-3.xhtml": b"<p>new 3</p>",
+    }
+
+    standard_ebooks.sync_book_data(
+        BOOK_NAME, github=FakeGithub(new_files, ["chapter-3.xhtml"]), journal=journal
+    )
+
+    assert "chapter-3.xhtml" not in stored_shas(book_dir)
+    assert not (book_dir / "chapter-3.xhtml").exists()
+
+
+def test_sync_keeps_packed_book_packed(book_dir, journal):
+    standard_ebooks.pack_book(BOOK_NAME)
+    assert not (book_dir / "chapter-1.xhtml").exists()
+    new_files = {"chapter-1.xhtml": b"<p>new 1</p>"}
+
+    standard_ebooks.sync_book_data(BOOK_NAME, github=FakeGithub(new_files), journal=journal)
+
+    assert not (book_dir / "chapter-1.xhtml").exists()
+    assert read_xhtml(book_dir / "chapter-1.xhtml") == "<p>new 1</p>"
+    assert set(read_manifest(book_dir)) == {"chapter-1.xhtml"}
+
+
+def test_removed_file_leaves_manifest(book_dir, journal):
+    save_manifest({"chapter-3.xhtml": "0" * 40}, book_dir, None)
+
+    standard_ebooks.remove_book_files(BOOK_NAME, ["chapter-2.xhtml", "chapter-3.xhtml"])
+
+    assert not (book_dir / "chapter-2.xhtml").exists()
+    assert read_manifest(book_dir) == {}
+
+
+@pytest.mark.parametrize("is_packed", [False, True])
+def test_forced_fetch_skips_saved_blobs(book_dir, journal, is_packed):
+    files = {"chapter-1.xhtml": b"<p>old 1</p>", "chapter-2.xhtml": b"<p>new 2</p>"}
+    if is_packed:
+        standard_ebooks.pack_book(BOOK_NAME)
+    github = FakeGithub(files)
+
+    standard_ebooks.fetch_book_data(BOOK_NAME, True, github=github, journal=journal)
+    assert github.requested_urls == [file_info("chapter-2.xhtml", b"<p>new 2</p>")["url"]]
+    standard_ebooks.fetch_book_data(BOOK_NAME, True, github=github, journal=journal)
+
+    assert len(github.requested_urls) == 1
+    assert read_xhtml(book_dir / "chapter-2.xhtml") == "<p>new 2</p>"
+    assert journal.incomplete_entries(BOOK_NAME) == []